@@ -0,0 +1,144 @@
+"""
+Benchmark for the entry condition monitor: evaluating the WAITING orders one pair at a
+time with the scalar functions (on the price buffers' numpy views, as the monitor used
+to) against one evaluate_entry_conditions call, at 10, 100 and 1000 pairs. "per-pair"
+is the compiled conditions evaluated one pair at a time with their scalar variants,
+what the monitor does below FileLoadingStrategy.entry_condition_batch_min_pairs for
+conditions without a streaming variant. The last column is the streaming variant the
+monitor uses there otherwise: one new price per pair into its PriceStream, then every
+pair's condition evaluated on it.
+
+    python bench_entry_conditions.py [--pairs 10 100 1000] [--window 100] [--repeat 20]
+
+All must give the same result for every pair, also on windows containing NaN; the
+benchmark stops if they don't.
+"""
+import argparse
+import random
+import timeit
+
+import numpy as np
+
+from entry_conditions import (ENTRY_CONDITIONS, PRICE_CROSSES_UPWARD, PRICE_REVERSES_UP, PRICE_UNDER, PriceStream,
+                              compile_order_entry_condition, evaluate_compiled_entry_condition,
+                              evaluate_entry_conditions, price_crosses_upward, price_reverses_up, price_under)
+
+
+def make_orders(pairs: int, window: int):
+    random.seed(42)
+    rng = np.random.default_rng(42)
+    orders = []
+    for _ in range(pairs):
+        price = random.uniform(0.1, 100)
+        prices = price * np.cumprod(1 + rng.normal(0, 0.002, window))
+        orders.append({
+            'entry_condition': random.choice(ENTRY_CONDITIONS),
+            'entry_condition_price': float(prices[-1]) * random.uniform(0.99, 1.01),
+            'period': 14,
+            'threshold_pct': 0.15,
+            'prices': prices,
+        })
+    return orders
+
+
+def evaluate_scalar(orders):
+    results = []
+    for order in orders:
+        condition_type = order['entry_condition']
+        if condition_type == PRICE_REVERSES_UP:
+            results.append(price_reverses_up(order['prices'], order['period'], order['threshold_pct']))
+        elif condition_type == PRICE_CROSSES_UPWARD:
+            results.append(price_crosses_upward(order['entry_condition_price'], order['prices']))
+        elif condition_type == PRICE_UNDER:
+            results.append(price_under(order['entry_condition_price'], order['prices']))
+    return results
+
+
+def evaluate_batch(orders):
+    return evaluate_entry_conditions(
+        [order['entry_condition'] for order in orders],
+        [order['prices'] for order in orders],
+        [{'price': order['entry_condition_price'], 'period': order['period'],
+          'threshold_pct': order['threshold_pct']} for order in orders])
+
+
+def make_nan_orders():
+    """Windows with NaNs (e.g. an MA still warming up) and a short one without, every condition on each."""
+    nan = float('nan')
+    windows = [
+        [nan] * 5 + [1.0, 0.9, 0.95, 1.0, 1.02],
+        [nan] * 12 + [1.0, 0.9, 0.95, 1.0, 1.02],
+        [1.0, 0.9, nan, 1.0, 1.02],
+        [1.0, 0.9, 0.95, 1.0, nan],
+        [1.0, nan, 1.02],
+        [1.0, 0.9, 0.95, 1.0, 1.02],
+    ]
+    return [{'entry_condition': condition, 'entry_condition_price': 1.01, 'period': period, 'threshold_pct': 0.15,
+             'prices': np.array(window)}
+            for window in windows for condition in ENTRY_CONDITIONS for period in (3, 14, 0)]
+
+
+def compile_orders(orders):
+    return [(order['prices'], compile_order_entry_condition(order)) for order in orders]
+
+
+def evaluate_per_pair(compiled_orders):
+    return [evaluate_compiled_entry_condition(compiled, prices) for prices, compiled in compiled_orders]
+
+
+def make_streams(orders, window: int):
+    streams = []
+    for order in orders:
+        stream = PriceStream(window)
+        stream.extend(order['prices'])
+        streams.append((stream, compile_order_entry_condition(order)))
+    return streams
+
+
+def evaluate_streams(streams):
+    return [stream.evaluate(compiled) for stream, compiled in streams]
+
+
+def update_and_evaluate_streams(streams, price: float):
+    for stream, _ in streams:
+        stream.update(price)
+    return evaluate_streams(streams)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pairs', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--window', type=int, default=100, help="prices per pair (price_buffer_size)")
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    nan_orders = make_nan_orders()
+    expected = [bool(result) for result in evaluate_scalar(nan_orders)]
+    if expected != evaluate_batch(nan_orders).tolist() or expected != evaluate_per_pair(compile_orders(nan_orders)) \
+            or expected != evaluate_streams(make_streams(nan_orders, args.window)):
+        raise SystemExit("Results differ from the scalar functions on windows with NaN")
+
+    print(f"{'pairs':>8} {'scalar ms':>10} {'per-pair ms':>12} {'batch ms':>10} {'speedup':>8} {'stream ms':>10}")
+    for pairs in args.pairs:
+        orders = make_orders(pairs, args.window)
+        compiled_orders = compile_orders(orders)
+        streams = make_streams(orders, args.window)
+        expected = [bool(result) for result in evaluate_scalar(orders)]
+        if expected != evaluate_batch(orders).tolist():
+            raise SystemExit(f"Batch and scalar results differ at {pairs} pairs")
+        if expected != evaluate_per_pair(compiled_orders):
+            raise SystemExit(f"Per-pair and scalar results differ at {pairs} pairs")
+        if expected != evaluate_streams(streams):
+            raise SystemExit(f"Stream and scalar results differ at {pairs} pairs")
+        scalar_ms = min(timeit.repeat(lambda: evaluate_scalar(orders), number=1, repeat=args.repeat)) * 1000
+        per_pair_ms = min(timeit.repeat(lambda: evaluate_per_pair(compiled_orders),
+                                        number=1, repeat=args.repeat)) * 1000
+        batch_ms = min(timeit.repeat(lambda: evaluate_batch(orders), number=1, repeat=args.repeat)) * 1000
+        stream_ms = min(timeit.repeat(lambda: update_and_evaluate_streams(streams, random.uniform(0.1, 100)),
+                                      number=1, repeat=args.repeat)) * 1000
+        print(f"{pairs:>8} {scalar_ms:>10.3f} {per_pair_ms:>12.3f} {batch_ms:>10.3f} {scalar_ms / batch_ms:>7.1f}x "
+              f"{stream_ms:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
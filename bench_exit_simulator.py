@@ -0,0 +1,131 @@
+"""
+Check and benchmark exit_simulator.simulate_ma_trailing_exits against replaying the
+candles through ma_trailing_exit one call at a time, the way custom_exit runs it in the
+bot (order fields updated after every call). Random trades with random loose/tight
+stop losses and take profits are replayed on a random walk and its HMA.
+
+    python bench_exit_simulator.py [--candles 100000] [--trades 100 1000 10000] [--repeat 3] [--open-trades 10000]
+
+Both must give the same exit candle, reason, profit and order fields for every trade;
+the benchmark stops if they don't. It also simulates `--open-trades` trades that never
+exit over 10000 candles and stops if the simulator's peak memory (tracemalloc) exceeds
+what its exit_simulator.MAX_BLOCK_CELLS block budget allows.
+"""
+import argparse
+import random
+import timeit
+import tracemalloc
+
+import numpy as np
+
+from exit_simulator import EXIT_REASONS, MAX_BLOCK_CELLS, ma_trailing_exit, simulate_ma_trailing_exits
+from indicators import hma
+
+
+def make_trades(count: int, candles: int):
+    random.seed(42)
+    trades = []
+    for _ in range(count):
+        tight_trailing_stop_loss = random.choice([0.0, random.uniform(0.1, 3), 100.0])
+        trades.append({
+            'entry_index': random.randrange(candles),
+            'loose_stop_loss': random.uniform(0.1, 5),
+            'is_loose_stop_loss_trailing': random.random() < 0.5,
+            'tight_trailing_stop_loss': tight_trailing_stop_loss,
+            # the order form deactivates the take profit along with the tight stop
+            'take_profit': 100.0 if tight_trailing_stop_loss == 100 else random.uniform(0.2, 5),
+        })
+    return trades
+
+
+def replay_scalar(close: np.ndarray, ma: np.ndarray, trades):
+    results = []
+    for trade in trades:
+        open_rate = close[trade['entry_index']]
+        highest_ma, take_profit_hit = 0.0, False
+        exit_index, reason = -1, None
+        for index in range(trade['entry_index'], len(close)):
+            reason, updates = ma_trailing_exit(
+                ma[index], close[index], open_rate, highest_ma, take_profit_hit,
+                loose_stop_loss=trade['loose_stop_loss'],
+                is_loose_stop_loss_trailing=trade['is_loose_stop_loss_trailing'],
+                tight_trailing_stop_loss=trade['tight_trailing_stop_loss'],
+                take_profit=trade['take_profit'])
+            highest_ma = updates.get('highest_ma', highest_ma)
+            take_profit_hit = updates.get('take_profit_hit', take_profit_hit)
+            if reason:
+                exit_index = index
+                break
+        profit = (close[exit_index] - open_rate) / open_rate * 100 if reason else np.nan
+        results.append((exit_index, reason, profit, highest_ma, take_profit_hit))
+    return results
+
+
+def simulate(close: np.ndarray, ma: np.ndarray, trades):
+    entry_index = np.array([trade['entry_index'] for trade in trades])
+    return simulate_ma_trailing_exits(
+        close, ma, entry_index, close[entry_index],
+        loose_stop_loss=[trade['loose_stop_loss'] for trade in trades],
+        is_loose_stop_loss_trailing=[trade['is_loose_stop_loss_trailing'] for trade in trades],
+        tight_trailing_stop_loss=[trade['tight_trailing_stop_loss'] for trade in trades],
+        take_profit=[trade['take_profit'] for trade in trades])
+
+
+def check_open_trades_memory(close: np.ndarray, ma: np.ndarray, count: int):
+    """Peak memory of simulating `count` trades that stay open to the last candle."""
+    trades = make_trades(count, len(close) // 5)
+    for trade in trades:
+        trade.update(loose_stop_loss=1000.0, is_loose_stop_loss_trailing=False, tight_trailing_stop_loss=100.0,
+                     take_profit=1e9)
+    tracemalloc.start()
+    simulation = simulate(close, ma, trades)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    if (simulation.exit_index >= 0).any():
+        raise SystemExit("Open trades exited")
+    # about ten float64 block arrays, plus the per-trade arrays
+    budget = 16 * 8 * MAX_BLOCK_CELLS + 200 * count
+    if peak > budget:
+        raise SystemExit(f"{count} open trades peaked at {peak / 2 ** 20:.0f} MB, "
+                         f"more than the {budget / 2 ** 20:.0f} MB the block budget allows")
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--candles', type=int, default=100000)
+    parser.add_argument('--trades', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--period', type=int, default=50, help="HMA period")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--open-trades', type=int, default=10000, help="trades that never exit, for the memory check")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.001, args.candles))
+    ma = hma(close, args.period)
+
+    print(f"{'trades':>8} {'scalar ms':>10} {'numpy ms':>10} {'speedup':>8}  exits by reason")
+    for count in args.trades:
+        trades = make_trades(count, args.candles)
+        simulation = simulate(close, ma, trades)
+        expected = replay_scalar(close, ma, trades)
+        actual = zip(simulation.exit_index.tolist(), simulation.reasons.tolist(), simulation.profit.tolist(),
+                     simulation.highest_ma.tolist(), simulation.take_profit_hit.tolist())
+        for trade, (scalar, vectorized) in enumerate(zip(expected, actual)):
+            if scalar[:2] != vectorized[:2] or scalar[3:] != vectorized[3:] or \
+                    not np.array_equal(scalar[2], vectorized[2], equal_nan=True):
+                raise SystemExit(f"Trade {trade} differs: scalar {scalar}, simulated {vectorized}")
+
+        scalar_ms = min(timeit.repeat(lambda: replay_scalar(close, ma, trades), number=1, repeat=args.repeat)) * 1000
+        numpy_ms = min(timeit.repeat(lambda: simulate(close, ma, trades), number=1, repeat=args.repeat)) * 1000
+        counts = np.bincount(simulation.reason_codes, minlength=len(EXIT_REASONS) + 1)
+        summary = ' '.join(f"{reason}={counts[code + 1]}" for code, reason in enumerate(EXIT_REASONS))
+        print(f"{count:>8} {scalar_ms:>10.1f} {numpy_ms:>10.1f} {scalar_ms / numpy_ms:>7.0f}x  "
+              f"{summary} open={counts[0]}")
+
+    peak = check_open_trades_memory(close[:10000], ma[:10000], args.open_trades)
+    print(f"{args.open_trades} open trades over 10000 candles: peak {peak / 2 ** 20:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark for graph_sim parameter sweeps: the previous apply_strategy (slopes through a
+per-row rolling apply, one combination at a time) against one sweep_strategy call over
+the whole grid. The previous version is only timed on a few combinations of a short
+series, extrapolated to the grid; the sweep is then run on a year of 1-minute prices.
+
+    python bench_graph_sim.py [--length 5000] [--year 525600] [--periods 9 14 21 50 100 200]
+                              [--ns 2 3 5 10] [--dip-depths 10]
+
+The sweep must give the same MAs and sell signals as the previous version on the short
+series; the benchmark stops if it doesn't.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from graph_sim import calculate_ema, calculate_hma, parameter_grid, sweep_strategy
+
+
+def apply_strategy_rolling(prices, ma_type='EMA', period=14, n=3, dip_depth=0):
+    """The previous apply_strategy, kept here as the reference."""
+    ma = calculate_ema(prices, period) if ma_type.upper() == 'EMA' else calculate_hma(prices, period)
+    slopes = ma.rolling(window=n).apply(lambda x: (x.iloc[-1] - x.iloc[-n]) / n, raw=False)
+    return ma, slopes < dip_depth
+
+
+def make_prices(length: int) -> np.ndarray:
+    rng = np.random.default_rng(42)
+    return 100 * np.cumprod(1 + rng.normal(0, 0.0005, length))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--length', type=int, default=5000, help="prices for the comparison with the previous version")
+    parser.add_argument('--year', type=int, default=525600, help="prices for the full sweep")
+    parser.add_argument('--periods', type=int, nargs='+', default=[9, 14, 21, 50, 100, 200])
+    parser.add_argument('--ns', type=int, nargs='+', default=[2, 3, 5, 10])
+    parser.add_argument('--dip-depths', type=int, default=10, help="dip depths between -0.01%% and 0 per MA and n")
+    parser.add_argument('--reference-combinations', type=int, default=4)
+    args = parser.parse_args()
+
+    dip_depths = np.linspace(-1e-4, 0, args.dip_depths).tolist()
+    grid = parameter_grid(['EMA', 'HMA'], args.periods, args.ns, dip_depths)
+    print(f"{len(grid)} combinations")
+
+    prices = pd.Series(make_prices(args.length))
+    sample = grid[::max(len(grid) // args.reference_combinations, 1)][:args.reference_combinations]
+    started = time.perf_counter()
+    expected = [apply_strategy_rolling(prices, *parameters) for parameters in sample]
+    reference_s = (time.perf_counter() - started) / len(sample) * len(grid)
+    result = sweep_strategy(prices, sample)
+    for combination, (ma, sell_signals) in enumerate(expected):
+        if not np.allclose(result.ma_for(combination), ma.to_numpy(), rtol=1e-9, atol=0, equal_nan=True) \
+                or not np.array_equal(result.sell_signals[combination], sell_signals.to_numpy()):
+            raise SystemExit(f"Sweep and previous apply_strategy differ for {sample[combination]}")
+
+    started = time.perf_counter()
+    sweep_strategy(prices, grid)
+    sweep_s = time.perf_counter() - started
+    print(f"{args.length} prices: previous {reference_s:.1f}s (extrapolated), sweep {sweep_s:.3f}s "
+          f"({reference_s / sweep_s:.0f}x)")
+
+    year = make_prices(args.year)
+    started = time.perf_counter()
+    result = sweep_strategy(year, grid)
+    sweep_s = time.perf_counter() - started
+    print(f"{args.year} prices: sweep {sweep_s:.2f}s, {result.sell_signals.nbytes / 1024 ** 2:.0f}MB of sell signals")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Check and benchmark the indicators.py kernels (ema, wma, hma) against pandas_ta, which is
+only imported here as the reference. Every kernel must match pandas_ta on every series
+(NaN at the same places, values within the tolerance documented in indicators.py);
+the benchmark stops if one doesn't.
+
+    python bench_indicators.py [--length 500 5000 50000] [--periods 9 21 50 200] [--repeat 20]
+"""
+import argparse
+import timeit
+
+import numpy as np
+import pandas as pd
+
+import indicators
+
+# relative tolerance against pandas_ta, see indicators.py
+RTOL = {'ema': 0.0, 'wma': 1e-12, 'hma': 1e-12}
+
+
+def make_series(length: int) -> np.ndarray:
+    rng = np.random.default_rng(42)
+    return 100 * np.cumprod(1 + rng.normal(0, 0.002, length))
+
+
+def check(name: str, expected, actual: np.ndarray, length: int, period: int):
+    expected = np.full(len(actual), np.nan) if expected is None else expected.to_numpy(dtype=np.float64)
+    if not np.array_equal(np.isnan(expected), np.isnan(actual)) or \
+            not np.allclose(actual, expected, rtol=RTOL[name], atol=0, equal_nan=True):
+        raise SystemExit(f"{name} differs from pandas_ta at length {length}, period {period}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--length', type=int, nargs='+', default=[500, 5000, 50000])
+    parser.add_argument('--periods', type=int, nargs='+', default=[9, 21, 50, 200])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    import pandas_ta as pta
+    print(f"EMA recurrence: {'numba' if indicators.get_ema_recurrence() is not None else 'pandas ewm'}")
+    print(f"{'name':>5} {'length':>8} {'period':>7} {'pandas_ta ms':>13} {'kernel ms':>10} {'speedup':>8}")
+    for length in args.length:
+        values = make_series(length)
+        series = pd.Series(values)
+        for period in args.periods:
+            for name in ('ema', 'wma', 'hma'):
+                reference, kernel = getattr(pta, name), getattr(indicators, name)
+                check(name, reference(series, length=period), kernel(values, period), length, period)
+                # leading NaNs, as in an indicator computed on another indicator
+                with_nans = values.copy()
+                with_nans[:period // 2] = np.nan
+                check(name, reference(pd.Series(with_nans), length=period), kernel(with_nans, period), length, period)
+
+                reference_ms = min(timeit.repeat(lambda: reference(series, length=period),
+                                                 number=1, repeat=args.repeat)) * 1000
+                kernel_ms = min(timeit.repeat(lambda: kernel(values, period), number=1, repeat=args.repeat)) * 1000
+                print(f"{name:>5} {length:>8} {period:>7} {reference_ms:>13.3f} {kernel_ms:>10.3f} "
+                      f"{reference_ms / kernel_ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark for the live order file encoding: parse/dump time and size of a file holding
+100 pairs (MATrailingStopLossStrategy records with a 100-element 'prices' list each).
+
+    python bench_order_serialization.py [--pairs 100] [--repeat 50]
+
+'indent=4 (before)' is the format the order file used to be written in.
+"""
+import argparse
+import json
+import random
+import timeit
+
+from order_serializers import ORDER_SERIALIZERS, get_order_serializer
+
+
+def make_order_data(pairs: int):
+    random.seed(42)
+    strategy_data = {}
+    for i in range(pairs):
+        price = random.uniform(0.1, 100)
+        strategy_data[f"PAIR{i}/USD"] = {
+            "status": "HOLDING",
+            "created_at": "2024-05-01T12:00:00.000000",
+            "stake_amount": 50.0,
+            "ma_type": "HMA",
+            "ma_period": 14,
+            "loose_stop_loss": 1.0,
+            "is_loose_stop_loss_trailing": True,
+            "tight_trailing_stop_loss": 0.5,
+            "take_profit": 2.0,
+            "take_profit_hit": False,
+            "highest_ma": price,
+            "entry_condition": None,
+            "entry_condition_timeout": None,
+            "entry_condition_price": None,
+            "threshold_pct": None,
+            "current_price": price,
+            "prices": [price * (1 + random.uniform(-0.01, 0.01)) for _ in range(100)],
+            "entry_price": price,
+            "exit_price": 0,
+            "profit": 0,
+        }
+    return strategy_data
+
+
+class IndentedJson:
+    """The previous encoding: json.dump(..., indent=4)."""
+    def dumps(self, data):
+        return json.dumps(data, indent=4).encode()
+
+    def loads(self, raw):
+        return json.loads(raw)
+
+
+def bench(name, serializer, data, repeat):
+    raw = serializer.dumps(data)
+    dump_ms = min(timeit.repeat(lambda: serializer.dumps(data), number=1, repeat=repeat)) * 1000
+    parse_ms = min(timeit.repeat(lambda: serializer.loads(raw), number=1, repeat=repeat)) * 1000
+    print(f"{name:<20} {len(raw) / 1024:>10.1f} {dump_ms:>10.2f} {parse_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pairs', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    data = make_order_data(args.pairs)
+    print(f"{args.pairs} pairs, best of {args.repeat}")
+    print(f"{'serializer':<20} {'size (KB)':>10} {'dump (ms)':>10} {'parse (ms)':>10}")
+    bench("indent=4 (before)", IndentedJson(), data, args.repeat)
+    for name in ORDER_SERIALIZERS:
+        try:
+            serializer = get_order_serializer(name)
+        except ImportError as e:
+            print(f"{name:<20} skipped ({e})")
+            continue
+        bench(name, serializer, data, args.repeat)
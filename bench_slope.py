@@ -0,0 +1,75 @@
+"""
+Benchmark for the rolling regression slope of the MA strategies: the sliding_window_view
+implementation they used to copy (O(n * window) time and memory) against
+indicators.calculate_slope (O(n) rolling sums), plus the cost of appending one candle
+with IncrementalSlope instead of recomputing the series.
+
+    python bench_slope.py [--length 1000 10000 100000] [--window 14] [--repeat 20]
+
+Both full-series implementations must give the same result (NaN at the same places);
+the benchmark stops if they don't.
+"""
+import argparse
+import timeit
+
+import numpy as np
+
+from indicators import IncrementalSlope, calculate_slope
+
+
+def calculate_slope_sliding_window(y, window):
+    """The previous implementation, kept here as the reference."""
+    y = np.asarray(y)
+    x = np.arange(len(y))
+    x_mat = np.lib.stride_tricks.sliding_window_view(x, window_shape=window)
+    y_mat = np.lib.stride_tricks.sliding_window_view(y, window_shape=window)
+    x_mean = np.mean(x_mat, axis=1)
+    y_mean = np.mean(y_mat, axis=1)
+    numerator = np.sum((x_mat - x_mean[:, None]) * (y_mat - y_mean[:, None]), axis=1)
+    denominator = np.sum((x_mat - x_mean[:, None]) ** 2, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.true_divide(numerator, denominator)
+        slope[denominator == 0] = 0
+    slope_padded = np.empty(len(y))
+    slope_padded[:] = np.nan
+    slope_padded[window - 1:] = slope
+    return slope_padded
+
+
+def make_series(length: int) -> np.ndarray:
+    rng = np.random.default_rng(42)
+    series = 100 * np.cumprod(1 + rng.normal(0, 0.002, length))
+    # leading NaNs like an EMA/HMA column has
+    series[:20] = np.nan
+    return series
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--length', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--window', type=int, default=14)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'length':>8} {'sliding ms':>11} {'rolling ms':>11} {'speedup':>8} {'append us':>10}")
+    for length in args.length:
+        series = make_series(length)
+        expected = calculate_slope_sliding_window(series, args.window)
+        if not np.allclose(calculate_slope(series, args.window), expected, rtol=1e-7, atol=1e-9, equal_nan=True):
+            raise SystemExit(f"Rolling and sliding window slopes differ at length {length}")
+
+        sliding_ms = min(timeit.repeat(lambda: calculate_slope_sliding_window(series, args.window),
+                                       number=1, repeat=args.repeat)) * 1000
+        rolling_ms = min(timeit.repeat(lambda: calculate_slope(series, args.window),
+                                       number=1, repeat=args.repeat)) * 1000
+
+        incremental = IncrementalSlope(args.window)
+        incremental.seed(series)
+        appended = series[-1000:].tolist()
+        append_us = min(timeit.repeat(lambda: [incremental.update(y) for y in appended],
+                                      number=1, repeat=args.repeat)) / len(appended) * 1e6
+        print(f"{length:>8} {sliding_ms:>11.3f} {rolling_ms:>11.3f} {sliding_ms / rolling_ms:>7.1f}x {append_us:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
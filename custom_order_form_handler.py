@@ -1,9 +1,17 @@
+import importlib
 import json
 import os
+import threading
 import portalocker
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from enum import Enum
-from typing import Dict, Any, List
+from typing import Callable, ContextManager, Dict, Any, Iterable, Iterator, List, Optional, Set
+
+from order_file_watcher import OrderFileWatcher
+from order_serializers import PrettyJsonOrderSerializer, get_order_serializer
+from order_store_metrics import OrderStoreMetrics
 
 
 class OrderStatus(Enum):
@@ -22,15 +30,61 @@ INACTIVE_ORDER_STATUSES_VALUES = [
 ALL_ORDER_STATUSES_VALUES = ACTIVE_ORDER_STATUSES_VALUES + \
     INACTIVE_ORDER_STATUSES_VALUES
 
+# Per-pair revision number, incremented by every write that changes the record
+REVISION_KEY = '_rev'
+
+
+class RevisionConflictError(RuntimeError):
+    """A compare-and-swap found the pair's record at another revision than expected."""
+
+
+def stamp_revision(original_data: Optional[Dict[str, Any]], data: Dict[str, Any]) -> bool:
+    """
+    Give `data` the revision following `original_data`'s if its content differs from
+    it (a revision already in `data` is ignored). Returns whether it differs; if not,
+    `data` keeps the original revision and needn't be written.
+    """
+    original_data = original_data or {}
+    revision = original_data.get(REVISION_KEY, 0)
+    data[REVISION_KEY] = revision
+    if data == {**original_data, REVISION_KEY: revision}:
+        return False
+    data[REVISION_KEY] = revision + 1
+    return True
+
 
 class StrategyDataHandler:
-    def __init__(self, strategy_name: str, base_dir='.'):
+    def __init__(self, strategy_name: str, base_dir='.', serializer: Optional[str] = None):
         self.strategy_name = strategy_name
         script_dir = os.path.dirname(os.path.abspath(__file__))
         self.base_dir = os.path.join(script_dir, base_dir)
         self.ensure_base_dir()
-        self.live_trades_file = f"LIVE_TRADES_LOG_{self.strategy_name}.json"
-        self.completed_trades_file = f"COMPLETED_TRADES_LOG_{self.strategy_name}.json"
+        # Live order file encoding: compact 'json' (default), 'orjson' or 'msgpack'
+        self.serializer = get_order_serializer(serializer)
+        self.live_trades_file = f"LIVE_TRADES_LOG_{self.strategy_name}{self.serializer.extension}"
+        # Append-only journal, one {pair: trade_data} JSON object per line
+        self.completed_trades_file = f"COMPLETED_TRADES_LOG_{self.strategy_name}.jsonl"
+        # Previous format: a single JSON list rewritten on every exit
+        self.legacy_completed_trades_file = f"COMPLETED_TRADES_LOG_{self.strategy_name}.json"
+
+        # In-process copy of the live order file. It is only re-parsed when the
+        # file's (mtime, size, inode) signature changes on disk.
+        self._cache_lock = threading.RLock()
+        self._cache: Dict[str, Any] = {}
+        self._cache_signature = None
+        # status -> pairs of the cached data; rebuilt after the cache is reloaded from
+        # disk, updated in place of a rebuild after our own writes
+        self._status_index: Dict[str, Set[str]] = {}
+        self._status_index_source = None
+        # pair -> (stored dict, typed record built from it), see read_pair_record
+        self._records: Dict[str, tuple] = {}
+        # Set by the watcher (see subscribe) when the file changed since the last parse
+        self._cache_stale = True
+        self._watcher: Optional[OrderFileWatcher] = None
+        # Operation counters and timings, only recorded after enable_metrics()
+        self.metrics: Optional[OrderStoreMetrics] = None
+        # the legacy completed trades list is converted before the journal is first used
+        self._journal_converted = False
 
     def ensure_base_dir(self):
         if not os.path.exists(self.base_dir):
@@ -42,54 +96,346 @@ class StrategyDataHandler:
     def get_completed_trades_file_path(self) -> str:
         return os.path.join(self.base_dir, self.completed_trades_file)
 
+    def get_legacy_completed_trades_file_path(self) -> str:
+        return os.path.join(self.base_dir, self.legacy_completed_trades_file)
+
     def read_file_with_lock(self, file_path: str) -> Any:
-        with portalocker.Lock(file_path, 'r', timeout=10) as file:
+        # shared lock: readers don't serialize against each other
+        with portalocker.Lock(file_path, 'r', timeout=10,
+                              flags=portalocker.LockFlags.SHARED | portalocker.LockFlags.NON_BLOCKING) as file:
             try:
                 return json.load(file)
             except json.JSONDecodeError:
                 return []
 
     def write_file_with_lock(self, file_path: str, data: Any):
-        with portalocker.Lock(file_path, 'w', timeout=10) as file:
-            json.dump(data, file, indent=4)
+        with portalocker.Lock(file_path, 'wb', timeout=10) as file:
+            file.write(self.serializer.dumps(data))
+
+    def get_order_lock_file_path(self) -> str:
+        return self.get_order_file_path() + '.lock'
+
+    def enable_metrics(self) -> OrderStoreMetrics:
+        if self.metrics is None:
+            self.metrics = OrderStoreMetrics(self.strategy_name)
+        return self.metrics
+
+    def record_metrics(self, operation: str, **values):
+        if self.metrics is not None:
+            self.metrics.record(operation, **values)
+
+    def measure_lock(self, operation: str, lock: ContextManager) -> ContextManager:
+        """`lock`, recording its wait and hold time as one `operation` if metrics are enabled."""
+        if self.metrics is None:
+            return lock
+        return self.metrics.measure_lock(operation, lock)
+
+    @contextmanager
+    def order_file_write_lock(self, operation: str = 'update') -> Iterator[None]:
+        """
+        Serialize writers of the order file (across threads and processes). Readers
+        never take it: the file is only ever replaced atomically (see
+        write_strategy_data), so any open() sees a complete file.
+        """
+        with self.measure_lock(operation, portalocker.Lock(self.get_order_lock_file_path(), 'a', timeout=10)):
+            yield
+
+    @staticmethod
+    def file_signature(stat_result: os.stat_result):
+        return (stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino)
+
+    @staticmethod
+    def copy_strategy_data(data: Dict[str, Any]) -> Dict[str, Any]:
+        # Callers mutate the records they get back, so never hand out the cached dicts
+        return {pair: dict(pair_data) for pair, pair_data in data.items()}
+
+    def invalidate_cache(self):
+        with self._cache_lock:
+            self._cache = {}
+            self._cache_signature = None
+
+    def get_watched_file_paths(self) -> List[str]:
+        return [self.get_order_file_path()]
+
+    def subscribe(self, callback: Callable[[str], None]) -> Callable[[], None]:
+        """
+        Call `callback(file_path)` from a background thread whenever the stored orders
+        change, whichever process changed them. Returns a function that unsubscribes.
+        While subscribed with inotify available, reads skip the os.stat of the order
+        file and trust the change notifications instead.
+        """
+        with self._cache_lock:
+            if self._watcher is None:
+                self._watcher = OrderFileWatcher(self.get_watched_file_paths())
+                self._watcher.subscribe(self.on_order_file_changed)
+        return self._watcher.subscribe(callback)
+
+    def on_order_file_changed(self, file_path: str):
+        self._cache_stale = True
+
+    def refresh_cache(self, verify: bool = False) -> Dict[str, Any]:
+        """
+        Bring the cache up to date with the order file and return it, parsing the
+        file only if its signature changed. The returned dict is the cache itself and
+        must not be mutated. `verify` forces the signature check even when a watcher
+        reports no change (writers must see the latest file, not one a few ms old).
+        """
+        if (not verify and not self._cache_stale and self._cache_signature is not None
+                and self._watcher is not None and self._watcher.is_event_driven):
+            return self._cache
+
+        file_path = self.get_order_file_path()
+        # cleared before reading, so a change landing while we parse marks it stale again
+        self._cache_stale = False
+        try:
+            signature = self.file_signature(os.stat(file_path))
+            with self._cache_lock:
+                if signature == self._cache_signature:
+                    return self._cache
+
+            with open(file_path, 'rb') as file:
+                # the path may have been replaced since os.stat, trust the open file
+                signature = self.file_signature(os.fstat(file.fileno()))
+                raw = file.read()
+        except FileNotFoundError:
+            self.invalidate_cache()
+            return self._cache
+
+        parse_started = time.perf_counter()
+        try:
+            strategy_data = self.serializer.loads(raw) if raw else {}
+        except ValueError:
+            strategy_data = {}
+        self.record_metrics('read', count=0, bytes_read=len(raw),
+                            parse_time=time.perf_counter() - parse_started)
+        if not isinstance(strategy_data, dict):
+            strategy_data = {}
+
+        with self._cache_lock:
+            self._cache = strategy_data
+            self._cache_signature = signature
+        return strategy_data
 
-    def read_strategy_data(self) -> Dict[str, Any]:
+    def read_strategy_data(self, statuses: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Return a copy of all pairs' records, or only of those whose status is in
+        `statuses` (looked up in the status index, other records aren't touched).
+        """
+        self.record_metrics('read')
+        strategy_data = self.refresh_cache()
+        if statuses is None:
+            return self.copy_strategy_data(strategy_data)
+        index = self.get_status_index(strategy_data)
+        return {pair: dict(strategy_data[pair])
+                for pair in sorted(pair for status in statuses for pair in index.get(status, ()))}
+
+    @staticmethod
+    def build_status_index(strategy_data: Dict[str, Any]) -> Dict[str, Set[str]]:
+        index: Dict[str, Set[str]] = {}
+        for pair, pair_data in strategy_data.items():
+            index.setdefault(pair_data.get('status'), set()).add(pair)
+        return index
+
+    def get_status_index(self, strategy_data: Optional[Dict[str, Any]] = None) -> Dict[str, Set[str]]:
+        """The status -> pairs index of `strategy_data` (the cache). Must not be mutated."""
+        if strategy_data is None:
+            strategy_data = self.refresh_cache()
+        with self._cache_lock:
+            if self._status_index_source is not strategy_data:
+                self._status_index = self.build_status_index(strategy_data)
+                self._status_index_source = strategy_data
+            return self._status_index
+
+    def pairs_with_status(self, *statuses: str) -> List[str]:
+        """Sorted pairs whose order has one of `statuses`, without reading any record."""
+        index = self.get_status_index()
+        return sorted(pair for status in statuses for pair in index.get(status, ()))
+
+    def read_pair_data(self, pair: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a copy of a single pair's record, or None if the pair has no data.
+        """
+        self.record_metrics('read')
+        pair_data = self.refresh_cache().get(pair)
+        return dict(pair_data) if pair_data is not None else None
+
+    def get_cached_pair_data(self, pair: str) -> Optional[Dict[str, Any]]:
+        """A pair's record as cached (not copied), must not be mutated."""
+        return self.refresh_cache().get(pair)
+
+    def read_pair_record(self, pair: str, record_class):
+        """
+        `pair`'s data as a `record_class` instance (see order_records), None if the pair
+        has no data. The record is only rebuilt (and validated) when the stored data
+        changed, so it is shared between callers and must be treated as read-only.
+        """
+        self.record_metrics('read')
+        pair_data = self.get_cached_pair_data(pair)
+        if pair_data is None:
+            return None
+        cached = self._records.get(pair)
+        if cached is not None and cached[0] is pair_data and type(cached[1]) is record_class:
+            return cached[1]
+        record = record_class.from_dict(pair_data)
+        self._records[pair] = (pair_data, record)
+        return record
+
+    def write_strategy_data(self, strategy_data: Dict[str, Any],
+                            changed_pairs: Optional[Iterable[str]] = None) -> int:
+        """
+        Replace the order file with `strategy_data`: write a temporary file next to it
+        and rename it over the old one, so readers see either the old or the new file,
+        never a partial one. Must be called while holding order_file_write_lock.
+        Passing the pairs that changed lets the status index be patched instead of
+        rebuilt. Returns the number of bytes written.
+        """
         file_path = self.get_order_file_path()
-        if os.path.exists(file_path):
-            return self.read_file_with_lock(file_path)
-        return {}
+        temp_file_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        raw = self.serializer.dumps(strategy_data)
+        with open(temp_file_path, 'wb') as file:
+            file.write(raw)
+            file.flush()
+            # rename keeps mtime, size and inode, so this is the new file's signature
+            signature = self.file_signature(os.fstat(file.fileno()))
+        os.replace(temp_file_path, file_path)
+
+        with self._cache_lock:
+            previous_cache = self._cache
+            self._cache = self.copy_strategy_data(strategy_data)
+            self._cache_signature = signature
+            if changed_pairs is not None and self._status_index_source is previous_cache:
+                self._status_index = self.update_status_index(
+                    self._status_index, previous_cache, self._cache, changed_pairs)
+                self._status_index_source = self._cache
+        return len(raw)
+
+    @staticmethod
+    def update_status_index(index: Dict[str, Set[str]], old_data: Dict[str, Any], new_data: Dict[str, Any],
+                            changed_pairs: Iterable[str]) -> Dict[str, Set[str]]:
+        """
+        Copy of `index` with `changed_pairs` moved from their status in `old_data` to the
+        one in `new_data`. Only the touched sets are copied; readers may still hold `index`.
+        """
+        index = dict(index)
+        copied = set()
+        for pair in changed_pairs:
+            old_status = old_data[pair].get('status') if pair in old_data else None
+            new_status = new_data[pair].get('status') if pair in new_data else None
+            if pair in old_data and pair in new_data and old_status == new_status:
+                continue
+            for status in (old_status, new_status):
+                if status not in copied:
+                    index[status] = set(index.get(status, ()))
+                    copied.add(status)
+            if pair in old_data:
+                index[old_status].discard(pair)
+            if pair in new_data:
+                index[new_status].add(pair)
+        return index
+
+    def export_strategy_data(self, file_path: str) -> str:
+        """
+        Write the live orders as indented JSON for humans to read. The bot never
+        reads this file back.
+        """
+        data = dict(sorted(self.read_strategy_data().items(), key=lambda item: item[0]))
+        with open(file_path, 'wb') as file:
+            file.write(PrettyJsonOrderSerializer().dumps(data))
+        return file_path
 
     def save_strategy_data(self, data: Dict[str, Any]) -> None:
         sorted_data = dict(sorted(data.items(), key=lambda item: item[0]))
-        file_path = self.get_order_file_path()
         
-        with portalocker.Lock(file_path, 'r+', timeout=10) as file:
-            try:
-                strategy_data = json.load(file)
-            except json.JSONDecodeError:
-                strategy_data = {}
+        with self.order_file_write_lock('save'):
+            strategy_data = self.copy_strategy_data(self.refresh_cache(verify=True))
             
             for pair, pair_data in sorted_data.items():
+                pair_data = dict(pair_data)
+                stamp_revision(strategy_data.get(pair), pair_data)
                 strategy_data = self.move_data_from_active_to_completed(pair, pair_data, strategy_data)
             
-            file.seek(0)
-            file.truncate()
-            json.dump(strategy_data, file, indent=4)
+            bytes_written = self.write_strategy_data(strategy_data, changed_pairs=sorted_data)
+        self.record_metrics('save', count=0, bytes_written=bytes_written)
+
+    def iter_completed_trades(self) -> Iterator[Dict[str, Any]]:
+        """
+        Stream completed trades ({pair: trade_data}) from the journal, oldest first.
+        No lock is needed: entries are appended whole, and a torn or corrupted line
+        (e.g. from a crash mid-append) is skipped.
+        """
+        self.ensure_completed_trades_journal()
+        file_path = self.get_completed_trades_file_path()
+        if not os.path.exists(file_path):
+            return
+        with open(file_path, 'r') as file:
+            for line in file:
+                if not line.endswith('\n'):
+                    # entry still being appended
+                    break
+                try:
+                    completed_trade = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(completed_trade, dict):
+                    yield completed_trade
 
     def read_completed_trades(self) -> List[Dict[str, Any]]:
-        file_path = self.get_completed_trades_file_path()
-        if os.path.exists(file_path):
-            return self.read_file_with_lock(file_path)
-        return []
+        return list(self.iter_completed_trades())
+
+    @staticmethod
+    def format_journal_entries(completed_trades: List[Dict[str, Any]]) -> str:
+        return ''.join(json.dumps(completed_trade) + '\n' for completed_trade in completed_trades)
 
     def save_completed_trades(self, data: List[Dict[str, Any]]) -> None:
+        self.ensure_completed_trades_journal()
+        file_path = self.get_completed_trades_file_path()
+        with portalocker.Lock(file_path, 'a', timeout=10) as file:
+            file.seek(0)
+            file.truncate()
+            file.write(self.format_journal_entries(data))
+
+    def ensure_completed_trades_journal(self) -> None:
+        """Convert the legacy completed trades list, once per handler, before the journal is used."""
+        if not self._journal_converted:
+            self.convert_completed_trades_to_journal()
+            self._journal_converted = True
+
+    def convert_completed_trades_to_journal(self) -> None:
+        """
+        One-time conversion of the legacy COMPLETED_TRADES_LOG_<strategy>.json list to
+        the journal. Legacy entries are placed before anything already journaled and
+        the old file is renamed to *.json.migrated.
+        """
+        legacy_file_path = self.get_legacy_completed_trades_file_path()
+        if not os.path.exists(legacy_file_path):
+            return
+
         file_path = self.get_completed_trades_file_path()
-        self.write_file_with_lock(file_path, data)
+        with portalocker.Lock(file_path, 'a+', timeout=10) as file:
+            # another process may have converted it while we waited for the lock
+            if not os.path.exists(legacy_file_path):
+                return
+
+            completed_trades = self.read_file_with_lock(legacy_file_path)
+            if not isinstance(completed_trades, list):
+                completed_trades = []
+
+            file.seek(0)
+            journaled = file.read()
+            file.seek(0)
+            file.truncate()
+            file.write(self.format_journal_entries(completed_trades) + journaled)
+            file.flush()
+            os.fsync(file.fileno())
+
+            os.replace(legacy_file_path, legacy_file_path + '.migrated')
         
     def move_data_from_active_to_completed(self, pair, data, strategy_data):
-        if data['status'] in [OrderStatus.EXITED.value, OrderStatus.CANCELED.value]:
+        if data.get('status') in INACTIVE_ORDER_STATUSES_VALUES:
             exited_trade = strategy_data.pop(pair, None)
             if exited_trade:
+                # keep fields written together with the final status (exit_price, profit, ...)
+                exited_trade.update(data)
                 exited_trade['status'] = OrderStatus.EXITED.value
                 self.add_completed_trade(pair, exited_trade)
         else:
@@ -97,37 +443,116 @@ class StrategyDataHandler:
             
         return strategy_data
 
+    @contextmanager
+    def transaction(self, pair: str) -> Iterator[Dict[str, Any]]:
+        """
+        Take the order file's write lock once and yield `pair`'s record (an empty dict
+        for a new pair) to be edited in place. Any number of fields can be changed; the
+        file is written once when the block exits, and not at all if nothing changed or
+        the block raised.
+
+            with handler.transaction(pair) as data:
+                data['exit_price'] = price
+                data['status'] = OrderStatus.EXITED.value
+
+        Reads are fine inside the block, but don't open another transaction.
+        """
+        with self.order_file_write_lock():
+            # Missing, empty or corrupted files load as {}
+            strategy_data = self.copy_strategy_data(self.refresh_cache(verify=True))
+            pair_data = strategy_data.get(pair, {})
+            original_data = dict(pair_data)
+
+            yield pair_data
+
+            if not stamp_revision(original_data, pair_data):
+                return
+
+            strategy_data = self.move_data_from_active_to_completed(pair, pair_data, strategy_data)
+
+            bytes_written = self.write_strategy_data(strategy_data, changed_pairs=[pair])
+        self.record_metrics('update', count=0, bytes_written=bytes_written)
+
     def update_strategy_data(self, pair, data):
-        file_path = self.get_order_file_path()
-        with portalocker.Lock(file_path, 'r+', timeout=10) as file:
+        with self.transaction(pair) as pair_data:
+            pair_data.clear()
+            pair_data.update(data)
+
+    def compare_and_swap(self, pair: str, expected_revision: int, data: Dict[str, Any]) -> int:
+        """
+        Replace `pair`'s record with `data` only if it is still at `expected_revision`
+        (the REVISION_KEY of the record it was computed from, 0 for a new pair), and
+        return the new revision. Raises RevisionConflictError if another writer got
+        there first. The lock is only held to compare and write, so `data` can be
+        computed from an unlocked read.
+        """
+        with self.transaction(pair) as pair_data:
+            revision = pair_data.get(REVISION_KEY, 0)
+            if revision != expected_revision:
+                raise RevisionConflictError(
+                    f"{pair} is at revision {revision}, expected {expected_revision}")
+            pair_data.clear()
+            pair_data.update(data)
+        return pair_data[REVISION_KEY]
+
+    def update_optimistically(self, pair: str, update: Callable[[Optional[Dict[str, Any]]], Optional[Dict[str, Any]]],
+                              retries: int = 5) -> Optional[Dict[str, Any]]:
+        """
+        Read `pair`'s record without locking, let `update` compute the new record from a
+        copy of it (None for a missing pair) and commit it with compare_and_swap,
+        re-reading and calling `update` again on conflict. `update` returns None to
+        leave the record alone. Returns the committed record (or None).
+        """
+        for _ in range(retries):
+            pair_data = self.read_pair_data(pair)
+            expected_revision = pair_data.get(REVISION_KEY, 0) if pair_data is not None else 0
+            new_data = update(dict(pair_data) if pair_data is not None else None)
+            if new_data is None:
+                return None
             try:
-                strategy_data = json.load(file)
-
-                strategy_data = self.move_data_from_active_to_completed(pair, data, strategy_data)
-                
-                file.seek(0)
-                file.truncate()
-                json.dump(strategy_data, file, indent=4)
-            except json.JSONDecodeError:
-                # Handle empty or corrupted file
-                strategy_data = {pair: data}
-                json.dump(strategy_data, file, indent=4)
+                new_data[REVISION_KEY] = self.compare_and_swap(pair, expected_revision, new_data)
+            except RevisionConflictError:
+                continue
+            return new_data
+        raise RevisionConflictError(f"{pair} kept changing, gave up after {retries} attempts")
 
     def add_completed_trade(self, pair, trade_data):
+        # O(1) append instead of rewriting the whole history on every exit
+        self.ensure_completed_trades_journal()
         file_path = self.get_completed_trades_file_path()
-        with portalocker.Lock(file_path, 'r+', timeout=10) as file:
-            try:
-                completed_trades = json.load(file)
-                if not isinstance(completed_trades, list):
-                    completed_trades = []
-                completed_trades.append({pair: trade_data})
-                file.seek(0)
-                file.truncate()
-                json.dump(completed_trades, file, indent=4)
-            except json.JSONDecodeError:
-                # Handle empty or corrupted file
-                completed_trades = [{pair: trade_data}]
-                json.dump(completed_trades, file, indent=4)
+        lock = portalocker.Lock(file_path, 'a+', timeout=10)
+        with self.measure_lock('add_completed', lock) as file:
+            entry = self.format_journal_entries([{pair: trade_data}])
+            end = file.seek(0, os.SEEK_END)
+            if end:
+                file.seek(end - 1)
+                if file.read(1) != '\n':
+                    # start a new line after an entry torn by a crash
+                    entry = '\n' + entry
+            file.write(entry)
+        self.record_metrics('add_completed', count=0, bytes_written=len(entry.encode()))
+
+
+# Storage backends selectable with create_strategy_data_handler (module, class name).
+# The JSON file backend is the default.
+STORAGE_BACKENDS = {
+    'json': ('custom_order_form_handler', 'StrategyDataHandler'),
+    'sqlite': ('sqlite_order_store', 'SqliteStrategyDataHandler'),
+    'sharded': ('sharded_order_store', 'ShardedStrategyDataHandler'),
+}
+DEFAULT_STORAGE_BACKEND = 'json'
+
+
+def create_strategy_data_handler(strategy_name: str, base_dir='.', backend: Optional[str] = None,
+                                 serializer: Optional[str] = None) -> StrategyDataHandler:
+    backend = backend or DEFAULT_STORAGE_BACKEND
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unsupported order storage backend: {backend} (choose from {', '.join(STORAGE_BACKENDS)})")
+
+    module_name, class_name = STORAGE_BACKENDS[backend]
+    # imported lazily, backend modules import this one
+    handler_class = getattr(importlib.import_module(module_name), class_name)
+    return handler_class(strategy_name, base_dir, serializer=serializer)
 
 
 # outdated uses dict for cmpleted rtades
@@ -1,33 +1,54 @@
-from typing import List, Callable
-import pandas as pd
-import pandas_ta as pta
-
-
-def calculate_ma(prices: List[float], period: int, ma_type: str) -> List[float]:
-    df = pd.DataFrame(prices, columns=['price'])
-    if ma_type.upper() == 'EMA':
-        df['ma'] = pta.ema(df['price'], length=period)
-    elif ma_type.upper() == 'HMA':
-        df['ma'] = pta.hma(df['price'], length=period)
-    else:
+import hashlib
+import math
+import re
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+
+from indicator_engine import INDICATOR_CACHE
+from indicators import ema, hma
+
+
+# entry_condition values of orders written before condition expressions (their
+# parameters are the order's entry_condition_price / threshold_pct / period)
+PRICE_REVERSES_UP = 'PriceReversesUpCondition'
+PRICE_CROSSES_UPWARD = 'PriceCrossesUpwardCondition'
+PRICE_UNDER = 'PriceUnderCondition'
+ENTRY_CONDITIONS = (PRICE_REVERSES_UP, PRICE_CROSSES_UPWARD, PRICE_UNDER)
+
+# Prices as the functions below take them: a float64 array (e.g. a price buffer's
+# view), a memoryview of doubles or a list, oldest first
+Prices = Union[np.ndarray, memoryview, Sequence[float]]
+
+
+def calculate_ma(prices: Prices, period: int, ma_type: str) -> np.ndarray:
+    """The EMA or HMA of `prices`, one value per price (read-only, shared through INDICATOR_CACHE)."""
+    if ma_type.upper() not in ('EMA', 'HMA'):
         raise ValueError(f"Unsupported moving average type: {ma_type}")
-    return df['ma'].tolist()
+    values = np.ascontiguousarray(prices, dtype=np.float64)
+    # no pair or candle timestamps here: the prices themselves identify the series
+    key = (None, None, ma_type.upper(), (period,), hashlib.blake2b(values, digest_size=16).digest())
 
+    def compute():
+        return ema(values, period) if ma_type.upper() == 'EMA' else hma(values, period)
 
-def price_crosses_upward(target_price: float, last_prices: List[float]) -> bool:
-    return last_prices[-2] < target_price <= last_prices[-1]
+    return INDICATOR_CACHE.get_or_compute(key, compute)
 
 
-def price_under(target_price: float, last_prices: List[float]) -> bool:
-    return last_prices[-1] < target_price
+def price_crosses_upward(target_price: float, last_prices: Prices) -> bool:
+    return bool(last_prices[-2] < target_price <= last_prices[-1])
 
 
-def price_reverses_up(last_prices: List[float], period: int, threshold_pct: float) -> bool:
+def price_under(target_price: float, last_prices: Prices) -> bool:
+    return bool(last_prices[-1] < target_price)
+
+
+def price_reverses_up(last_prices: Prices, period: int, threshold_pct: float) -> bool:
     if len(last_prices) < 3:
         return False
 
     # Find the lowest price in the recent period
-    lowest_price = min(last_prices[-period:])
+    lowest_price = np.min(last_prices[-period:])
 
     # Get the current price and the price before it
     current_price = last_prices[-1]
@@ -42,4 +63,519 @@ def price_reverses_up(last_prices: List[float], period: int, threshold_pct: floa
     # Ensure the current price is higher than the previous price
     upward_movement = current_price > previous_price
 
-    return price_reversed and upward_movement
+    return bool(price_reversed and upward_movement)
+
+
+def stack_price_windows(windows: Sequence[Prices], widths: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The last widths[i] values of every window as the rows of one float64 matrix,
+    right-aligned (newest value in the last column) and NaN-padded on the left.
+    Returns the matrix and the number of real values per row.
+    """
+    lengths = np.fromiter(map(len, windows), dtype=np.int64, count=len(windows))
+    row_lengths = np.minimum(lengths, widths)
+    columns = max(int(row_lengths.max(initial=0)), 2)
+    unique_lengths = np.unique(lengths)
+    if len(unique_lengths) == 1 and unique_lengths[0] >= columns:
+        # the usual case, all windows as long as the price buffers' capacity: one copy
+        matrix = np.concatenate(windows).reshape(len(windows), -1)[:, -columns:]
+        if (row_lengths < columns).any():
+            matrix[np.arange(columns) < columns - row_lengths[:, None]] = np.nan
+        return matrix, row_lengths
+
+    matrix = np.full((len(windows), columns), np.nan)
+    # windows of equal length are copied as one block
+    for length in unique_lengths:
+        if not length:
+            continue
+        rows = np.flatnonzero(lengths == length)
+        group = [windows[row] for row in rows]
+        block = np.concatenate(group).reshape(len(group), length)
+        copied = min(int(length), columns)
+        matrix[rows, columns - copied:] = block[:, length - copied:]
+    matrix[np.arange(columns) < columns - row_lengths[:, None]] = np.nan
+    return matrix, row_lengths
+
+
+class EntryConditionType:
+    """
+    A registered entry condition. `parameters` maps each parameter to (type, default),
+    a None default meaning it's required. `evaluate(matrix, lengths, **parameters)`
+    gets the rows' price windows stacked by stack_price_windows (at least
+    `window(**parameters)` values each), the windows' full lengths and one array per
+    parameter, and returns one bool per row. `scalar(last_prices, **parameters)`, set
+    by register_scalar_entry_condition, evaluates it on one window, and
+    `stream(prices, **parameters)`, set by register_streaming_entry_condition, on one
+    pair's PriceStream.
+    """
+
+    def __init__(self, name: str, parameters: Dict[str, Tuple[type, Any]],
+                 evaluate: Callable[..., np.ndarray], window: Callable[..., np.ndarray]):
+        self.name = name
+        self.parameters = parameters
+        self.evaluate = evaluate
+        self.window = window
+        self.scalar: Optional[Callable[..., bool]] = None
+        self.stream: Optional[Callable[..., bool]] = None
+
+
+# name (and legacy alias) -> EntryConditionType, see register_entry_condition
+ENTRY_CONDITION_TYPES: Dict[str, EntryConditionType] = {}
+
+
+def register_entry_condition(name: str, parameters: Dict[str, Tuple[type, Any]],
+                             window: Callable[..., np.ndarray], aliases: Sequence[str] = ()):
+    """Decorator registering a batch condition function under `name` (and `aliases`)."""
+    def decorator(evaluate):
+        condition_type = EntryConditionType(name, parameters, evaluate, window)
+        for key in (name, *aliases):
+            ENTRY_CONDITION_TYPES[key] = condition_type
+        return evaluate
+    return decorator
+
+
+def period_widths(period: np.ndarray) -> np.ndarray:
+    # last_prices[-period:] is the whole window for period 0
+    return np.where(period > 0, period, np.iinfo(np.int64).max)
+
+
+@register_entry_condition('PriceUnder', {'price': (float, None)},
+                          window=lambda price: np.full(len(price), 1), aliases=(PRICE_UNDER,))
+def batch_price_under(matrix: np.ndarray, lengths: np.ndarray, price: np.ndarray) -> np.ndarray:
+    return (matrix[:, -1] < price) & (lengths >= 1)
+
+
+@register_entry_condition('PriceCrossesUpward', {'price': (float, None)},
+                          window=lambda price: np.full(len(price), 2), aliases=(PRICE_CROSSES_UPWARD,))
+def batch_price_crosses_upward(matrix: np.ndarray, lengths: np.ndarray, price: np.ndarray) -> np.ndarray:
+    return (matrix[:, -2] < price) & (price <= matrix[:, -1]) & (lengths >= 2)
+
+
+@register_entry_condition('PriceReversesUp', {'threshold_pct': (float, 0.15), 'period': (int, 14)},
+                          window=lambda threshold_pct, period: np.maximum(period_widths(period), 2),
+                          aliases=(PRICE_REVERSES_UP,))
+def batch_price_reverses_up(matrix: np.ndarray, lengths: np.ndarray, threshold_pct: np.ndarray,
+                            period: np.ndarray) -> np.ndarray:
+    current_prices = matrix[:, -1]
+    # lowest of the window's last `period` values (the stacked rows may hold one more,
+    # and the NaN padding of shorter windows isn't part of them). A NaN among them
+    # makes it NaN and the condition False, as np.min does in price_reverses_up.
+    widths = np.minimum(period_widths(period), lengths)
+    in_period = np.arange(matrix.shape[1]) >= matrix.shape[1] - widths[:, None]
+    lowest_prices = np.where(in_period, matrix, np.inf).min(axis=1)
+    reversal_thresholds = lowest_prices * (1 + threshold_pct / 100)
+    return (current_prices > reversal_thresholds) & (current_prices > matrix[:, -2]) & (lengths >= 3)
+
+
+def register_scalar_entry_condition(name: str):
+    """Decorator setting the one-window variant of the registered condition `name`."""
+    def decorator(scalar):
+        ENTRY_CONDITION_TYPES[name].scalar = scalar
+        return scalar
+    return decorator
+
+
+# Like the batch functions, a window too short for the condition is False
+@register_scalar_entry_condition('PriceUnder')
+def scalar_price_under(last_prices: Prices, price: float) -> bool:
+    return len(last_prices) >= 1 and price_under(price, last_prices)
+
+
+@register_scalar_entry_condition('PriceCrossesUpward')
+def scalar_price_crosses_upward(last_prices: Prices, price: float) -> bool:
+    return len(last_prices) >= 2 and price_crosses_upward(price, last_prices)
+
+
+@register_scalar_entry_condition('PriceReversesUp')
+def scalar_price_reverses_up(last_prices: Prices, threshold_pct: float, period: int) -> bool:
+    return price_reverses_up(last_prices, period, threshold_pct)
+
+
+def register_streaming_entry_condition(name: str):
+    """Decorator setting the streaming variant of the registered condition `name`."""
+    def decorator(stream):
+        ENTRY_CONDITION_TYPES[name].stream = stream
+        return stream
+    return decorator
+
+
+@register_streaming_entry_condition('PriceUnder')
+def stream_price_under(prices: 'PriceStream', price: float) -> bool:
+    return prices.length >= 1 and prices.current < price
+
+
+@register_streaming_entry_condition('PriceCrossesUpward')
+def stream_price_crosses_upward(prices: 'PriceStream', price: float) -> bool:
+    return prices.length >= 2 and prices.previous < price <= prices.current
+
+
+@register_streaming_entry_condition('PriceReversesUp')
+def stream_price_reverses_up(prices: 'PriceStream', threshold_pct: float, period: int) -> bool:
+    if prices.length < 3:
+        return False
+    reversal_threshold = prices.lowest(period) * (1 + threshold_pct / 100)
+    return prices.current > reversal_threshold and prices.current > prices.previous
+
+
+def evaluate_entry_conditions(conditions: Sequence[str], windows: Sequence[Prices],
+                              parameters: Sequence[Dict[str, Any]]) -> np.ndarray:
+    """
+    Row i is the registered condition `conditions[i]` evaluated on `windows[i]`
+    (oldest price first) with `parameters[i]`, all rows of a condition type in one
+    vectorized call. Gives the same results as price_reverses_up,
+    price_crosses_upward and price_under, except that a window too short for the
+    condition (where those raise IndexError) is False, as is an unknown condition.
+    """
+    count = len(conditions)
+    satisfied = np.zeros(count, dtype=bool)
+    if not count:
+        return satisfied
+    lengths = np.fromiter(map(len, windows), dtype=np.int64, count=count)
+
+    rows_by_type: Dict[str, List[int]] = {}
+    for row, condition in enumerate(conditions):
+        rows_by_type.setdefault(condition, []).append(row)
+    for condition, rows in rows_by_type.items():
+        condition_type = ENTRY_CONDITION_TYPES.get(condition)
+        if condition_type is None:
+            continue
+        values = {}
+        for name, (value_type, default) in condition_type.parameters.items():
+            column = [parameters[row].get(name, default) for row in rows]
+            if value_type is int:
+                values[name] = np.array(column, dtype=np.int64)
+            else:
+                # a missing value (None) is NaN, which compares False
+                values[name] = np.array(column, dtype=np.float64)
+        matrix, _ = stack_price_windows([windows[row] for row in rows], condition_type.window(**values))
+        satisfied[rows] = condition_type.evaluate(matrix, lengths[rows], **values)
+    return satisfied
+
+
+class CompiledEntryCondition:
+    """
+    An order's entry condition expression, parsed and checked once: `leaves` are the
+    (condition name, parameters) it's made of and `combine` turns their results (in
+    the same order) into the expression's.
+    """
+
+    def __init__(self, expression: str, leaves: List[Tuple[str, Dict[str, Any]]],
+                 combine: Callable[[Sequence[bool]], bool]):
+        self.expression = expression
+        self.leaves = leaves
+        self.combine = combine
+        # whether PriceStream.evaluate can evaluate it
+        self.streamable = all(ENTRY_CONDITION_TYPES[name].stream is not None for name, _ in leaves)
+
+    def __repr__(self) -> str:
+        return f"CompiledEntryCondition({self.expression!r})"
+
+
+TOKEN_PATTERN = re.compile(r"\s*(?:(-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)|([A-Za-z_]\w*)|(\S))")
+OPERATORS = ('AND', 'OR', 'NOT')
+
+
+def tokenize_entry_condition(expression: str) -> List[Tuple[str, str]]:
+    tokens = []
+    for number, name, symbol in TOKEN_PATTERN.findall(expression):
+        if number:
+            tokens.append(('number', number))
+        elif name:
+            tokens.append(('operator', name.upper()) if name.upper() in OPERATORS else ('name', name))
+        elif symbol:
+            tokens.append(('symbol', symbol))
+    return tokens
+
+
+def compile_entry_condition(expression: str, defaults: Optional[Dict[str, Any]] = None) -> CompiledEntryCondition:
+    """
+    Compile an entry condition expression: registered conditions with their
+    parameters combined with AND, OR, NOT and parentheses, e.g.
+
+        PriceUnder(1.52) AND PriceReversesUp(threshold_pct=0.2)
+
+    Parameters are given in the registered order or by name; the ones left out come
+    from `defaults` (the order's legacy entry_condition_price etc.), then from the
+    registration. Raises ValueError for syntax errors, unknown conditions and
+    missing or invalid parameters.
+    """
+    tokens = tokenize_entry_condition(expression)
+    position = 0
+    leaves: List[Tuple[str, Dict[str, Any]]] = []
+
+    def peek():
+        return tokens[position] if position < len(tokens) else (None, None)
+
+    def take(kind=None, value=None):
+        nonlocal position
+        token = peek()
+        if token[0] is None or (kind and token[0] != kind) or (value and token[1] != value):
+            expected = value or kind or 'more'
+            found = token[1] if token[0] is not None else 'end of expression'
+            raise ValueError(f"Invalid entry condition {expression!r}: expected {expected}, found {found}")
+        position += 1
+        return token[1]
+
+    def parse_or():
+        operands = [parse_and()]
+        while peek() == ('operator', 'OR'):
+            take()
+            operands.append(parse_and())
+        if len(operands) == 1:
+            return operands[0]
+        return lambda results: any(operand(results) for operand in operands)
+
+    def parse_and():
+        operands = [parse_not()]
+        while peek() == ('operator', 'AND'):
+            take()
+            operands.append(parse_not())
+        if len(operands) == 1:
+            return operands[0]
+        return lambda results: all(operand(results) for operand in operands)
+
+    def parse_not():
+        if peek() == ('operator', 'NOT'):
+            take()
+            operand = parse_not()
+            return lambda results: not operand(results)
+        if peek() == ('symbol', '('):
+            take()
+            operand = parse_or()
+            take('symbol', ')')
+            return operand
+        return parse_condition()
+
+    def parse_condition():
+        name = take('name')
+        condition_type = ENTRY_CONDITION_TYPES.get(name)
+        if condition_type is None:
+            raise ValueError(f"Unknown entry condition {name!r} (choose from {', '.join(sorted(ENTRY_CONDITION_TYPES))})")
+        arguments = {}
+        if peek() == ('symbol', '('):
+            take()
+            names = list(condition_type.parameters)
+            index = 0
+            named = False
+            while peek() != ('symbol', ')'):
+                if index:
+                    take('symbol', ',')
+                if peek()[0] == 'name':
+                    parameter = take('name')
+                    take('symbol', '=')
+                    named = True
+                elif named:
+                    raise ValueError(f"{name}: positional parameter after named ones")
+                elif index < len(names):
+                    parameter = names[index]
+                else:
+                    raise ValueError(f"{name} takes at most {len(names)} parameters")
+                if parameter not in condition_type.parameters:
+                    raise ValueError(f"{name} has no parameter {parameter!r} (has {', '.join(names)})")
+                if parameter in arguments:
+                    raise ValueError(f"{name} got parameter {parameter!r} more than once")
+                arguments[parameter] = float(take('number'))
+                index += 1
+            take('symbol', ')')
+
+        values = {}
+        for parameter, (value_type, default) in condition_type.parameters.items():
+            value = arguments.get(parameter)
+            if value is None and defaults:
+                value = defaults.get(parameter)
+            if value is None:
+                value = default
+            if value is None:
+                raise ValueError(f"{name} needs a {parameter}")
+            if value_type is int and float(value) != int(value):
+                raise ValueError(f"{name} {parameter} must be a whole number, got {value}")
+            values[parameter] = value_type(value)
+        index = len(leaves)
+        leaves.append((condition_type.name, values))
+        return lambda results: bool(results[index])
+
+    combine = parse_or()
+    if position != len(tokens):
+        raise ValueError(f"Invalid entry condition {expression!r}: unexpected {tokens[position][1]}")
+    return CompiledEntryCondition(expression, leaves, combine)
+
+
+def compile_order_entry_condition(order_data: Dict[str, Any]) -> Optional[CompiledEntryCondition]:
+    """
+    The compiled entry_condition of an order, None if it has none. The order's
+    entry_condition_price, threshold_pct and period fill in the parameters an
+    expression leaves out (so legacy orders naming a single condition keep working).
+    """
+    expression = order_data.get('entry_condition')
+    if not expression:
+        return None
+    return compile_entry_condition(expression, defaults={
+        'price': order_data.get('entry_condition_price'),
+        'threshold_pct': order_data.get('threshold_pct'),
+        'period': order_data.get('period'),
+    })
+
+
+def evaluate_compiled_entry_condition(compiled: CompiledEntryCondition, window: Prices) -> bool:
+    """
+    Evaluate one order's compiled condition on its window, leaf by leaf with the
+    scalar variants (cheaper than a batch for a few orders). A condition registered
+    without one is evaluated as a batch of one.
+    """
+    results = []
+    for name, values in compiled.leaves:
+        scalar = ENTRY_CONDITION_TYPES[name].scalar
+        if scalar is not None:
+            results.append(scalar(window, **values))
+        else:
+            results.append(bool(evaluate_entry_conditions([name], [window], [values])[0]))
+    return compiled.combine(results)
+
+
+def evaluate_compiled_entry_conditions(compiled_conditions: Sequence[CompiledEntryCondition],
+                                       windows: Sequence[Prices]) -> List[bool]:
+    """Evaluate every order's compiled condition on its window, all leaves in one batch."""
+    conditions, leaf_windows, parameters = [], [], []
+    for compiled, window in zip(compiled_conditions, windows):
+        for name, values in compiled.leaves:
+            conditions.append(name)
+            leaf_windows.append(window)
+            parameters.append(values)
+    results = evaluate_entry_conditions(conditions, leaf_windows, parameters)
+
+    satisfied = []
+    offset = 0
+    for compiled in compiled_conditions:
+        satisfied.append(compiled.combine(results[offset:offset + len(compiled.leaves)]))
+        offset += len(compiled.leaves)
+    return satisfied
+
+
+class RunningMin:
+    """
+    Minimum of the last `period` values, O(1) amortized per value: only the values
+    that can still become the minimum are kept, in increasing order. It's NaN while a
+    NaN is among them, like np.min in price_reverses_up.
+    """
+
+    def __init__(self, period: int):
+        self.period = period
+        # (index, value) with increasing values; the front is the minimum
+        self.candidates: deque = deque()
+        self.count = 0
+        self.last_nan_index: Optional[int] = None
+
+    def update(self, value: float):
+        index = self.count
+        self.count += 1
+        if self.candidates and self.candidates[0][0] <= index - self.period:
+            self.candidates.popleft()
+        if math.isnan(value):
+            self.last_nan_index = index
+            return
+        while self.candidates and self.candidates[-1][1] >= value:
+            self.candidates.pop()
+        self.candidates.append((index, value))
+
+    def value(self) -> float:
+        if not self.candidates or (self.last_nan_index is not None and self.last_nan_index > self.count - 1 - self.period):
+            return math.nan
+        return self.candidates[0][1]
+
+
+class PriceStream:
+    """
+    One pair's last `capacity` prices as the streaming entry conditions need them,
+    updated one price at a time: the last two prices and a RunningMin per period the
+    conditions asked for (a period of 0, or above the capacity, covers all `capacity`
+    prices, like a price buffer's window). Evaluating a condition is then O(1)
+    instead of a pass over the window.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.history: deque = deque(maxlen=capacity)
+        self.running_mins: Dict[int, RunningMin] = {}
+        self.previous = math.nan
+        self.current = math.nan
+
+    @property
+    def length(self) -> int:
+        return len(self.history)
+
+    def update(self, price: float):
+        price = float(price)
+        self.history.append(price)
+        self.previous, self.current = self.current, price
+        for running_min in self.running_mins.values():
+            running_min.update(price)
+
+    def extend(self, prices: Prices):
+        for price in np.asarray(prices, dtype=np.float64)[-self.capacity:].tolist():
+            self.update(price)
+
+    def lowest(self, period: int) -> float:
+        """Lowest of the last `period` prices."""
+        period = period if 0 < period < self.capacity else self.capacity
+        running_min = self.running_mins.get(period)
+        if running_min is None:
+            # first use of this period: seed it from the prices kept
+            running_min = self.running_mins[period] = RunningMin(period)
+            for price in self.history:
+                running_min.update(price)
+        return running_min.value()
+
+    def evaluate(self, compiled: 'CompiledEntryCondition') -> bool:
+        results = []
+        for name, values in compiled.leaves:
+            condition_type = ENTRY_CONDITION_TYPES[name]
+            if condition_type.stream is None:
+                raise ValueError(f"Entry condition {name} has no streaming variant")
+            results.append(condition_type.stream(self, **values))
+        return compiled.combine(results)
+
+
+class EntryConditionStreams:
+    """
+    A PriceStream per pair, created on the pair's first price, or kept in step with
+    the pair's price buffer by sync.
+    """
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self.streams: Dict[str, PriceStream] = {}
+        # pair -> price buffer position (resets, writes) its stream was synced to
+        self.positions: Dict[str, Tuple[int, int]] = {}
+
+    def get(self, pair: str) -> PriceStream:
+        stream = self.streams.get(pair)
+        if stream is None:
+            stream = self.streams[pair] = PriceStream(self.capacity)
+        return stream
+
+    def update(self, pair: str, price: float):
+        self.get(pair).update(price)
+
+    def sync(self, pair: str, prices: Prices, resets: int, writes: int) -> PriceStream:
+        """
+        The pair's stream fed the values of its price buffer's window `prices` it
+        hasn't seen yet, the buffer being at position (resets, writes) (see
+        PriceRingBuffer.position). Rebuilt from the window after the buffer was reset
+        or when values were missed.
+        """
+        stream = self.streams.get(pair)
+        position = self.positions.get(pair)
+        if stream is None or position is None or position[0] != resets or not 0 <= writes - position[1] <= len(prices):
+            stream = self.streams[pair] = PriceStream(self.capacity)
+            stream.extend(prices)
+        elif writes > position[1]:
+            stream.extend(prices[len(prices) - (writes - position[1]):])
+        self.positions[pair] = (resets, writes)
+        return stream
+
+    def evaluate(self, pair: str, compiled: 'CompiledEntryCondition') -> bool:
+        return self.get(pair).evaluate(compiled)
+
+    def remove(self, pair: str):
+        self.streams.pop(pair, None)
+        self.positions.pop(pair, None)
@@ -0,0 +1,193 @@
+from typing import Any, Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+
+# Exit reasons of ma_trailing_exit; code i + 1 in ExitSimulation.reason_codes, 0 is no exit
+EXIT_REASONS = (
+    'auto_sell_at_take_profit',
+    'tight_trailing_stop_loss',
+    'loose_stop_loss_trailing',
+    'loose_stop_loss_static',
+)
+
+ArrayLike = Union[np.ndarray, Sequence[float], float]
+
+# Trades × candles per simulate_ma_trailing_exits block (~10 arrays of this many float64s)
+MAX_BLOCK_CELLS = 2_000_000
+
+
+def ma_trailing_exit(ma: float, current_rate: float, open_rate: float, highest_ma: float, take_profit_hit: bool,
+                     loose_stop_loss: float, is_loose_stop_loss_trailing: bool, tight_trailing_stop_loss: float,
+                     take_profit: float) -> Tuple[Optional[str], Dict[str, Any]]:
+    """
+    The exit rule of MATrailingStopLossStrategy.custom_exit for one call: a loose stop
+    loss (trailing the highest MA since entry, or static below the open rate) until the
+    MA is more than `take_profit` % above the open rate, then a tight trailing stop
+    below the highest MA, or an immediate exit when tight_trailing_stop_loss is 0.
+
+    Returns the exit reason (None to stay in the trade) and the order fields to update
+    (highest_ma, take_profit_hit).
+    """
+    pct_diff = ((ma - open_rate) / open_rate) * 100
+
+    # Changes to the order data
+    updates = {}
+
+    if not highest_ma:
+        highest_ma = ma
+
+    # If current MA is higher than the recorded highest MA, update the highest MA
+    if ma >= highest_ma:
+        highest_ma = ma
+        updates['highest_ma'] = highest_ma
+
+    # Check if the take profit has been hit to switch to tight trailing stop loss
+    above_tp = pct_diff > take_profit
+    if not take_profit_hit and above_tp:
+        updates['take_profit_hit'] = True
+
+    # Calculate the trailing stop loss based on the highest MA
+    exit_reason = None
+    if above_tp:
+        if tight_trailing_stop_loss == 0:
+            exit_reason = 'auto_sell_at_take_profit'
+        else:
+            tsl = highest_ma * (1 - tight_trailing_stop_loss / 100)
+            if current_rate < tsl:
+                exit_reason = 'tight_trailing_stop_loss'
+    else:
+        if is_loose_stop_loss_trailing:
+            tsl = highest_ma * (1 - loose_stop_loss / 100)
+            if current_rate < tsl:
+                exit_reason = 'loose_stop_loss_trailing'
+        else:
+            is_below_loose_stop_loss = pct_diff < -loose_stop_loss
+            if is_below_loose_stop_loss:
+                exit_reason = 'loose_stop_loss_static'
+
+    return exit_reason, updates
+
+
+class ExitSimulation:
+    """
+    simulate_ma_trailing_exits' result, one value per trade: the candle the trade
+    exits at (-1 if it doesn't), the exit reason, the profit % at that candle's close
+    and the order's highest_ma and take_profit_hit at the end.
+    """
+
+    def __init__(self, exit_index: np.ndarray, reason_codes: np.ndarray, profit: np.ndarray,
+                 highest_ma: np.ndarray, take_profit_hit: np.ndarray):
+        self.exit_index = exit_index
+        self.reason_codes = reason_codes
+        self.profit = profit
+        self.highest_ma = highest_ma
+        self.take_profit_hit = take_profit_hit
+
+    def __len__(self) -> int:
+        return len(self.exit_index)
+
+    @property
+    def reasons(self) -> np.ndarray:
+        """The exit reasons as strings, None where a trade doesn't exit."""
+        return np.array((None,) + EXIT_REASONS, dtype=object)[self.reason_codes]
+
+
+def simulate_ma_trailing_exits(close: np.ndarray, ma: np.ndarray, entry_index: ArrayLike, open_rate: ArrayLike,
+                               loose_stop_loss: ArrayLike, is_loose_stop_loss_trailing: ArrayLike,
+                               tight_trailing_stop_loss: ArrayLike, take_profit: ArrayLike,
+                               highest_ma: ArrayLike = 0.0, take_profit_hit: ArrayLike = False,
+                               series: Optional[ArrayLike] = None, max_candles: Optional[ArrayLike] = None,
+                               block_size: int = 16, max_block_size: int = 4096,
+                               max_block_cells: int = MAX_BLOCK_CELLS) -> ExitSimulation:
+    """
+    Replay candles through ma_trailing_exit for many trades at once, as if custom_exit
+    were called once per candle with current_rate = the candle's close, from the
+    trade's entry_index on (for at most max_candles candles). Each trade's order fields
+    (highest_ma, take_profit_hit) start at the given values and are updated as the
+    strategy would; the rules are computed with the same float64 operations, so every
+    exit is the one ma_trailing_exit would give.
+
+    `close` and `ma` are one price series or a matrix with one series per row, the
+    latter with `series` giving each trade's row. All per-trade arguments are arrays
+    (or scalars for all trades). The trades still open are evaluated a block of
+    candles at a time, the highest MA carried over from block to block; blocks start
+    at `block_size` candles (most trades exit early) and double up to `max_block_size`,
+    but a block never has more than `max_block_cells` trades × candles (about ten
+    float64 arrays of that size are alive at once), so memory stays bounded however
+    many trades are still open.
+    """
+    close = np.atleast_2d(np.asarray(close, dtype=np.float64))
+    ma = np.atleast_2d(np.asarray(ma, dtype=np.float64))
+    if close.shape != ma.shape:
+        raise ValueError(f"close and ma must have the same shape, got {close.shape} and {ma.shape}")
+    entry_index = np.atleast_1d(np.asarray(entry_index, dtype=np.int64))
+    count = len(entry_index)
+    candles = close.shape[1]
+
+    def per_trade(values, dtype):
+        return np.broadcast_to(np.asarray(values, dtype=dtype), (count,))
+
+    rows = per_trade(0 if series is None else series, np.int64)
+    open_rate = per_trade(open_rate, np.float64)
+    loose_stop_loss = per_trade(loose_stop_loss, np.float64)
+    trailing = per_trade(is_loose_stop_loss_trailing, bool)
+    tight_trailing_stop_loss = per_trade(tight_trailing_stop_loss, np.float64)
+    take_profit = per_trade(take_profit, np.float64)
+    ends = np.full(count, candles, dtype=np.int64) if max_candles is None else \
+        np.minimum(entry_index + per_trade(max_candles, np.int64), candles)
+
+    # a highest_ma of 0 is unset: NaN is ignored by fmax, like `if not highest_ma`
+    initial_highest = per_trade(highest_ma, np.float64)
+    highest = np.where(initial_highest != 0, initial_highest, np.nan)
+    tp_hit = per_trade(take_profit_hit, bool).copy()
+    exit_index = np.full(count, -1, dtype=np.int64)
+    reason_codes = np.zeros(count, dtype=np.int8)
+
+    active = np.flatnonzero(entry_index < ends)
+    offset = 0
+    while len(active):
+        size = min(block_size, max(1, max_block_cells // len(active)))
+        columns = entry_index[active, None] + offset + np.arange(size)
+        valid = columns < ends[active, None]
+        columns = np.minimum(columns, candles - 1)
+        trade_rows = rows[active, None]
+        block_ma = np.where(valid, ma[trade_rows, columns], np.nan)
+        block_close = close[trade_rows, columns]
+        trade_open_rate = open_rate[active, None]
+
+        pct_diff = ((block_ma - trade_open_rate) / trade_open_rate) * 100
+        block_highest = np.fmax.accumulate(np.concatenate((highest[active, None], block_ma), axis=1), axis=1)[:, 1:]
+        above_tp = pct_diff > take_profit[active, None]
+        tight = tight_trailing_stop_loss[active, None]
+        loose = loose_stop_loss[active, None]
+        is_trailing = trailing[active, None]
+
+        codes = np.zeros(block_ma.shape, dtype=np.int8)
+        codes[above_tp & (block_close < block_highest * (1 - tight / 100))] = 2
+        codes[above_tp & (tight == 0)] = 1
+        codes[~above_tp & is_trailing & (block_close < block_highest * (1 - loose / 100))] = 3
+        codes[~above_tp & ~is_trailing & (pct_diff < -loose)] = 4
+        codes[~valid] = 0
+
+        exits = codes != 0
+        exited = exits.any(axis=1)
+        first = np.where(exited, exits.argmax(axis=1), size - 1)
+        # the order's fields as written up to (and including) the exit candle
+        last = np.arange(len(active))
+        highest[active] = block_highest[last, first]
+        tp_hit[active] |= (np.cumsum(above_tp & valid, axis=1)[last, first] > 0)
+
+        exited_trades = active[exited]
+        exit_index[exited_trades] = entry_index[exited_trades] + offset + first[exited]
+        reason_codes[exited_trades] = codes[last[exited], first[exited]]
+
+        offset += size
+        block_size = min(block_size * 2, max_block_size)
+        active = active[~exited & (entry_index[active] + offset < ends[active])]
+
+    profit = np.full(count, np.nan)
+    exited_trades = np.flatnonzero(exit_index >= 0)
+    exit_prices = close[rows[exited_trades], exit_index[exited_trades]]
+    profit[exited_trades] = ((exit_prices - open_rate[exited_trades]) / open_rate[exited_trades]) * 100
+    return ExitSimulation(exit_index, reason_codes, profit, np.where(np.isnan(highest), 0.0, highest), tp_hit)
@@ -1,16 +1,20 @@
+from contextlib import contextmanager
 from datetime import datetime
 import json
-import time
-from typing import Any, Dict, Optional
+import os
+from typing import Any, Callable, Dict, Iterator, Optional, Set, Tuple
 from freqtrade.persistence.trade_model import Order, Trade
 from freqtrade.strategy.interface import IStrategy
 from pandas import DataFrame
 import numpy as np
-import pandas_ta as pta
-from custom_order_form_handler import OrderStatus, StrategyDataHandler, ACTIVE_ORDER_STATUSES_VALUES
-from entry_conditions import price_crosses_upward, price_reverses_up, price_under
+from custom_order_form_handler import OrderStatus, ACTIVE_ORDER_STATUSES_VALUES, INACTIVE_ORDER_STATUSES_VALUES, REVISION_KEY, RevisionConflictError, create_strategy_data_handler
+from order_records import OrderRecord
+from entry_conditions import CompiledEntryCondition, EntryConditionStreams, compile_order_entry_condition, evaluate_compiled_entry_condition, evaluate_compiled_entry_conditions
+from price_ring_buffer import PriceBufferStore
+from monitor_scheduler import MonitorScheduler
+from indicator_engine import INDICATOR_CACHE, IndicatorEngine
 from dateutil import parser
-import threading
+import time
 import logging
 
 
@@ -22,15 +26,72 @@ class FileLoadingStrategy(IStrategy):
     # Default parameters
     stoploss = -1.0
 
+    # Number of MA values kept per pair for the entry conditions
+    price_buffer_size = 100
+
+    # Typed schema of this strategy's order data, see order_records
+    order_record_class = OrderRecord
+
+    # The monitor checks a WAITING order when the order store changes, when the pair
+    # gets a new candle and at its entry_condition_timeout; without any of these it
+    # still re-checks everything after this many seconds
+    monitor_interval = 31
+
+    # From this many WAITING orders on, the monitor evaluates their entry conditions
+    # in one batch; below, one order at a time on the pair's PriceStream is faster
+    # (see bench_entry_conditions.py)
+    entry_condition_batch_min_pairs = 100
+
+    # Order fields set_dfile_args writes right away instead of buffering them until the
+    # next iteration: a restart in between must not lose a status change or the switch
+    # to the take profit's trailing stop
+    immediate_order_fields = frozenset(('status', 'take_profit_hit'))
+
     def __init__(self, config) -> None:
         """
         Initialize the strategy with the given configuration.
         """
         super().__init__(config)
         self.strategy_name = self.__class__.__name__
-        self.order_handler = StrategyDataHandler(
-            strategy_name=self.strategy_name)
+        # 'json' (default), 'sqlite' or 'sharded', see custom_order_form_handler.STORAGE_BACKENDS
+        # 'json' (default), 'orjson' or 'msgpack', see order_serializers.ORDER_SERIALIZERS
+        self.order_handler = create_strategy_data_handler(
+            strategy_name=self.strategy_name,
+            backend=config.get('order_storage_backend'),
+            serializer=config.get('order_file_serializer'))
+        # Log order store lock/parse timings and the monitor's loop lag every N seconds
+        # (and optionally write the former to a Prometheus text file), disabled by default
+        self.metrics_interval = metrics_interval = config.get('order_store_metrics_interval')
+        if metrics_interval:
+            self.order_handler.enable_metrics().start_reporting(
+                metrics_interval, metrics_file=config.get('order_store_metrics_file'))
+        # Per-pair MA series shared with the monitor thread, kept out of the order file
+        self.price_buffers = PriceBufferStore(
+            os.path.join(self.order_handler.base_dir, f"PRICE_BUFFERS_{self.strategy_name}"),
+            capacity=self.price_buffer_size)
+        # Running EMA/HMA state per pair, see moving_average; results are shared
+        # with other strategies in this process through INDICATOR_CACHE
+        self.indicator_engine = IndicatorEngine()
+        self.next_indicator_cache_report = 0.0
         self.monitoring_initialized = False
+        self.monitor_scheduler: Optional[MonitorScheduler] = None
+        # returned by order_handler.subscribe, called by stop_monitoring
+        self.unsubscribe_order_changes: Optional[Callable[[], None]] = None
+        # pair -> (entry_condition_timeout as stored, parsed to epoch seconds)
+        self.entry_timeouts: Dict[str, Tuple[str, float]] = {}
+        # pair -> (the order's revision and condition fields, compiled entry condition)
+        self.entry_conditions: Dict[str, Tuple[tuple, Optional[CompiledEntryCondition]]] = {}
+        # Running minimums etc. per WAITING pair, fed from its price buffer, see evaluate_entry_condition
+        self.entry_condition_streams = EntryConditionStreams(self.price_buffer_size)
+        # All orders as read once in bot_loop_start, what the callbacks of that
+        # iteration see. None until the first iteration: reads go to the store.
+        self.order_snapshot: Optional[Dict[str, Dict[str, Any]]] = None
+        # Records built from order_snapshot, see get_order_record
+        self.order_snapshot_records: Dict[str, OrderRecord] = {}
+        # pair -> values from set_dfile_args, written at the start of the next iteration
+        self.pending_order_updates: Dict[str, Dict[str, Any]] = {}
+        # pair -> validation error of its order data, see get_order_record
+        self.invalid_orders: Dict[str, str] = {}
         
     def input_strategy_data(self, pair: str):
         """
@@ -46,22 +107,80 @@ class FileLoadingStrategy(IStrategy):
         """
         raise NotImplementedError
 
+    def get_order_data(self, pair) -> Optional[Dict[str, Any]]:
+        """
+        A copy of the pair's order data as of this bot iteration's snapshot (including
+        its buffered updates), None if it has none.
+        """
+        if self.order_snapshot is None:
+            return self.order_handler.read_pair_data(pair)
+        data = self.order_snapshot.get(pair)
+        return dict(data) if data is not None else None
+
     def does_pair_have_data(self, pair) -> bool:
-        data = self.order_handler.read_strategy_data()
-        return pair in data
+        return self.get_order_data(pair) is not None
 
     def get_pair_data(self, pair) -> Dict[str, Any]:
-        if not self.does_pair_have_data(pair):
+        data = self.get_order_data(pair)
+        if data is None:
             raise LookupError(f"{pair} doesn't have data yet!")
-        return self.order_handler.read_strategy_data()[pair]
+        return data
 
     def does_pair_have_active_order(self, pair) -> bool:
-        if self.does_pair_have_data(pair):
-            data = self.get_pair_data(pair)
-            if data['status'] in ACTIVE_ORDER_STATUSES_VALUES:
-                return True
+        data = self.get_order_data(pair)
+        if data is not None and data['status'] in ACTIVE_ORDER_STATUSES_VALUES:
+            return True
         return False
 
+    def get_order_record(self, pair) -> Optional[OrderRecord]:
+        """
+        The pair's order data as an `order_record_class` instance, None if it has none.
+        Parsed and validated once per change of the data; read-only. An order that
+        doesn't fit the schema (e.g. edited by hand) is logged and treated as missing,
+        so one bad order doesn't break the callbacks for the others.
+        """
+        try:
+            if self.order_snapshot is None:
+                record = self.order_handler.read_pair_record(pair, self.order_record_class)
+            else:
+                record = self.order_snapshot_records.get(pair)
+                if record is None:
+                    data = self.order_snapshot.get(pair)
+                    if data is None:
+                        return None
+                    record = self.order_snapshot_records[pair] = self.order_record_class.from_dict(data)
+        except ValueError as e:
+            # logged once per distinct error, the callbacks ask for the record every candle
+            if self.invalid_orders.get(pair) != str(e):
+                self.invalid_orders[pair] = str(e)
+                logging.error(f"Invalid order data for {pair}, skipped until it's fixed: {e}")
+            return None
+        self.invalid_orders.pop(pair, None)
+        return record
+
+    def moving_average(self, pair: str, dataframe: DataFrame, ma_type: str, ma_period: int) -> np.ndarray:
+        """
+        EMA or HMA of dataframe['close'], one value per row. Only the candles added
+        since the pair's previous dataframe are computed, see indicator_engine.
+        """
+        return self.indicator_engine.moving_average(pair, self.timeframe, ma_type, ma_period, dataframe)
+
+    def moving_average_slope(self, pair: str, dataframe: DataFrame, ma_type: str, ma_period: int,
+                             slope_period: int) -> np.ndarray:
+        """
+        indicators.calculate_slope of moving_average(...) over `slope_period` candles,
+        also computed for the new candles only.
+        """
+        return self.indicator_engine.moving_average_slope(pair, self.timeframe, ma_type, ma_period, slope_period,
+                                                          dataframe)
+
+    def validate_order_data(self, order_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Check and normalize a new order's values against the strategy's schema."""
+        order_data = self.order_record_class.validate_fields(order_data)
+        # raises ValueError for an entry condition expression the monitor couldn't evaluate
+        compile_order_entry_condition(order_data)
+        return order_data
+
     def get_dfile_arg(self, pair, key):
         data = self.get_pair_data(pair)
         if key in data:
@@ -69,87 +188,226 @@ class FileLoadingStrategy(IStrategy):
         return None
 
     def set_dfile_arg(self, pair, key, value):
-        data = self.order_handler.read_strategy_data()
-        if not self.does_pair_have_data(pair):
-            data[pair] = {}
-        data[pair][key] = value
-        
+        self.set_dfile_args(pair, **{key: value})
 
-        self.order_handler.save_strategy_data(data)
+    def set_dfile_args(self, pair, **values):
+        """
+        Set several keys of a pair's order data. Within a bot iteration the values are
+        buffered (visible to the following reads right away) and written with the
+        pair's other updates when the next iteration starts; changes of
+        immediate_order_fields (status, take_profit_hit) are written immediately.
+        """
+        values = self.order_record_class.validate_fields(values)
+        if self.order_snapshot is None or not self.immediate_order_fields.isdisjoint(values):
+            with self.order_transaction(pair) as data:
+                data.update(values)
+            return
+
+        self.pending_order_updates.setdefault(pair, {}).update(values)
+        self.order_snapshot[pair] = {**self.order_snapshot.get(pair, {}), **values}
+        self.order_snapshot_records.pop(pair, None)
+
+    @contextmanager
+    def order_transaction(self, pair) -> Iterator[Dict[str, Any]]:
+        """
+        order_handler.transaction that also writes the pair's buffered updates and
+        keeps this iteration's snapshot in step with what was written.
+        """
+        pending = self.pending_order_updates.pop(pair, None)
+        with self.order_handler.transaction(pair) as data:
+            if pending:
+                self.merge_order_updates(pair, data, pending)
+            yield data
+        if self.order_snapshot is not None:
+            if data and data.get('status') not in INACTIVE_ORDER_STATUSES_VALUES:
+                self.order_snapshot[pair] = dict(data)
+            else:
+                # moved to the completed trades
+                self.order_snapshot.pop(pair, None)
+            self.order_snapshot_records.pop(pair, None)
+
+    def merge_order_updates(self, pair, data: Dict[str, Any], values: Dict[str, Any]):
+        """
+        Apply updates buffered by set_dfile_args to the pair's stored order `data`. They
+        are dropped if the order's status changed since the snapshot they were based on
+        (exited, cancelled, removed or replaced meanwhile, e.g. from the CLI).
+        """
+        expected_status = (self.order_snapshot or {}).get(pair, {}).get('status')
+        if data.get('status') != expected_status:
+            logging.info(f"{pair}: order changed to {data.get('status')} meanwhile, "
+                         f"dropping the update of {sorted(values)}")
+            return
+        data.update(values)
+
+    def flush_order_updates(self):
+        """Write the updates buffered by set_dfile_args, one transaction per pair."""
+        pending_order_updates, self.pending_order_updates = self.pending_order_updates, {}
+        for pair, values in pending_order_updates.items():
+            try:
+                with self.order_handler.transaction(pair) as data:
+                    self.merge_order_updates(pair, data, values)
+            except Exception as e:
+                logging.error(f"{pair}: could not write order updates {values}: {e}")
 
     def bot_loop_start(self, current_time: datetime, **kwargs) -> None:
         if not self.monitoring_initialized:
             self.start_monitoring()
             self.monitoring_initialized = True
 
-    def start_monitoring(self):
-        monitor_thread = threading.Thread(target=self.monitor_entry_conditions)
-        monitor_thread.start()
-
-    # Ensure last_prices is a list in monitor_entry_conditions
-
-
-    def monitor_entry_conditions(self):
-        while True:
-            strategy_data = self.order_handler.read_strategy_data()
-
-            for pair, data in strategy_data.items():
-                if data['status'] == OrderStatus.WAITING.value:
-                    condition_type = data['entry_condition']
-                    entry_condition_timeout = data['entry_condition_timeout']
-                    entry_condition_price = data.get('entry_condition_price')
-                    threshold_pct = data.get('threshold_pct', 0.15)
-                    ma_type = data.get('ma_type', 'EMA')
-                    period = data.get('period', 14)
-
-                    # USING EMA/HMA NOT CLOSE!
-                    last_prices = data.get('prices', [])
-                    
-                    # Check if prices is a LIST filled with price data!
-                    if not isinstance(last_prices, list) or len(last_prices) < 10 or not all(isinstance(price, (int, float)) for price in last_prices):
-                        logging.error(f"Invalid data type or insufficient data in last_prices: {type(last_prices)} for {pair}")
-                        continue
-
-
-                    # Check the condition
-                    if condition_type == 'PriceReversesUpCondition':
-                        is_satisfied = price_reverses_up(
-                            last_prices=last_prices,
-                            period=period,
-                            threshold_pct=threshold_pct,
-                        )
-                    elif condition_type == 'PriceCrossesUpwardCondition':
-                        if not entry_condition_price:
-                            logging.error(f"Missing entry_condition_price for pair {pair}: {data}")
-                            continue
-                        is_satisfied = price_crosses_upward(
-                            entry_condition_price,
-                            last_prices=last_prices
-                        )
-                    elif condition_type == 'PriceUnderCondition':
-                        if not entry_condition_price:
-                            logging.error(f"Missing entry_condition_price for pair {pair}: {data}")
-                            continue
-                        is_satisfied = price_under(
-                            entry_condition_price,
-                            last_prices=last_prices
-                        )
-                    else:
-                        logging.error(f"Invalid condition type for pair {pair}: {data}")
-                        continue
-                    
-                    if is_satisfied:
-                        data['status'] = OrderStatus.PENDING.value
-
-                    if entry_condition_timeout and datetime.now() >= parser.parse(entry_condition_timeout):
-                        data['status'] = OrderStatus.CANCELED.value
-
-                    self.order_handler.update_strategy_data(pair, data)
-
-                # SLEEP 2x per min!
-            time.sleep(31)
+        if self.metrics_interval and time.monotonic() >= self.next_indicator_cache_report:
+            if self.next_indicator_cache_report:
+                logging.info(INDICATOR_CACHE.format_log_line())
+            self.next_indicator_cache_report = time.monotonic() + self.metrics_interval
 
+        # write the last iteration's updates, then read all orders once for this one
+        self.flush_order_updates()
+        self.order_snapshot = self.order_handler.read_strategy_data()
+        self.order_snapshot_records = {}
 
+    def start_monitoring(self):
+        self.monitor_scheduler = MonitorScheduler(
+            self.monitor_entry_conditions, name=f"{self.strategy_name} entry monitor",
+            max_idle=self.monitor_interval, report_interval=self.metrics_interval)
+        # new or edited WAITING orders (e.g. from manage_custom_orders) are checked right away
+        self.unsubscribe_order_changes = self.order_handler.subscribe(
+            lambda file_path: self.monitor_scheduler.wakeup())
+        # and a pair's order as soon as populate_indicators wrote its new candle
+        self.price_buffers.on_update = self.monitor_scheduler.wakeup
+        self.monitor_scheduler.start()
+
+    def stop_monitoring(self):
+        if self.monitor_scheduler is not None:
+            if self.unsubscribe_order_changes is not None:
+                self.unsubscribe_order_changes()
+                self.unsubscribe_order_changes = None
+            self.price_buffers.on_update = None
+            self.monitor_scheduler.stop()
+            self.monitor_scheduler = None
+            self.monitoring_initialized = False
+
+    def get_entry_timeout(self, pair: str, entry_condition_timeout: Optional[str]) -> Optional[float]:
+        """entry_condition_timeout as epoch seconds, parsed once per value."""
+        if not entry_condition_timeout:
+            self.entry_timeouts.pop(pair, None)
+            return None
+        cached = self.entry_timeouts.get(pair)
+        if cached is None or cached[0] != entry_condition_timeout:
+            # naive timestamps are local time, as entered in the CLI
+            cached = (entry_condition_timeout, parser.parse(entry_condition_timeout).timestamp())
+            self.entry_timeouts[pair] = cached
+        return cached[1]
+
+    def monitor_entry_conditions(self, pairs: Optional[Set[str]] = None):
+        """
+        One monitor round (run by monitor_scheduler): check the entry condition and
+        timeout of the WAITING orders of `pairs`, or of all WAITING orders if None.
+        """
+        # only the WAITING orders, looked up in the status index
+        strategy_data = self.order_handler.read_strategy_data(statuses=[OrderStatus.WAITING.value])
+        checked_pairs = set(strategy_data) if pairs is None else pairs
+        for pair in list(self.entry_timeouts):
+            if pair not in strategy_data and (pairs is None or pair in pairs):
+                # no longer WAITING: entered, cancelled or removed
+                self.entry_timeouts.pop(pair)
+                self.monitor_scheduler.cancel_timeout(pair)
+        for pair in list(self.entry_conditions):
+            if pair not in strategy_data and (pairs is None or pair in pairs):
+                self.entry_conditions.pop(pair)
+                self.entry_condition_streams.remove(pair)
+
+        # orders whose condition is evaluated: (pair, data, compiled condition, prices view, prices sequence)
+        candidates = []
+        new_statuses = {}
+        for pair in sorted(checked_pairs):
+            data = strategy_data.get(pair)
+            if data is None:
+                continue
+            try:
+                if self.is_entry_timed_out(pair, data):
+                    new_statuses[pair] = OrderStatus.CANCELED.value
+                    continue
+            except ValueError as e:
+                logging.error(f"Invalid entry_condition_timeout for pair {pair}: {e}")
+                continue
+
+            try:
+                entry_condition = self.get_entry_condition(pair, data)
+            except ValueError as e:
+                logging.error(f"Invalid entry condition for pair {pair}: {e}")
+                continue
+            if entry_condition is None:
+                logging.error(f"Missing entry condition for pair {pair}: {data}")
+                continue
+
+            # USING EMA/HMA NOT CLOSE! (zero-copy view of the pair's price buffer)
+            last_prices, prices_sequence = self.price_buffers.read(pair)
+
+            # Check if the buffer holds enough price data!
+            if last_prices is None or len(last_prices) < 10:
+                logging.error(f"Insufficient data in last_prices: {0 if last_prices is None else len(last_prices)} values for {pair}")
+                continue
+            candidates.append((pair, data, entry_condition, last_prices, prices_sequence))
+
+        if len(candidates) >= self.entry_condition_batch_min_pairs:
+            # all conditions in a few vectorized calls, see entry_conditions.evaluate_entry_conditions
+            satisfied = evaluate_compiled_entry_conditions(
+                [entry_condition for _, _, entry_condition, _, _ in candidates],
+                [last_prices for _, _, _, last_prices, _ in candidates])
+        else:
+            satisfied = [self.evaluate_entry_condition(pair, entry_condition, last_prices, prices_sequence)
+                         for pair, _, entry_condition, last_prices, prices_sequence in candidates]
+        for (pair, data, _, _, prices_sequence), is_satisfied in zip(candidates, satisfied):
+            # the strategy wrote new prices while we evaluated; that write also woke the
+            # scheduler for this pair, so it is checked again right after this round
+            if is_satisfied and not self.price_buffers.changed_since(pair, prices_sequence):
+                new_statuses[pair] = OrderStatus.PENDING.value
+
+        for pair, new_status in new_statuses.items():
+            data = strategy_data[pair]
+            # commit only if the record is still the one evaluated; if e.g. the order
+            # was edited meanwhile, it is re-evaluated in the next round
+            try:
+                self.order_handler.compare_and_swap(
+                    pair, data.get(REVISION_KEY, 0), {**data, 'status': new_status})
+            except RevisionConflictError:
+                logging.info(f"Order for {pair} changed while checking its entry condition, retrying")
+                self.monitor_scheduler.wakeup(pair)
+
+    def evaluate_entry_condition(self, pair: str, entry_condition: CompiledEntryCondition,
+                                 last_prices: np.ndarray, prices_sequence: int) -> bool:
+        """
+        One order's entry condition, on the pair's PriceStream (only the candles added
+        to the price buffer since the last round are fed to it) if the condition has
+        streaming variants, else on the buffer's window.
+        """
+        if entry_condition.streamable:
+            resets, writes = self.price_buffers.position(pair)
+            # the position only belongs to the window if nothing was written meanwhile
+            if not self.price_buffers.changed_since(pair, prices_sequence):
+                stream = self.entry_condition_streams.sync(pair, last_prices, resets, writes)
+                return stream.evaluate(entry_condition)
+        return evaluate_compiled_entry_condition(entry_condition, last_prices)
+
+    def get_entry_condition(self, pair: str, data: Dict[str, Any]) -> Optional[CompiledEntryCondition]:
+        """The order's entry condition, compiled once per order revision."""
+        cached = self.entry_conditions.get(pair)
+        key = tuple(data.get(field) for field in (
+            REVISION_KEY, 'entry_condition', 'entry_condition_price', 'threshold_pct', 'period'))
+        if cached is None or cached[0] != key:
+            cached = (key, compile_order_entry_condition(data))
+            self.entry_conditions[pair] = cached
+        return cached[1]
+
+    def is_entry_timed_out(self, pair: str, data: Dict[str, Any]) -> bool:
+        """Whether the WAITING order's entry_condition_timeout passed; schedules a wakeup for it otherwise."""
+        entry_condition_timeout = self.get_entry_timeout(pair, data['entry_condition_timeout'])
+        if entry_condition_timeout is None:
+            return False
+        if time.time() >= entry_condition_timeout:
+            return True
+        # wake up for the timeout even if no new candle arrives
+        self.monitor_scheduler.schedule_timeout(pair, entry_condition_timeout)
+        return False
 
     def populate_entry_trend(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
         pair = metadata['pair']
@@ -157,19 +415,15 @@ class FileLoadingStrategy(IStrategy):
         price = last_candle['close']
 
         
-        strategy_data = self.order_handler.read_strategy_data()
+        pair_data = self.get_order_data(pair)
 
         # only enter if PENDING pair!
-        if pair in strategy_data and strategy_data[pair]['status'] == OrderStatus.PENDING.value:
+        if pair_data is not None and pair_data['status'] == OrderStatus.PENDING.value:
             # Enter trade freqtrade bot
-            self.set_entry_signal(pair, dataframe, strategy_data[pair])
-            
-            # write variabels to saved log
-            strategy_data[pair]['status'] = OrderStatus.HOLDING.value
-            strategy_data[pair]['entry_price'] = price
+            self.set_entry_signal(pair, dataframe, pair_data)
             
-            # write to file
-            self.order_handler.update_strategy_data(pair, strategy_data[pair])
+            # write variabels to saved log (single write)
+            self.set_dfile_args(pair, status=OrderStatus.HOLDING.value, entry_price=price)
             
         else:
             self.set_no_entry(dataframe)
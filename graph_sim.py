@@ -1,7 +1,16 @@
+import itertools
+from typing import Dict, List, Sequence, Tuple, Union
+
 import numpy as np
 import pandas as pd
 #import matplotlib.pyplot as plt
 
+from indicators import window_sums
+
+
+# One combination of the sweep: (ma_type, period, n, dip_depth)
+Parameters = Tuple[str, int, int, float]
+
 
 def calculate_ema(prices, period):
     return prices.ewm(span=period, adjust=False).mean()
@@ -20,18 +29,125 @@ def calculate_slope(ma, n):
     return (ma.iloc[-1] - ma.iloc[-n]) / n
 
 
-def apply_strategy(prices, ma_type='EMA', period=14, n=3, dip_depth=0):
-    if ma_type.upper() == 'EMA':
-        ma = calculate_ema(prices, period)
-    elif ma_type.upper() == 'HMA':
-        ma = calculate_hma(prices, period)
-    else:
-        raise ValueError("MA Type must be 'EMA' or 'HMA'")
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    pandas' rolling(window).mean() along the last axis: NaN for the first window - 1
+    values, for windows containing a NaN and everywhere for a window below 1. Uses running sums (O(n) whatever the
+    window) on the values minus their row's mean, which keeps the sums small.
+    """
+    result = np.full(values.shape, np.nan)
+    if window < 1 or window > values.shape[-1]:
+        return result
+    finite = ~np.isnan(values)
+    counts = finite.sum(axis=-1, keepdims=True)
+    offsets = np.where(finite, values, 0.0).sum(axis=-1, keepdims=True) / np.maximum(counts, 1)
+    sums = window_sums(np.where(finite, values - offsets, 0.0), window)
+    means = sums / window + offsets
+    means[window_sums(~finite, window) > 0] = np.nan
+    result[..., window - 1:] = means
+    return result
+
+
+def calculate_ema_matrix(prices: np.ndarray, period: int) -> np.ndarray:
+    """calculate_ema of every row of `prices`."""
+    return pd.DataFrame(prices.T).ewm(span=period, adjust=False).mean().to_numpy(dtype=np.float64).T
+
+
+def calculate_hma_matrix(prices: np.ndarray, period: int) -> np.ndarray:
+    """calculate_hma of every row of `prices`."""
+    diff = 2 * rolling_mean(prices, int(period / 2)) - rolling_mean(prices, period)
+    return rolling_mean(diff, int(np.sqrt(period)))
+
+
+def calculate_slopes(ma: np.ndarray, n: int) -> np.ndarray:
+    """calculate_slope over every window of n values along the last axis, NaN before the first."""
+    slopes = np.full(ma.shape, np.nan)
+    if n > ma.shape[-1]:
+        return slopes
+    slopes[..., n - 1:] = (ma[..., n - 1:] - ma[..., :ma.shape[-1] - n + 1]) / n
+    return slopes
+
+
+def parameter_grid(ma_types: Sequence[str], periods: Sequence[int], ns: Sequence[int],
+                   dip_depths: Sequence[float]) -> List[Parameters]:
+    """Every combination of the given values, for sweep_strategy."""
+    return list(itertools.product(ma_types, periods, ns, dip_depths))
+
+
+class SweepResult:
+    """
+    apply_strategy's output for every combination of a sweep. Each distinct
+    (ma_type, period) is computed once: `ma[ma_index[i]]` is combination i's MA and
+    `sell_signals[i]` its sell signals, with the shape of the swept prices.
+    """
+
+    def __init__(self, parameters: List[Parameters], ma_keys: List[Tuple[str, int]], ma: np.ndarray,
+                 ma_index: np.ndarray, sell_signals: np.ndarray):
+        self.parameters = parameters
+        self.ma_keys = ma_keys
+        self.ma = ma
+        self.ma_index = ma_index
+        self.sell_signals = sell_signals
+
+    def __len__(self) -> int:
+        return len(self.parameters)
+
+    def ma_for(self, combination: int) -> np.ndarray:
+        return self.ma[self.ma_index[combination]]
+
+
+def sweep_strategy(prices: Union[np.ndarray, pd.Series, pd.DataFrame], grid: Sequence[Parameters]) -> SweepResult:
+    """
+    apply_strategy for every (ma_type, period, n, dip_depth) of `grid` on `prices`, a
+    series or a matrix with one price series per row. Each distinct MA is computed
+    once for all rows, each distinct (MA, n) slope once, and the sell signals of all
+    its dip depths in one comparison. The sell signals take one byte per combination
+    and price, so sweep a year of 1-minute prices (525600 per row) in grids of a few
+    thousand combinations.
+    """
+    values = np.asarray(prices, dtype=np.float64)
+    single_series = values.ndim == 1
+    values = np.atleast_2d(values)
+
+    parameters = [(ma_type.upper(), int(period), int(n), float(dip_depth)) for ma_type, period, n, dip_depth in grid]
+    ma_keys: List[Tuple[str, int]] = []
+    ma_positions: Dict[Tuple[str, int], int] = {}
+    for ma_type, period, n, _ in parameters:
+        if ma_type not in ('EMA', 'HMA'):
+            raise ValueError("MA Type must be 'EMA' or 'HMA'")
+        if n < 1:
+            raise ValueError(f"n must be at least 1, got {n}")
+        if (ma_type, period) not in ma_positions:
+            ma_positions[(ma_type, period)] = len(ma_keys)
+            ma_keys.append((ma_type, period))
+
+    ma = np.empty((len(ma_keys),) + values.shape)
+    for position, (ma_type, period) in enumerate(ma_keys):
+        ma[position] = calculate_ema_matrix(values, period) if ma_type == 'EMA' else calculate_hma_matrix(values, period)
+    ma_index = np.array([ma_positions[(ma_type, period)] for ma_type, period, _, _ in parameters], dtype=np.int64)
+
+    # combinations sharing an MA and n only differ by dip_depth: one slope, one comparison
+    groups: Dict[Tuple[int, int], List[int]] = {}
+    for combination, (_, _, n, _) in enumerate(parameters):
+        groups.setdefault((int(ma_index[combination]), n), []).append(combination)
+    sell_signals = np.empty((len(parameters),) + values.shape, dtype=bool)
+    for (position, n), combinations in groups.items():
+        slopes = calculate_slopes(ma[position], n)
+        dip_depths = np.array([parameters[combination][3] for combination in combinations])
+        # NaN slopes compare False, like the Series comparison
+        sell_signals[combinations] = slopes[None] < dip_depths.reshape((-1,) + (1,) * slopes.ndim)
+
+    if single_series:
+        ma, sell_signals = ma[:, 0], sell_signals[:, 0]
+    return SweepResult(parameters, ma_keys, ma, ma_index, sell_signals)
 
-    slopes = ma.rolling(window=n).apply(
-        lambda x: calculate_slope(x, n), raw=False)
-    sell_signals = slopes < dip_depth
 
+def apply_strategy(prices, ma_type='EMA', period=14, n=3, dip_depth=0):
+    if ma_type.upper() not in ('EMA', 'HMA'):
+        raise ValueError("MA Type must be 'EMA' or 'HMA'")
+    result = sweep_strategy(prices, [(ma_type, period, n, dip_depth)])
+    ma = pd.Series(result.ma_for(0), index=prices.index, name=prices.name)
+    sell_signals = pd.Series(result.sell_signals[0], index=prices.index, name=prices.name)
     return ma, sell_signals
 
 
@@ -0,0 +1,379 @@
+import math
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from indicators import IncrementalSlope, calculate_slope, ema, hma_with_inner
+
+
+MA_TYPES = ('EMA', 'HMA')
+
+
+class IndicatorCache:
+    """
+    Process-wide LRU cache of computed indicator arrays, shared by all strategies,
+    callbacks and threads. Keys are tuples starting with (pair, timeframe, indicator,
+    params, last candle timestamp); the least recently used arrays are evicted once
+    they hold more than `max_bytes`. Cached arrays are read-only.
+
+    Candles are assumed final once seen: a candle rewritten under the same timestamp
+    would still get the cached values.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries: 'OrderedDict[Tuple, np.ndarray]' = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple) -> Optional[np.ndarray]:
+        with self.lock:
+            values = self.entries.get(key)
+            if values is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return values
+
+    def put(self, key: Tuple, values: np.ndarray) -> np.ndarray:
+        """Cache `values` (made read-only, not copied) and return them."""
+        values.flags.writeable = False
+        if values.nbytes > self.max_bytes:
+            return values
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous.nbytes
+            self.entries[key] = values
+            self.bytes += values.nbytes
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= evicted.nbytes
+                self.evictions += 1
+        return values
+
+    def get_or_compute(self, key: Tuple, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        values = self.get(key)
+        if values is None:
+            values = self.put(key, compute())
+        return values
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def format_log_line(self) -> str:
+        stats = self.stats()
+        lookups = stats['hits'] + stats['misses']
+        hit_rate = stats['hits'] / lookups * 100 if lookups else 0.0
+        return (f"Indicator cache: {stats['entries']} arrays {stats['bytes'] / 1024:.1f}KB "
+                f"hits={stats['hits']} misses={stats['misses']} ({hit_rate:.0f}% hits) "
+                f"evictions={stats['evictions']}")
+
+
+INDICATOR_CACHE = IndicatorCache()
+
+
+class IncrementalEMA:
+    """
+    pandas_ta.ema, one value at a time: the SMA of the first `length` values seeds
+    it, then value = (1 - alpha) * value + alpha * x with alpha = 2 / (length + 1).
+    """
+
+    def __init__(self, length: int):
+        self.length = length
+        self.alpha = 2 / (length + 1)
+        self.count = 0
+        self.seed_sum = 0.0
+        self.value = math.nan
+
+    def update(self, x: float) -> float:
+        if math.isnan(x):
+            return self.value
+        self.count += 1
+        if self.count < self.length:
+            self.seed_sum += x
+        elif self.count == self.length:
+            self.value = (self.seed_sum + x) / self.length
+        else:
+            self.value = (1 - self.alpha) * self.value + self.alpha * x
+        return self.value
+
+    def seed(self, inputs: np.ndarray, outputs: np.ndarray):
+        """Continue after the (full) series `inputs` whose EMA is `outputs`."""
+        inputs = inputs[~np.isnan(inputs)]
+        self.count = len(inputs)
+        self.seed_sum = float(inputs[:self.length - 1].sum()) if self.count < self.length else 0.0
+        self.value = float(outputs[-1]) if self.count >= self.length else math.nan
+
+
+class IncrementalWMA:
+    """
+    pandas_ta.wma (weights 1..length, newest heaviest), one value at a time. The
+    weighted sum and sum of the window are updated in O(1) per value and recomputed
+    from the window once per `length` updates so rounding errors can't accumulate.
+    NaN inputs are skipped (only leading NaNs are expected, e.g. in HMA's inner series).
+    """
+
+    def __init__(self, length: int):
+        self.length = length
+        self.total_weight = 0.5 * length * (length + 1)
+        self.weights = np.arange(1, length + 1, dtype=np.float64)
+        self.window: deque = deque(maxlen=length)
+        self.window_sum = 0.0
+        self.weighted_sum = 0.0
+        self.updates_since_resync = 0
+        self.value = math.nan
+
+    def update(self, x: float) -> float:
+        if math.isnan(x):
+            return math.nan
+        if len(self.window) < self.length:
+            self.window.append(x)
+            if len(self.window) == self.length:
+                self.resync()
+            return self.value
+
+        oldest = self.window[0]
+        self.window.append(x)
+        # every value loses one weight, the oldest (weight 1) drops out
+        self.weighted_sum += self.length * x - self.window_sum
+        self.window_sum += x - oldest
+        self.updates_since_resync += 1
+        if self.updates_since_resync >= self.length:
+            self.resync()
+        else:
+            self.value = self.weighted_sum / self.total_weight
+        return self.value
+
+    def resync(self):
+        window = np.fromiter(self.window, dtype=np.float64, count=len(self.window))
+        self.window_sum = float(window.sum())
+        self.weighted_sum = float(np.dot(window, self.weights))
+        self.updates_since_resync = 0
+        self.value = self.weighted_sum / self.total_weight
+
+    def seed(self, inputs: np.ndarray):
+        """Continue after the series `inputs`."""
+        inputs = inputs[~np.isnan(inputs)]
+        self.window = deque(inputs[-self.length:].tolist(), maxlen=self.length)
+        if len(self.window) == self.length:
+            self.resync()
+        else:
+            self.value = math.nan
+
+
+class IncrementalHMA:
+    """
+    pandas_ta.hma: WMA(2 * WMA(x, length // 2) - WMA(x, length), int(sqrt(length))),
+    updated through its three WMAs.
+    """
+
+    def __init__(self, length: int):
+        self.length = length
+        self.half = IncrementalWMA(int(length / 2))
+        self.full = IncrementalWMA(length)
+        self.smooth = IncrementalWMA(int(math.sqrt(length)))
+
+    def update(self, x: float) -> float:
+        return self.smooth.update(2 * self.half.update(x) - self.full.update(x))
+
+    def seed(self, inputs: np.ndarray, inner: np.ndarray):
+        self.half.seed(inputs)
+        self.full.seed(inputs)
+        self.smooth.seed(inner)
+
+
+class SeriesState:
+    """
+    An indicator of one pair's candles: its running state plus the values for the
+    candles of the last dataframe, so the next call only computes the candles added
+    since. Subclasses set up `indicator` (with an update(x) -> value method) in
+    recompute.
+    """
+
+    def __init__(self):
+        self.indicator = None
+        self.timestamps = np.zeros(0, dtype=np.int64)
+        self.values = np.zeros(0, dtype=np.float64)
+        self.last_input = math.nan
+
+    def recompute(self, timestamps: np.ndarray, inputs: np.ndarray) -> np.ndarray:
+        """The indicator over the whole series, leaving `indicator` ready to continue it."""
+        raise NotImplementedError
+
+    def overlap(self, timestamps: np.ndarray, inputs: np.ndarray) -> Optional[int]:
+        """
+        Index in self.values of the dataframe's first candle if the dataframe continues
+        the previous one (same candles, possibly shifted, plus new ones), else None.
+        """
+        if not len(self.timestamps) or not len(timestamps):
+            return None
+        start = int(np.searchsorted(self.timestamps, timestamps[0]))
+        if start == len(self.timestamps) or self.timestamps[start] != timestamps[0]:
+            return None
+        known = len(self.timestamps) - start
+        if known > len(timestamps) or timestamps[known - 1] != self.timestamps[-1]:
+            return None
+        last_input = inputs[known - 1]
+        # NaN (e.g. an MA still warming up) is the same NaN
+        if last_input != self.last_input and not (math.isnan(last_input) and math.isnan(self.last_input)):
+            return None
+        return start
+
+    def update(self, timestamps: np.ndarray, inputs: np.ndarray) -> np.ndarray:
+        start = self.overlap(timestamps, inputs)
+        if start is None:
+            # first call, restart, missed candles or a rewritten history
+            values = self.recompute(timestamps, inputs)
+        else:
+            update = self.indicator.update
+            known = len(self.timestamps) - start
+            new_values = [update(x) for x in inputs[known:].tolist()]
+            values = np.concatenate((self.values[start:], np.array(new_values, dtype=np.float64)))
+        self.timestamps = timestamps
+        self.values = values
+        self.last_input = inputs[-1] if len(inputs) else math.nan
+        return values
+
+
+class MovingAverageState(SeriesState):
+    """One moving average (EMA or HMA) of one pair's closes."""
+
+    def __init__(self, ma_type: str, length: int):
+        super().__init__()
+        self.ma_type = ma_type
+        self.length = length
+
+    def recompute(self, timestamps: np.ndarray, closes: np.ndarray) -> np.ndarray:
+        if self.ma_type == 'EMA':
+            self.indicator = IncrementalEMA(self.length)
+            values = ema(closes, self.length)
+            self.indicator.seed(closes, values)
+        else:
+            self.indicator = IncrementalHMA(self.length)
+            values, inner = hma_with_inner(closes, self.length)
+            self.indicator.seed(closes, inner)
+        return values
+
+
+class SlopeState(SeriesState):
+    """The rolling regression slope (indicators.calculate_slope) of one pair's MA."""
+
+    def __init__(self, window: int):
+        super().__init__()
+        self.window = window
+
+    def recompute(self, timestamps: np.ndarray, ma: np.ndarray) -> np.ndarray:
+        # raises ValueError for a window longer than the series, like calculate_slope
+        values = calculate_slope(ma, self.window)
+        self.indicator = IncrementalSlope(self.window)
+        self.indicator.seed(ma)
+        return values
+
+
+class IndicatorEngine:
+    """
+    Incremental moving averages per (pair, timeframe, ma_type, period), and their
+    regression slopes (moving_average_slope). Called with
+    each new analyzed dataframe, it only feeds the candles added since the previous
+    call to the running EMA/HMA (O(1) per candle) and reuses the earlier values, so
+    the cost per bot loop no longer grows with the dataframe's length
+    (startup_candle_count). A dataframe that doesn't continue the previous one is
+    recomputed in full with the indicators.py kernels.
+
+    Only the EMA differs from a full recompute over the same dataframe: it continues from
+    its first seed instead of re-seeding at the dataframe's first candle, which
+    changes values by less than (1 - 2 / (period + 1)) ** candles.
+
+    Results go through `cache` (the process-wide INDICATOR_CACHE by default), so a
+    series another strategy or callback already computed for the same candles is
+    returned without touching the running state.
+    """
+
+    def __init__(self, cache: Optional[IndicatorCache] = INDICATOR_CACHE):
+        self.cache = cache
+        self.states: Dict[Tuple, SeriesState] = {}
+
+    def moving_average(self, pair: str, timeframe: str, ma_type: str, period: int,
+                       dataframe: pd.DataFrame) -> np.ndarray:
+        """The `ma_type` ('EMA' or 'HMA') of dataframe['close'], one value per row (read-only)."""
+        ma_type = ma_type.upper()
+        if ma_type not in MA_TYPES:
+            raise ValueError(f"(MA_TYPE ERROR!) {ma_type} MUST BE EITHER 'HMA' OR 'EMA'")
+        period = int(period)
+        timestamps = dataframe['date'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+        cache_key = None
+        if self.cache is not None and len(timestamps):
+            cache_key = (pair, timeframe, ma_type, (period,), int(timestamps[-1]), int(timestamps[0]), len(timestamps))
+            values = self.cache.get(cache_key)
+            if values is not None:
+                return values
+
+        key = (pair, timeframe, ma_type, period)
+        state = self.states.get(key)
+        if state is None:
+            state = self.states[key] = MovingAverageState(ma_type, period)
+        values = state.update(timestamps, dataframe['close'].to_numpy(dtype=np.float64))
+        if cache_key is not None:
+            return self.cache.put(cache_key, values)
+        values.flags.writeable = False
+        return values
+
+    def moving_average_slope(self, pair: str, timeframe: str, ma_type: str, period: int, slope_period: int,
+                             dataframe: pd.DataFrame) -> np.ndarray:
+        """
+        indicators.calculate_slope of moving_average(...) over `slope_period` candles,
+        one value per row (read-only). Like the MA, only the candles added since the
+        previous call are computed, O(1) each with IncrementalSlope. Like the EMA, the
+        first rows of a shifted dataframe keep the slopes computed from the earlier
+        candles where a full recompute would give NaN.
+        """
+        ma = self.moving_average(pair, timeframe, ma_type, period, dataframe)
+        ma_type, period, slope_period = ma_type.upper(), int(period), int(slope_period)
+        timestamps = dataframe['date'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+        cache_key = None
+        if self.cache is not None and len(timestamps):
+            cache_key = (pair, timeframe, f'{ma_type}_SLOPE', (period, slope_period), int(timestamps[-1]),
+                         int(timestamps[0]), len(timestamps))
+            values = self.cache.get(cache_key)
+            if values is not None:
+                return values
+
+        key = (pair, timeframe, f'{ma_type}_SLOPE', period, slope_period)
+        state = self.states.get(key)
+        if state is None:
+            state = self.states[key] = SlopeState(slope_period)
+        values = state.update(timestamps, ma)
+        if cache_key is not None:
+            return self.cache.put(cache_key, values)
+        values.flags.writeable = False
+        return values
+
+    def reset(self, pair: Optional[str] = None):
+        """Forget the state of `pair` (or of all pairs)."""
+        if pair is None:
+            self.states.clear()
+        else:
+            for key in [key for key in self.states if key[0] == pair]:
+                del self.states[key]
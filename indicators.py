@@ -0,0 +1,248 @@
+import math
+from collections import deque
+from typing import Callable, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+ArrayLike = Union[np.ndarray, Sequence[float]]
+
+# ema, wma and hma reproduce pandas_ta 0.3.14b (without TA-Lib), NaN placement
+# included, without importing it or building intermediate Series: ema runs the same
+# recurrence as pandas' ewm and agrees to the last bit, wma agrees with pandas_ta.wma
+# to a relative 1e-12 (its dot products are summed in another order). Unlike
+# pandas_ta, a series shorter than the length gives all-NaN instead of None. With
+# Numba installed, the EMA recurrence is compiled on first use, else pandas' ewm runs it.
+# bench_indicators.py checks them against pandas_ta.
+
+# ema_recurrence compiled by Numba; None until get_ema_recurrence tried, False without Numba
+EMA_RECURRENCE: Union[None, bool, Callable] = None
+
+
+def indicator_length(length: Optional[int]) -> int:
+    # pandas_ta's default for a missing or non-positive length
+    return int(length) if length and length > 0 else 10
+
+
+def ema_recurrence(values, alpha, out):
+    """
+    pandas' ewm(adjust=False, ignore_na=False).mean() of `values` into `out`, step by
+    step as pandas computes it, to be compiled by Numba.
+    """
+    weighted = values[0]
+    old_weight = 1.0
+    out[0] = weighted
+    for i in range(1, len(values)):
+        value = values[i]
+        if weighted == weighted:
+            old_weight *= 1.0 - alpha
+            if value == value:
+                if weighted != value:
+                    weighted = (old_weight * weighted + alpha * value) / (old_weight + alpha)
+                old_weight = 1.0
+        elif value == value:
+            weighted = value
+        out[i] = weighted
+    return out
+
+
+def get_ema_recurrence() -> Optional[Callable]:
+    """The compiled ema_recurrence, None without Numba."""
+    global EMA_RECURRENCE
+    if EMA_RECURRENCE is None:
+        try:
+            import numba
+            EMA_RECURRENCE = numba.njit(cache=True, nogil=True)(ema_recurrence)
+        except ImportError:
+            EMA_RECURRENCE = False
+    return EMA_RECURRENCE or None
+
+
+def ema(values: ArrayLike, length: Optional[int] = None) -> np.ndarray:
+    """
+    pandas_ta.ema: seeded with the mean of the first `length` values (NaNs skipped) at
+    index length - 1, then value = (1 - alpha) * value + alpha * x with
+    alpha = 2 / (length + 1).
+    """
+    length = indicator_length(length)
+    values = np.array(values, dtype=np.float64)
+    if len(values) < length:
+        return np.full(len(values), np.nan)
+    # summed like pandas' mean does, NaNs as 0, so the seed is the same to the last bit
+    seed_values = values[:length]
+    seed_count = int((~np.isnan(seed_values)).sum())
+    values[length - 1] = np.where(np.isnan(seed_values), 0.0, seed_values).sum() / seed_count if seed_count else np.nan
+    values[:length - 1] = np.nan
+
+    # 2 / (length + 1), rounded the way pandas derives it from span=length
+    alpha = 1 / (1 + (length - 1) / 2)
+    recurrence = get_ema_recurrence()
+    if recurrence is None:
+        return pd.Series(values).ewm(span=length, adjust=False).mean().to_numpy(dtype=np.float64)
+    return recurrence(values, alpha, np.empty(len(values)))
+
+
+def wma(values: ArrayLike, length: Optional[int] = None) -> np.ndarray:
+    """
+    pandas_ta.wma: weights 1..length, newest heaviest. NaN for the first length - 1
+    values and for every window containing a NaN.
+    """
+    length = indicator_length(length)
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(len(values), np.nan)
+    if len(values) < length:
+        return result
+    weights = np.arange(1, length + 1, dtype=np.float64)
+    # convolve flips the kernel, so the newest value of each window gets weight `length`
+    result[length - 1:] = np.convolve(values, weights[::-1], mode='valid') / (0.5 * length * (length + 1))
+    return result
+
+
+def hma_with_inner(values: ArrayLike, length: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """hma and its inner series 2 * wma(values, length // 2) - wma(values, length)."""
+    length = indicator_length(length)
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < length:
+        return np.full(len(values), np.nan), np.full(len(values), np.nan)
+    inner = 2 * wma(values, int(length / 2)) - wma(values, length)
+    return wma(inner, int(math.sqrt(length))), inner
+
+
+def hma(values: ArrayLike, length: Optional[int] = None) -> np.ndarray:
+    """pandas_ta.hma: wma(2 * wma(values, length // 2) - wma(values, length), int(sqrt(length)))."""
+    return hma_with_inner(values, length)[0]
+
+
+def window_sums(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Sum of every `window` consecutive values along the last axis, len(values) - window + 1
+    of them per row.
+    """
+    cumulative = np.cumsum(values, axis=-1)
+    cumulative = np.concatenate((np.zeros(cumulative.shape[:-1] + (1,), dtype=cumulative.dtype), cumulative), axis=-1)
+    return cumulative[..., window:] - cumulative[..., :-window]
+
+
+# Windows per block of calculate_slope: its rolling sums restart every block so their
+# rounding errors stay bounded whatever the series' length
+SLOPE_BLOCK_SIZE = 4096
+
+
+def calculate_slope(y: ArrayLike, window: int) -> np.ndarray:
+    """
+    Calculate the slope of a linear regression line for each point in a series.
+    The slope is calculated over a rolling window of size 'window' for the series 'y'.
+
+    The least-squares slope over x = 0..window-1 is
+    sum((x - x_mean) * y) / sum((x - x_mean) ** 2); the denominator only depends on
+    the window and the numerator comes from rolling sums of y and x * y, so the whole
+    series costs O(n) instead of O(n * window).
+
+    Args:
+    y (np.array): The y-values of the data series.
+    window (int): The number of points to consider for each linear regression calculation.
+
+    Returns:
+    np.array: An array of slope values, NaN for the first window - 1 points and for
+    windows containing a NaN (or inf). A window of 1 has a slope of 0.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if window < 1 or window > n:
+        raise ValueError(f"window must be between 1 and the series length ({n}), got {window}")
+    if window == 1:
+        return np.zeros(n)
+
+    # Pad the result with NaN for the length of the window
+    slope_padded = np.full(n, np.nan)
+    for start in range(0, n - window + 1, SLOPE_BLOCK_SIZE):
+        segment = y[start:start + SLOPE_BLOCK_SIZE + window - 1]
+        slope_padded[start + window - 1:start + len(segment)] = segment_slope(segment, window)
+    return slope_padded
+
+
+def segment_slope(y: np.ndarray, window: int) -> np.ndarray:
+    """Slope of every full window of `y`, len(y) - window + 1 of them."""
+    finite = np.isfinite(y)
+    # the slope doesn't change with an offset in y, centring keeps the sums small
+    offset = y[finite].mean() if finite.any() else 0.0
+    values = np.where(finite, y - offset, 0.0)
+    positions = np.arange(len(y), dtype=np.float64)
+
+    sum_y = window_sums(values, window)
+    sum_xy = window_sums(positions * values, window)
+    # with x counted from each window's start s: sum((x - x_mean) * y) = sum(k * y) - (s + x_mean) * sum(y)
+    starts = positions[:len(y) - window + 1]
+    numerator = sum_xy - (starts + (window - 1) / 2) * sum_y
+    slope = numerator / (window * (window ** 2 - 1) / 12)
+    slope[window_sums(~finite, window) > 0] = np.nan
+    return slope
+
+
+class IncrementalSlope:
+    """
+    calculate_slope, one value at a time: the sum and the x-weighted sum of the window
+    are updated in O(1) per value and recomputed from the window once per `window`
+    updates so rounding errors can't accumulate.
+    """
+
+    def __init__(self, window: int):
+        if window < 1:
+            raise ValueError(f"window must be at least 1, got {window}")
+        self.window = window
+        self.denominator = window * (window ** 2 - 1) / 12
+        self.positions = np.arange(window, dtype=np.float64)
+        self.values: deque = deque(maxlen=window)
+        self.non_finite = 0
+        self.sum_y = 0.0
+        self.weighted_sum = 0.0
+        self.updates_since_resync = 0
+        self.value = math.nan
+
+    def update(self, y: float) -> float:
+        y = float(y)
+        oldest = self.values[0] if len(self.values) == self.window else None
+        if oldest is not None and not math.isfinite(oldest):
+            self.non_finite -= 1
+        self.values.append(y)
+        if not math.isfinite(y):
+            self.non_finite += 1
+
+        if len(self.values) < self.window:
+            self.value = math.nan
+        elif self.window == 1:
+            self.value = 0.0
+        elif self.non_finite:
+            self.value = math.nan
+        elif oldest is None or not math.isfinite(self.value) or self.updates_since_resync + 1 >= self.window:
+            self.resync()
+        else:
+            # every value moves one position down, the oldest (position 0) drops out
+            self.weighted_sum += (self.window - 1) * y - (self.sum_y - oldest)
+            self.sum_y += y - oldest
+            self.updates_since_resync += 1
+            self.value = self.current_slope()
+        return self.value
+
+    def current_slope(self) -> float:
+        return (self.weighted_sum - (self.window - 1) / 2 * self.sum_y) / self.denominator
+
+    def resync(self):
+        values = np.fromiter(self.values, dtype=np.float64, count=len(self.values))
+        self.sum_y = float(values.sum())
+        self.weighted_sum = float(np.dot(values, self.positions))
+        self.updates_since_resync = 0
+        self.value = self.current_slope()
+
+    def seed(self, y: ArrayLike):
+        """Continue after the series `y`."""
+        y = np.asarray(y, dtype=np.float64)[-self.window:]
+        self.values = deque(y.tolist(), maxlen=self.window)
+        self.non_finite = int((~np.isfinite(y)).sum())
+        self.value = math.nan
+        if len(self.values) == self.window:
+            if self.window == 1:
+                self.value = 0.0
+            elif not self.non_finite:
+                self.resync()
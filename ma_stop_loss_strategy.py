@@ -5,59 +5,12 @@ import time
 from typing import Any, Dict, Optional
 from freqtrade.strategy.interface import IStrategy
 from pandas import DataFrame
-import numpy as np
-import pandas_ta as pta
 
 
 from freqtrade.strategy.strategy_helper import stoploss_from_open
 from custom_order_form_handler import OrderStatus
 from file_loading_strategy import FileLoadingStrategy
-
-
-def calculate_slope(y, window):
-    """
-    Calculate the slope of a linear regression line for each point in a series.
-    The slope is calculated over a rolling window of size 'window' for the series 'y'.
-    This function uses vectorization for fast computation.
-
-    Args:
-    y (np.array): The y-values of the data series.
-    window (int): The number of points to consider for each linear regression calculation.
-
-    Returns:
-    np.array: An array of slope values.
-    """
-    # Ensure y is a numpy array for vectorized operations
-    y = np.asarray(y)
-
-    # The x values are the indices of y
-    x = np.arange(len(y))
-
-    # Expand x and y to have 'window' columns for vectorized operation
-    x_mat = np.lib.stride_tricks.sliding_window_view(x, window_shape=window)
-    y_mat = np.lib.stride_tricks.sliding_window_view(y, window_shape=window)
-
-    # Calculate means of x and y within the window
-    x_mean = np.mean(x_mat, axis=1)
-    y_mean = np.mean(y_mat, axis=1)
-
-    # Calculate the numerator and denominator of the slope formula
-    numerator = np.sum(
-        (x_mat - x_mean[:, None]) * (y_mat - y_mean[:, None]), axis=1)
-    denominator = np.sum((x_mat - x_mean[:, None]) ** 2, axis=1)
-
-    # Prevent division by zero
-    with np.errstate(divide='ignore', invalid='ignore'):
-        slope = np.true_divide(numerator, denominator)
-        # If denominator is zero, slope is zero (horizontal line)
-        slope[denominator == 0] = 0
-
-    # Pad the result with NaN for the length of the window
-    slope_padded = np.empty(len(y))
-    slope_padded[:] = np.NaN
-    slope_padded[window - 1:] = slope
-
-    return slope_padded
+from order_records import MAStopLossOrder
 
 
 class MAStopLossStrategy(FileLoadingStrategy):
@@ -69,21 +22,22 @@ class MAStopLossStrategy(FileLoadingStrategy):
     use_custom_stoploss = True
     stoploss = -1.0  # Default OFF
 
+    order_record_class = MAStopLossOrder
 
     def populate_indicators(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
         try:
             pair = metadata['pair']
             
-            ma_type = self.get_dfile_arg(pair, 'ma_type')
-            ma_period = self.get_dfile_arg(pair, 'ma_period')
+            order = self.get_order_record(pair)
+            if order is None:
+                return dataframe
+            ma_type = order.ma_type
+            ma_period = order.ma_period
 
                 
-            # EMA Calculation
-            if ma_type == 'EMA':
-                dataframe['ma'] = pta.ema(dataframe['close'], length=ma_period)
-            # HMA Calculation
-            elif ma_type == 'HMA':
-                dataframe['ma'] = pta.hma(dataframe['close'], length=ma_period)
+            # EMA / HMA Calculation (incremental, only new candles are computed)
+            if ma_type in ('EMA', 'HMA'):
+                dataframe['ma'] = self.moving_average(pair, dataframe, ma_type, ma_period)
 
         except Exception as e:
             #print(f"(MASlopeStrategy) No order data found: {e}")
@@ -104,21 +58,23 @@ class MAStopLossStrategy(FileLoadingStrategy):
             pair=pair, timeframe=self.timeframe)
         last_candle = dataframe.iloc[-1].squeeze()
 
-        # Retrieve strategy parameters from trade's custom_info or strategy configuration
-        tight_trailing_stop_loss = self.get_dfile_arg(
-            pair, 'tight_trailing_stop_loss')
-        hard_stop_loss = self.get_dfile_arg(
-        pair, 'hard_stop_loss')
-        profit_activating_tsl = self.get_dfile_arg(pair, 'profit_activating_tsl')
+        # Retrieve strategy parameters from the pair's typed order record (parsed once per change)
+        order = self.get_order_record(pair)
+        if order is None:
+            return None
+        tight_trailing_stop_loss = order.tight_trailing_stop_loss
+        hard_stop_loss = order.hard_stop_loss
+        profit_activating_tsl = order.profit_activating_tsl
         
         # if no trades return
         if not tight_trailing_stop_loss or not hard_stop_loss or not profit_activating_tsl:
             return None
 
+        # Changes to the order data, written in a single transaction
+        updates = {}
+
         # Determine the highest MA encountered
-        
-        
-        highest_ma = self.get_dfile_arg(pair, 'highest_ma')
+        highest_ma = order.highest_ma
         if not highest_ma:
             #print(f"(Highest MA not found): setting to last candle's MA {last_candle['ma']}")
             highest_ma = last_candle['ma']
@@ -126,14 +82,19 @@ class MAStopLossStrategy(FileLoadingStrategy):
         # If current MA is higher than the recorded highest MA, update the highest MA
         if last_candle['ma'] >= highest_ma:
             highest_ma = last_candle['ma']
-            self.set_dfile_arg(pair, 'highest_ma', highest_ma)
+            updates['highest_ma'] = highest_ma
 
         # Check if the take profit has been hit to switch to tight trailing stop loss
-        if not self.get_dfile_arg(pair, 'take_profit_hit') and current_profit > profit_activating_tsl / 100:
-            self.set_dfile_arg(pair, 'take_profit_hit', True)
+        take_profit_hit = order.take_profit_hit
+        if not take_profit_hit and current_profit > profit_activating_tsl / 100:
+            take_profit_hit = True
+            updates['take_profit_hit'] = True
+
+        if updates:
+            self.set_dfile_args(pair, **updates)
 
         # Calculate the trailing stop loss based on the highest MA
-        if self.get_dfile_arg(pair, 'take_profit_hit'):
+        if take_profit_hit:
             tsl = highest_ma * (1 - tight_trailing_stop_loss / 100)
             if current_rate < tsl:
                 return 'tight_trailing_stop_loss'
@@ -180,13 +141,18 @@ class MAStopLossStrategy(FileLoadingStrategy):
             "stake_amount": stake_amount
             }
         
+        order_data = self.validate_order_data(order_data)
+
         print("\nPlease review your order details:")
         print(json.dumps(order_data, indent=4))
         confirmation = input(
             "Type 'Y' to confirm and submit your order, anything else to cancel: ").upper()
 
         if confirmation == 'Y':
-            self.order_handler.update_strategy_data(pair, order_data, OrderStatus.PENDING)
+            with self.order_handler.transaction(pair) as data:
+                data.clear()
+                data.update(order_data)
+                data['status'] = OrderStatus.PENDING.value
             print("\nSubmitted order!")
             print(json.dumps(order_data, indent=4))
         else:
@@ -194,19 +160,15 @@ class MAStopLossStrategy(FileLoadingStrategy):
 
         time.sleep(3)
 
-
-        self.order_handler.update_strategy_data(pair,order_data, OrderStatus.PENDING)
-
     def set_entry_signal(self, pair: str, dataframe: DataFrame, data: Dict[str, Any]):
         try:
-            # get all from self.get_dfile_arg(pair,...)
-            ma_type = self.get_dfile_arg(pair, 'ma_type')
-            ma_period = self.get_dfile_arg(pair, 'ma_period')
-            hard_stop_loss = self.get_dfile_arg(
-                pair, 'hard_stop_loss')
-            tight_trailing_stop_loss = self.get_dfile_arg(pair, 'tight_trailing_stop_loss')
-            profit_activating_tsl = self.get_dfile_arg(pair, 'profit_activating_tsl')
-            stake_amount = self.get_dfile_arg(pair, 'stake_amount')
+            order = self.order_record_class.from_dict(data)
+            ma_type = order.ma_type
+            ma_period = order.ma_period
+            hard_stop_loss = order.hard_stop_loss
+            tight_trailing_stop_loss = order.tight_trailing_stop_loss
+            profit_activating_tsl = order.profit_activating_tsl
+            stake_amount = order.stake_amount
             
             dataframe.loc[dataframe.index[-1], ['enter_long', 'enter_tag']] = (
                 1, 
@@ -13,14 +13,16 @@ from freqtrade.persistence.trade_model import Order, Trade
 from freqtrade.strategy.interface import IStrategy
 from pandas import DataFrame
 import numpy as np
-import pandas_ta as pta
 
-from custom_order_form_handler import OrderStatus
+from custom_order_form_handler import OrderStatus, ACTIVE_ORDER_STATUSES_VALUES
 from file_loading_strategy import FileLoadingStrategy
+from order_records import MATrailingStopLossOrder
+from entry_conditions import ENTRY_CONDITION_TYPES, compile_entry_condition
 
 from dateutil import parser
 
 from exit_strategy_manager import ExitStrategyManager
+from exit_simulator import ma_trailing_exit
 
 
 
@@ -35,6 +37,8 @@ class MATrailingStopLossStrategy(FileLoadingStrategy):
 
     use_exit_signal = True
     # Schedule force exit in 3 minutes
+
+    order_record_class = MATrailingStopLossOrder
     
 
     def populate_indicators(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
@@ -45,45 +49,38 @@ class MATrailingStopLossStrategy(FileLoadingStrategy):
             pair = metadata['pair']
 
             # CHECK IF PAIR HAS ACTIVE ORDER (WILL CHECK ALL PAIRS IN PAIRLIST)
-            if self.does_pair_have_active_order(pair):
+            order = self.get_order_record(pair)
+            if order is not None and order.status in ACTIVE_ORDER_STATUSES_VALUES:
                 # Ensure price column exists in dataframe
                 if 'close' not in dataframe.columns:
                     raise KeyError(
                         "Dataframe does not contain 'close' column.")
 
                 current_close = dataframe['close'].iloc[-1]
-                self.set_dfile_arg(pair, 'current_price', current_close)
 
-                # Fetching values from self.get_dfile_arg
-                ma_type = self.get_dfile_arg(pair, 'ma_type')
-                ma_period = self.get_dfile_arg(pair, 'ma_period')
+                ma_type = order.ma_type
+                ma_period = order.ma_period
 
                 # Check if ma_type and ma_period are properly set
                 if ma_type is None or ma_period is None:
                     return dataframe  # early exit
 
-                # EMA Calculation
-                if ma_type.upper() == 'EMA':
-                    dataframe['ma'] = pta.ema(
-                        dataframe['close'], length=ma_period)
-                # HMA Calculation
-                elif ma_type.upper() == 'HMA':
-                    dataframe['ma'] = pta.hma(
-                        dataframe['close'], length=ma_period)
-                else:
-                    raise ValueError(f"(MA_TYPE ERROR!) {ma_type.upper()} MUST BE EITHER 'HMA' OR 'EMA'")
-
-                # Ensure there are at least 30 MA values; otherwise, use available MA values
-                n = 100
-                last_n_ma = dataframe['ma'].iloc[-n:].tolist()
-                if len(last_n_ma) < n:
-                    logging.warning(f"Not enough data points for last_n_ma for pair {pair}. Using {len(last_n_ma)} data points.")
-
-                # Ensure last_n_ma is a list and contains floats
-                last_n_ma = [float(price) for price in last_n_ma]
-
-                # Write MA values to log file
-                self.set_dfile_arg(pair, 'prices', last_n_ma)
+                # EMA / HMA Calculation (incremental, only new candles are computed;
+                # raises ValueError for other types)
+                dataframe['ma'] = self.moving_average(pair, dataframe, ma_type, ma_period)
+
+                # Ensure there are at least 100 MA values; otherwise, use available MA values
+                n = self.price_buffer_size
+                if len(dataframe) < n:
+                    logging.warning(f"Not enough data points for last_n_ma for pair {pair}. Using {len(dataframe)} data points.")
+
+                # Write new MA values and the current price to the pair's price buffer
+                # (shared memory read by the entry condition monitor, not the order file);
+                # it's rebuilt instead of appended to when the order's MA changes
+                candle_times = dataframe['date'].to_numpy(dtype='datetime64[ns]').astype(np.int64) / 1e9
+                self.price_buffers.sync(
+                    pair, candle_times[-n:], dataframe['ma'].to_numpy(dtype=np.float64)[-n:],
+                    last_price=float(current_close), series=f"{ma_type.upper()}_{ma_period}")
 
             else:
                 pass
@@ -108,70 +105,31 @@ class MATrailingStopLossStrategy(FileLoadingStrategy):
         last_candle = dataframe.iloc[-1].squeeze()
         price = last_candle['close']
 
-        # Continue ONLY if have order data!
-        if not self.does_pair_have_active_order(pair):
+        # Continue ONLY if have order data! (typed record, parsed once per change)
+        order = self.get_order_record(pair)
+        if order is None or order.status not in ACTIVE_ORDER_STATUSES_VALUES:
             return
 
-        pct_diff = (
-            (last_candle['ma'] - trade.open_rate) / trade.open_rate) * 100
-
-        # Retrieve strategy parameters from trade's custom_info or strategy configuration
-        tight_trailing_stop_loss = self.get_dfile_arg(
-            pair, 'tight_trailing_stop_loss')
-        loose_stop_loss = self.get_dfile_arg(pair, 'loose_stop_loss')
-        is_loose_stop_loss_trailing = self.get_dfile_arg(
-            pair, 'is_loose_stop_loss_trailing')
-        take_profit = self.get_dfile_arg(pair, 'take_profit')
-        take_profit_hit = self.get_dfile_arg(pair, 'take_profit_hit')
-        highest_ma = self.get_dfile_arg(pair, 'highest_ma')
-
-        if not highest_ma:
-            highest_ma = last_candle['ma']
-
-        # If current MA is higher than the recorded highest MA, update the highest MA
-        if last_candle['ma'] >= highest_ma:
-            highest_ma = last_candle['ma']
-            self.set_dfile_arg(pair, 'highest_ma', highest_ma)
-
-        # Check if the take profit has been hit to switch to tight trailing stop loss
-        above_tp = (pct_diff) > take_profit
-        if not take_profit_hit and above_tp:
-            self.set_dfile_arg(pair, 'take_profit_hit', True)
-
-        
-
-
-        # Calculate the trailing stop loss based on the highest MA
-        exit_reason = None
-        if above_tp:
-            if tight_trailing_stop_loss == 0:
-                exit_reason = 'auto_sell_at_take_profit'
-            else:
-                tsl = highest_ma * (1 - tight_trailing_stop_loss / 100)
-                if current_rate < tsl:
-                    exit_reason = 'tight_trailing_stop_loss'
-        else:
-            if is_loose_stop_loss_trailing:
-                tsl = highest_ma * (1 - loose_stop_loss / 100)
-                if current_rate < tsl:
-                    exit_reason = 'loose_stop_loss_trailing'
-            else:
-                is_below_loose_stop_loss = pct_diff < -loose_stop_loss
-                if is_below_loose_stop_loss:
-                    exit_reason = 'loose_stop_loss_static'
+        # Loose -> tight trailing rule (shared with the offline exit_simulator), returns
+        # the changes to the order data, written once at the end
+        exit_reason, updates = ma_trailing_exit(
+            last_candle['ma'], current_rate, trade.open_rate, order.highest_ma, order.take_profit_hit,
+            loose_stop_loss=order.loose_stop_loss,
+            is_loose_stop_loss_trailing=order.is_loose_stop_loss_trailing,
+            tight_trailing_stop_loss=order.tight_trailing_stop_loss,
+            take_profit=order.take_profit)
 
         if exit_reason:
-            def write_exit_data_to_file():
-                self.set_dfile_arg(pair, 'exit_price', price)
+            with self.order_transaction(pair) as data:
+                data.update(updates)
+                data['exit_price'] = price
                 # set profit %
-                entry_price = self.get_dfile_arg(pair, 'entry_price')
+                entry_price = data.get('entry_price')
                 percentage_profit = ((price - entry_price) / entry_price) * 100
-                self.set_dfile_arg(pair, 'profit', percentage_profit)
+                data['profit'] = percentage_profit
                 
                 # set status to EXITED            
-                self.set_dfile_arg(pair,'status', OrderStatus.EXITED.value)
-
-            write_exit_data_to_file()
+                data['status'] = OrderStatus.EXITED.value
             
             try:
                 # force exit (remove limit make market in n mins)
@@ -187,6 +145,9 @@ class MATrailingStopLossStrategy(FileLoadingStrategy):
                 
             return exit_reason
 
+        if updates:
+            self.set_dfile_args(pair, **updates)
+
     def input_strategy_data(self, pair: str):
         ma_type = input(
             "Choose between '(E)MA' or '(H)MA' for moving average type: ")
@@ -229,6 +190,7 @@ class MATrailingStopLossStrategy(FileLoadingStrategy):
             print("1: Price Crosses Upward Condition")
             print("2: Price Under Condition")
             print("3: Price Reverses Up Condition")
+            print("4: Combination, e.g. PriceUnder(1.52) AND PriceReversesUp(threshold_pct=0.2)")
 
             # Get the user's choice
             condition_choice_int = input(
@@ -243,6 +205,11 @@ class MATrailingStopLossStrategy(FileLoadingStrategy):
 
             # Get the corresponding condition string name
             condition_choice = condition_mapping.get(condition_choice_int)
+            if condition_choice_int == "4":
+                print(f"Conditions: {', '.join(sorted(ENTRY_CONDITION_TYPES))}; combine with AND, OR, NOT and ( )")
+                condition_choice = input("Enter the entry condition expression: ").strip()
+                # fail here rather than when the monitor evaluates it
+                compile_entry_condition(condition_choice)
 
             # Specific parameters for different entry conditions
             if condition_choice in ['PriceCrossesUpwardCondition', 'PriceUnderCondition']:
@@ -285,21 +252,23 @@ class MATrailingStopLossStrategy(FileLoadingStrategy):
             "entry_condition_price": entry_condition_price if use_entry_condition else None,
             # FOR REVERSE DIRECTION ENTRY CONDITION
             "threshold_pct": threshold_pct if (use_entry_condition and (condition_choice == 'PriceReversesUpCondition')) else None,
-            "current_price": 0,
-            "prices": [],
             # for keeping track of profit
             "entry_price": 0,
             "exit_price": 0,
             "profit": 0,
         }
 
+        order_data = self.validate_order_data(order_data)
+
         print("\nPlease review your order details:")
         print(json.dumps(order_data, indent=4))
         confirmation = input(
             "Type 'Y' to confirm and submit your order, anything else to cancel: ").upper()
 
         if confirmation == 'Y':
-            self.order_handler.update_strategy_data(pair, order_data)
+            with self.order_handler.transaction(pair) as data:
+                data.clear()
+                data.update(order_data)
             print("\nSubmitted order!")
             print(json.dumps(order_data, indent=4))
         else:
@@ -311,16 +280,14 @@ class MATrailingStopLossStrategy(FileLoadingStrategy):
 
     def set_entry_signal(self, pair: str, dataframe: DataFrame, data: Dict[str, Any]):
         try:
-            ma_type = self.get_dfile_arg(pair, 'ma_type')
-            ma_period = self.get_dfile_arg(pair, 'ma_period')
-            loose_stop_loss = self.get_dfile_arg(pair, 'loose_stop_loss')
-            is_loose_stop_loss_trailing = self.get_dfile_arg(
-                pair, 'is_loose_stop_loss_trailing')
-            tight_trailing_stop_loss = self.get_dfile_arg(
-                pair, 'tight_trailing_stop_loss')
-            take_profit = self.get_dfile_arg(pair, 'take_profit')
-            stake_amount = self.get_dfile_arg(pair, 'stake_amount')
-            entry_condition = self.get_dfile_arg(pair, 'entry_condition')
+            ma_type = data.get('ma_type')
+            ma_period = data.get('ma_period')
+            loose_stop_loss = data.get('loose_stop_loss')
+            is_loose_stop_loss_trailing = data.get('is_loose_stop_loss_trailing')
+            tight_trailing_stop_loss = data.get('tight_trailing_stop_loss')
+            take_profit = data.get('take_profit')
+            stake_amount = data.get('stake_amount')
+            entry_condition = data.get('entry_condition')
 
             dataframe.loc[dataframe.index[-1], ['enter_long', 'enter_tag']] = (
                 1,
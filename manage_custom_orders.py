@@ -11,7 +11,8 @@ import json
 import time
 
 # Assuming custom_order_form_handler.py is in the same directory
-from custom_order_form_handler import ACTIVE_ORDER_STATUSES_VALUES, INACTIVE_ORDER_STATUSES_VALUES, OrderStatus, StrategyDataHandler
+from custom_order_form_handler import ACTIVE_ORDER_STATUSES_VALUES, INACTIVE_ORDER_STATUSES_VALUES, REVISION_KEY, STORAGE_BACKENDS, OrderStatus, RevisionConflictError, create_strategy_data_handler
+from order_serializers import ORDER_SERIALIZERS
 from ma_stop_loss_strategy import MAStopLossStrategy
 from ma_slope_strategy import MASlopeStrategy
 from ma_trailing_stop_strategy import MATrailingStopLossStrategy
@@ -24,6 +25,17 @@ from trailing_stop_loss_strategy import TrailingStopLossStrategy
 import argparse
 
 
+STRATEGY_CLASSES = {
+    "StopLossStrategy": StopLossStrategy,
+    "TrailingStopLossStrategy": TrailingStopLossStrategy,
+    "TPActivatingTSLwithSLStrategy": TPActivatingTSLwithSLStrategy,
+    "TPActivatingTSLwithInitialTSLStrategy": TPActivatingTSLwithInitialTSLStrategy,
+    "MASlopeStrategy": MASlopeStrategy,
+    "MATrailingStopLossStrategy": MATrailingStopLossStrategy,
+    "MAStopLossStrategy": MAStopLossStrategy
+}
+
+
 def clear_screen():
 
     if platform.system() == "Windows":
@@ -95,12 +107,15 @@ def view_or_edit_orders():
     clear_screen()
     print("1: View All Orders")
     print("2: Edit An Order")
+    print("3: Export Orders (readable JSON)")
     choice = input("Choose an option: ")
 
     if choice == "1":
         display_orders()
     elif choice == "2":
         edit_existing_orders()
+    elif choice == "3":
+        export_orders()
     else:
         print("Invalid choice.")
 
@@ -111,7 +126,7 @@ def display_orders():
     if not strategy_name:
         return
 
-    handler = StrategyDataHandler(strategy_name, base_dir)
+    handler = create_strategy_data_handler(strategy_name, base_dir, storage_backend, order_file_serializer)
     strategy_data = handler.read_strategy_data()
     
     if not strategy_data:
@@ -125,13 +140,24 @@ def display_orders():
     input("\nPress Enter to return...")
 
 
+def export_orders():
+    """Write the live orders as indented JSON for reading; the bot itself uses the compact file."""
+    if not strategy_name:
+        return
+
+    handler = create_strategy_data_handler(strategy_name, base_dir, storage_backend, order_file_serializer)
+    export_path = handler.export_strategy_data(
+        os.path.join(base_dir, f"ORDERS_EXPORT_{strategy_name}.json"))
+    print(f"Orders exported to {export_path}")
+
+
 def edit_existing_orders():
     """Function to edit existing orders."""
     global strategy_name
     if not strategy_name:
         return
 
-    handler = StrategyDataHandler(strategy_name, base_dir)
+    handler = create_strategy_data_handler(strategy_name, base_dir, storage_backend, order_file_serializer)
     strategy_data = handler.read_strategy_data()
 
     if not strategy_data:
@@ -143,21 +169,27 @@ def edit_existing_orders():
         return
 
     data_to_edit = strategy_data[pair_to_edit]
+    # the bot may change the order while it's being edited, see compare_and_swap below
+    revision = data_to_edit.get(REVISION_KEY, 0)
     print(f"\nEditing Order for Pair: {pair_to_edit}")
     print(json.dumps(data_to_edit, indent=4))
 
 
-    # Editing 'data' part
+    # Editing 'data' part, each value typed as the strategy's order schema expects
+    record_class = STRATEGY_CLASSES[strategy_name].order_record_class
     for key in data_to_edit.keys():
-        new_value = input(f"{key} (current: {data_to_edit[key]}): ")
-        if new_value:
-            if key == "take_profit_hit":
-                # This will correctly parse 'true', 'True', '1', 't', 'y', 'yes' as True, and everything else as False.
-                data_to_edit[key] = new_value.strip().lower() in [
-                    'true', '1', 't', 'y', 'yes']
-            else:   
-                data_to_edit[key] = float(new_value) if new_value.replace('.', '', 1).isdigit() else new_value
-                
+        if key == REVISION_KEY:
+            continue
+        while True:
+            new_value = input(f"{key} (current: {data_to_edit[key]}): ")
+            if not new_value:
+                break
+            try:
+                data_to_edit[key] = record_class.parse_input(key, new_value)
+                break
+            except ValueError as e:
+                print(f"❌ {e}. Enter it again or leave blank to keep the current value.")
+
     # Editing 'status' part
     print(f"Current status: {data_to_edit['status']}")
     new_status = input(
@@ -165,7 +197,18 @@ def edit_existing_orders():
     if new_status in OrderStatus._value2member_map_:
         data_to_edit['status'] = new_status
 
-    handler.update_strategy_data(pair_to_edit, data_to_edit)
+    # the bot reads the order through the same schema: never store one it would reject
+    try:
+        record_class.from_dict(data_to_edit)
+    except ValueError as e:
+        print(f"❌ Invalid order for {pair_to_edit}: {e}. Nothing was saved.")
+        return
+
+    try:
+        handler.compare_and_swap(pair_to_edit, revision, data_to_edit)
+    except RevisionConflictError:
+        print(f"❌ The order for {pair_to_edit} was changed by the bot while you were editing it. Nothing was saved, please edit it again.")
+        return
     print(f"✅ Order for {pair_to_edit} updated successfully!")
 
 
@@ -318,19 +361,12 @@ def place_new_order():
         print(f"No active orders found for {pair}.")
 
     # Depending on the selected strategy, instantiate the strategy class
-    strategy_class = {
-        "StopLossStrategy": StopLossStrategy,
-        "TrailingStopLossStrategy": TrailingStopLossStrategy,
-        "TPActivatingTSLwithSLStrategy": TPActivatingTSLwithSLStrategy,
-        "TPActivatingTSLwithInitialTSLStrategy": TPActivatingTSLwithInitialTSLStrategy,
-        "MASlopeStrategy": MASlopeStrategy,
-        "MATrailingStopLossStrategy": MATrailingStopLossStrategy,
-        "MAStopLossStrategy": MAStopLossStrategy
-    }[strategy_name]
+    strategy_class = STRATEGY_CLASSES[strategy_name]
 
     # Instantiate and set up the strategy
     clear_screen()
-    strategy = strategy_class(dict())
+    strategy = strategy_class({'order_storage_backend': storage_backend,
+                               'order_file_serializer': order_file_serializer})
     strategy.input_strategy_data(pair)
 
     all_order_data = strategy_data_handler.read_strategy_data()
@@ -353,9 +389,9 @@ def update_pair_list(pairs):
 
 
 # Function to filter orders by given statuses
-def filter_orders_by_status(strategy_data, statuses):
-    """Filter orders by given statuses."""
-    return [pair for pair, data in strategy_data.items() if data['status'] in statuses]
+def filter_orders_by_status(handler, statuses):
+    """Pairs whose orders have one of the given statuses (from the handler's status index)."""
+    return handler.pairs_with_status(*statuses)
 
 
 
@@ -368,10 +404,8 @@ def sync_pairlist_to_orders():
 
     global strategy_data_handler
 
-    strategy_data = strategy_data_handler.read_strategy_data()
-
     valid_pairs = filter_orders_by_status(
-        strategy_data, ACTIVE_ORDER_STATUSES_VALUES)
+        strategy_data_handler, ACTIVE_ORDER_STATUSES_VALUES)
 
     update_pair_list(valid_pairs)
     restart_freqtrade()
@@ -452,7 +486,7 @@ def run():
 
         
     global strategy_data_handler 
-    strategy_data_handler = StrategyDataHandler(strategy_name, base_dir)
+    strategy_data_handler = create_strategy_data_handler(strategy_name, base_dir, storage_backend, order_file_serializer)
     
     # Sync pairlist to orders at the start
     sync_pairlist_to_orders()  # will auto launch freqtrade with the selected strategy
@@ -505,6 +539,10 @@ if __name__ == "__main__":
         description="Custom Orders Management System")
     parser.add_argument('--launch_freqtrade', action='store_true',
                         help='Enable automatic management of Freqtrade processes')
+    parser.add_argument('--storage_backend', choices=list(STORAGE_BACKENDS), default='json',
+                        help='Order storage backend, must match the bot\'s "order_storage_backend" config')
+    parser.add_argument('--order_file_serializer', choices=list(ORDER_SERIALIZERS), default='json',
+                        help='Live order file format, must match the bot\'s "order_file_serializer" config')
     args = parser.parse_args()
     
     # # Open frequi
@@ -519,4 +557,6 @@ if __name__ == "__main__":
     # Global variables for paths
     base_dir = os.path.abspath('user_data/strategies')
     pair_list_path = os.path.abspath(os.path.join(base_dir, 'pair_list.txt'))
+    storage_backend = args.storage_backend
+    order_file_serializer = args.order_file_serializer
     run()
@@ -0,0 +1,80 @@
+import argparse
+import glob
+import json
+import os
+
+from custom_order_form_handler import StrategyDataHandler
+from sqlite_order_store import SqliteStrategyDataHandler, to_json
+
+
+LIVE_TRADES_PREFIX = "LIVE_TRADES_LOG_"
+COMPLETED_TRADES_PREFIX = "COMPLETED_TRADES_LOG_"
+
+
+def find_strategy_names(base_dir):
+    """Strategy names that have a LIVE_TRADES_LOG_* or COMPLETED_TRADES_LOG_* file in base_dir."""
+    strategy_names = set()
+    for prefix, extension in ((LIVE_TRADES_PREFIX, ".json"), (COMPLETED_TRADES_PREFIX, ".json"),
+                              (COMPLETED_TRADES_PREFIX, ".jsonl")):
+        for file_path in glob.glob(os.path.join(base_dir, f"{prefix}*{extension}")):
+            file_name = os.path.basename(file_path)
+            strategy_names.add(file_name[len(prefix):-len(extension)])
+    return sorted(strategy_names)
+
+
+def load_json_file(file_path, default):
+    if not os.path.exists(file_path):
+        return default
+    with open(file_path, 'r') as file:
+        try:
+            return json.load(file)
+        except json.JSONDecodeError:
+            print(f"Skipping unreadable file: {file_path}")
+            return default
+
+
+def migrate_strategy(strategy_name, base_dir, overwrite=False):
+    """
+    Import one strategy's JSON order files into the SQLite store. Pairs that already
+    have a row are kept unless `overwrite` is set. Completed trades are only imported
+    when the database has none for this strategy, so running the tool twice doesn't
+    duplicate history.
+    """
+    handler = SqliteStrategyDataHandler(strategy_name, base_dir)
+
+    live_orders = load_json_file(os.path.join(base_dir, f"{LIVE_TRADES_PREFIX}{strategy_name}.json"), {})
+    existing_orders = handler.read_strategy_data()
+    imported_orders = 0
+    with handler.write_lock() as connection:
+        for pair, pair_data in live_orders.items():
+            if pair in existing_orders and not overwrite:
+                continue
+            connection.execute(
+                "INSERT OR REPLACE INTO live_orders (strategy, pair, status, data) VALUES (?, ?, ?, ?)",
+                (strategy_name, pair, pair_data.get('status'), to_json(pair_data)))
+            imported_orders += 1
+
+    # reads the journal (converting a legacy COMPLETED_TRADES_LOG_*.json list first)
+    completed_trades = StrategyDataHandler(strategy_name, base_dir).read_completed_trades()
+    imported_trades = 0
+    if not handler.read_completed_trades():
+        handler.save_completed_trades(completed_trades)
+        imported_trades = len(completed_trades)
+
+    print(f"{strategy_name}: imported {imported_orders} live orders and {imported_trades} completed trades")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Import LIVE_TRADES_LOG_*.json / COMPLETED_TRADES_LOG_*.json files into the SQLite order store")
+    parser.add_argument('--base_dir', default='user_data/strategies',
+                        help='Directory containing the JSON order files (the database is created there too)')
+    parser.add_argument('--strategy', action='append',
+                        help='Strategy to migrate (repeatable), defaults to every strategy found in base_dir')
+    parser.add_argument('--overwrite', action='store_true',
+                        help='Replace orders that already exist in the database')
+    args = parser.parse_args()
+
+    base_dir = os.path.abspath(args.base_dir)
+    for strategy_name in args.strategy or find_strategy_names(base_dir):
+        migrate_strategy(strategy_name, base_dir, overwrite=args.overwrite)
@@ -0,0 +1,248 @@
+import heapq
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from order_store_metrics import Histogram
+
+
+class TimeoutHeap:
+    """
+    Min-heap of one deadline (epoch seconds) per pair. Rescheduling or cancelling a
+    pair leaves its old entry in the heap; stale entries are skipped when they reach
+    the top and dropped in bulk once they outnumber the live ones.
+    """
+
+    def __init__(self):
+        self.heap: List[Tuple[float, str]] = []
+        self.deadlines: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self.deadlines)
+
+    def schedule(self, pair: str, deadline: float):
+        if self.deadlines.get(pair) == deadline:
+            return
+        self.deadlines[pair] = deadline
+        heapq.heappush(self.heap, (deadline, pair))
+        if len(self.heap) > 2 * len(self.deadlines) + 64:
+            self.heap = [(deadline, pair) for pair, deadline in self.deadlines.items()]
+            heapq.heapify(self.heap)
+
+    def cancel(self, pair: str):
+        self.deadlines.pop(pair, None)
+
+    def next_deadline(self) -> Optional[float]:
+        while self.heap and self.deadlines.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now: float) -> List[Tuple[float, str]]:
+        """Remove and return the (deadline, pair) entries due at `now`, earliest first."""
+        due = []
+        while True:
+            deadline = self.next_deadline()
+            if deadline is None or deadline > now:
+                return due
+            due.append(heapq.heappop(self.heap))
+            del self.deadlines[due[-1][1]]
+
+
+class MonitorLoopMetrics:
+    """Timings of a MonitorScheduler: how late rounds start and how long they take."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rounds = 0
+        self.restarts = 0
+        self.stalls = 0
+        # wakeup (order change, new candle) -> start of the round handling it
+        self.wakeup_lag = Histogram()
+        # timeout deadline -> start of the round handling it
+        self.deadline_lag = Histogram()
+        self.round_time = Histogram()
+
+    def observe(self, histogram_name: str, value: float):
+        with self.lock:
+            getattr(self, histogram_name).observe(value)
+
+    def count(self, counter_name: str):
+        with self.lock:
+            setattr(self, counter_name, getattr(self, counter_name) + 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'rounds': self.rounds,
+                'restarts': self.restarts,
+                'stalls': self.stalls,
+                'wakeup_lag': self.wakeup_lag.as_dict(),
+                'deadline_lag': self.deadline_lag.as_dict(),
+                'round_time': self.round_time.as_dict(),
+            }
+
+    def format_log_line(self, name: str) -> str:
+        snapshot = self.snapshot()
+        part = f"{name}: rounds={snapshot['rounds']}"
+        for histogram_name in ('wakeup_lag', 'deadline_lag', 'round_time'):
+            histogram = snapshot[histogram_name]
+            if histogram['count']:
+                part += (f" {histogram_name} p50={histogram['p50'] * 1000:g}ms"
+                         f" p99={histogram['p99'] * 1000:g}ms max={histogram['max'] * 1000:.1f}ms")
+        if snapshot['restarts'] or snapshot['stalls']:
+            part += f" restarts={snapshot['restarts']} stalls={snapshot['stalls']}"
+        return part
+
+
+class MonitorScheduler:
+    """
+    Calls `evaluate(pairs)` on a worker thread whenever something may have changed:
+    after wakeup(pair) (e.g. a new candle in the pair's price buffer), after wakeup()
+    (e.g. the order store changed, `pairs` is None then: check everything) and when a
+    deadline set with schedule_timeout is due. Wakeups arriving during a round are
+    coalesced into the next one. With nothing to do the worker sleeps until the next
+    deadline, or at most `max_idle` seconds before a full round as a safety net.
+
+    A watchdog thread restarts the worker if it dies, logs rounds running longer than
+    `stall_timeout` and, with `report_interval`, logs the loop metrics periodically.
+    """
+
+    def __init__(self, evaluate: Callable[[Optional[Set[str]]], None], name: str = 'Monitor',
+                 max_idle: Optional[float] = None, stall_timeout: float = 60.0,
+                 watchdog_interval: float = 5.0, report_interval: Optional[float] = None):
+        self.evaluate = evaluate
+        self.name = name
+        self.max_idle = max_idle
+        self.stall_timeout = stall_timeout
+        self.watchdog_interval = watchdog_interval
+        self.report_interval = report_interval
+        self.metrics = MonitorLoopMetrics()
+
+        self.condition = threading.Condition()
+        self.timeouts = TimeoutHeap()
+        self.pending_pairs: Set[str] = set()
+        self.pending_all = True  # the first round checks everything
+        # time.monotonic() of the oldest wakeup not handled yet
+        self.pending_since: Optional[float] = None
+        # time.monotonic() the running round started at, None between rounds
+        self.round_started: Optional[float] = None
+
+        self.stop_event = threading.Event()
+        self.worker: Optional[threading.Thread] = None
+        self.watchdog: Optional[threading.Thread] = None
+
+    def wakeup(self, pair: Optional[str] = None):
+        """Request a round for `pair`, or for everything without one."""
+        with self.condition:
+            if pair is None:
+                self.pending_all = True
+            else:
+                self.pending_pairs.add(pair)
+            if self.pending_since is None:
+                self.pending_since = time.monotonic()
+            self.condition.notify()
+
+    def schedule_timeout(self, pair: str, deadline: float):
+        """Run a round for `pair` at `deadline` (epoch seconds), replacing its previous one."""
+        with self.condition:
+            previous = self.timeouts.next_deadline()
+            self.timeouts.schedule(pair, deadline)
+            if previous is None or deadline < previous:
+                self.condition.notify()
+
+    def cancel_timeout(self, pair: str):
+        with self.condition:
+            self.timeouts.cancel(pair)
+
+    def start(self):
+        self.stop_event.clear()
+        self.start_worker()
+        self.watchdog = threading.Thread(target=self.watch, name=f"{self.name} watchdog", daemon=True)
+        self.watchdog.start()
+
+    def start_worker(self):
+        self.worker = threading.Thread(target=self.run, name=self.name, daemon=True)
+        self.worker.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop after the running round (if any) and wait up to `timeout` seconds for it."""
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify_all()
+        for thread in (self.watchdog, self.worker):
+            if thread is not None and thread is not threading.current_thread():
+                thread.join(timeout)
+        self.watchdog = None
+        self.worker = None
+
+    def is_running(self) -> bool:
+        return self.worker is not None and self.worker.is_alive()
+
+    def wait_for_work(self) -> Optional[Tuple[Optional[Set[str]], List[Tuple[float, str]], Optional[float]]]:
+        """Block until a round is due, return (pairs or None for all, due timeouts, pending_since)."""
+        idle_until = time.monotonic() + self.max_idle if self.max_idle is not None else None
+        with self.condition:
+            while not self.stop_event.is_set():
+                due = self.timeouts.pop_due(time.time())
+                if self.pending_all or self.pending_pairs or due:
+                    pairs = None if self.pending_all else self.pending_pairs | {pair for _, pair in due}
+                    pending_since = self.pending_since
+                    self.pending_all, self.pending_pairs, self.pending_since = False, set(), None
+                    return pairs, due, pending_since
+
+                timeout = None
+                if idle_until is not None:
+                    timeout = idle_until - time.monotonic()
+                    if timeout <= 0:
+                        self.pending_all = True
+                        continue
+                next_deadline = self.timeouts.next_deadline()
+                if next_deadline is not None:
+                    until_deadline = max(next_deadline - time.time(), 0)
+                    timeout = until_deadline if timeout is None else min(timeout, until_deadline)
+                self.condition.wait(timeout)
+        return None
+
+    def run(self):
+        while True:
+            work = self.wait_for_work()
+            if work is None:
+                return
+            pairs, due, pending_since = work
+
+            self.round_started = time.monotonic()
+            if pending_since is not None:
+                self.metrics.observe('wakeup_lag', self.round_started - pending_since)
+            now = time.time()
+            for deadline, _ in due:
+                self.metrics.observe('deadline_lag', max(now - deadline, 0))
+            try:
+                self.evaluate(pairs)
+            except Exception as e:
+                logging.error(f"{self.name} round failed: {e}")
+            self.metrics.observe('round_time', time.monotonic() - self.round_started)
+            self.metrics.count('rounds')
+            self.round_started = None
+
+    def watch(self):
+        stall_reported = None
+        next_report = time.monotonic() + self.report_interval if self.report_interval else None
+        while not self.stop_event.wait(self.watchdog_interval):
+            if not self.is_running():
+                logging.error(f"{self.name} thread died, restarting it")
+                self.metrics.count('restarts')
+                with self.condition:
+                    self.pending_all = True
+                self.start_worker()
+
+            round_started = self.round_started
+            if (round_started is not None and round_started != stall_reported
+                    and time.monotonic() - round_started > self.stall_timeout):
+                logging.warning(f"{self.name} round running for over {self.stall_timeout}s")
+                self.metrics.count('stalls')
+                stall_reported = round_started
+
+            if next_report is not None and time.monotonic() >= next_report:
+                logging.info(self.metrics.format_log_line(self.name))
+                next_report += self.report_interval
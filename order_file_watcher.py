@@ -0,0 +1,184 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# inotify(7) event masks
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+def load_inotify():
+    """Return libc if it provides inotify (Linux), otherwise None."""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class OrderFileWatcher:
+    """
+    Calls subscribers shortly after any of `file_paths` is written, replaced or
+    deleted. Uses inotify on Linux (no wakeups while nothing changes) and falls back
+    to polling the files' stat signature every `poll_interval` seconds elsewhere.
+
+    A path that is a directory (when the watcher starts) watches every entry in it;
+    changes are reported with the entry's path (with the directory's path when polling).
+
+    Callbacks run on the watcher thread, receive the changed path and should return
+    quickly (e.g. set an Event).
+    """
+
+    def __init__(self, file_paths: List[str], poll_interval: float = 1.0, use_inotify: bool = True):
+        self.file_paths = [os.path.abspath(file_path) for file_path in file_paths]
+        self.poll_interval = poll_interval
+        self.libc = load_inotify() if use_inotify else None
+        self.subscribers: Dict[int, Callable[[str], None]] = {}
+        self.next_subscription_id = 0
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+        self.stop_pipe = None
+
+    @property
+    def is_event_driven(self) -> bool:
+        """True when changes are reported as they happen (inotify), not by polling."""
+        return self.libc is not None
+
+    def subscribe(self, callback: Callable[[str], None]) -> Callable[[], None]:
+        """Register `callback` and start watching. Returns a function that unsubscribes."""
+        with self.lock:
+            subscription_id = self.next_subscription_id
+            self.next_subscription_id += 1
+            self.subscribers[subscription_id] = callback
+            if self.thread is None:
+                self.start()
+
+        def unsubscribe():
+            with self.lock:
+                self.subscribers.pop(subscription_id, None)
+
+        return unsubscribe
+
+    def notify(self, file_path: str):
+        with self.lock:
+            callbacks = list(self.subscribers.values())
+        for callback in callbacks:
+            try:
+                callback(file_path)
+            except Exception as e:
+                logging.error(f"Order file watcher callback failed for {file_path}: {e}")
+
+    def start(self):
+        self.stop_event.clear()
+        if self.libc is not None:
+            try:
+                inotify_fd, watch_directories = self.add_inotify_watches()
+            except OSError as e:
+                logging.warning(f"inotify unavailable ({e}), polling order files every {self.poll_interval}s")
+                self.libc = None
+        if self.libc is not None:
+            self.stop_pipe = os.pipe()
+            target, args = self.run_inotify, (inotify_fd, watch_directories)
+        else:
+            target, args = self.run_polling, ()
+        self.thread = threading.Thread(target=target, args=args, name='OrderFileWatcher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.stop_pipe is not None:
+            os.write(self.stop_pipe[1], b'x')
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.stop_pipe is not None:
+            for fd in self.stop_pipe:
+                os.close(fd)
+            self.stop_pipe = None
+
+    def add_inotify_watches(self) -> Tuple[int, Dict[int, str]]:
+        inotify_fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if inotify_fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        # watch the directories: files replaced by rename get a new inode
+        directories = {file_path if os.path.isdir(file_path) else os.path.dirname(file_path)
+                       for file_path in self.file_paths}
+        watch_directories = {}
+        for directory in directories:
+            watch_descriptor = self.libc.inotify_add_watch(inotify_fd, directory.encode(), WATCH_MASK)
+            if watch_descriptor < 0:
+                errno = ctypes.get_errno()
+                os.close(inotify_fd)
+                raise OSError(errno, os.strerror(errno))
+            watch_directories[watch_descriptor] = directory
+        return inotify_fd, watch_directories
+
+    def run_inotify(self, inotify_fd: int, watch_directories: Dict[int, str]):
+        watched_directories = {file_path for file_path in self.file_paths if os.path.isdir(file_path)}
+        stop_fd = self.stop_pipe[0]
+        try:
+            while not self.stop_event.is_set():
+                readable, _, _ = select.select([inotify_fd, stop_fd], [], [])
+                if stop_fd in readable:
+                    break
+                try:
+                    buffer = os.read(inotify_fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+
+                # several events usually arrive for one write, report each file once
+                changed = []
+                offset = 0
+                while offset < len(buffer):
+                    watch_descriptor, _, _, name_length = EVENT_HEADER.unpack_from(buffer, offset)
+                    name_start = offset + EVENT_HEADER.size
+                    name = buffer[name_start:name_start + name_length].rstrip(b'\0').decode(errors='replace')
+                    offset = name_start + name_length
+                    directory = watch_directories.get(watch_descriptor)
+                    if directory is None or not name:
+                        continue
+                    file_path = os.path.join(directory, name)
+                    if (directory in watched_directories or file_path in self.file_paths) \
+                            and file_path not in changed:
+                        changed.append(file_path)
+
+                for file_path in changed:
+                    self.notify(file_path)
+        finally:
+            os.close(inotify_fd)
+
+    @staticmethod
+    def stat_signature(file_path: str):
+        try:
+            stat_result = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        return (stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino)
+
+    def run_polling(self):
+        signatures = {file_path: self.stat_signature(file_path) for file_path in self.file_paths}
+        while not self.stop_event.wait(self.poll_interval):
+            for file_path in self.file_paths:
+                signature = self.stat_signature(file_path)
+                if signature != signatures[file_path]:
+                    signatures[file_path] = signature
+                    self.notify(file_path)
@@ -0,0 +1,215 @@
+import numbers
+from typing import Any, Dict, Tuple
+
+
+# Answers accepted for a bool field at a prompt
+TRUE_INPUTS = ('true', '1', 't', 'y', 'yes')
+FALSE_INPUTS = ('false', '0', 'f', 'n', 'no')
+
+
+def coerce_field(name: str, field_type: type, value: Any) -> Any:
+    """Return `value` as `field_type` (None stays None), raise ValueError if it isn't one."""
+    if value is None:
+        return None
+    if field_type is float:
+        if isinstance(value, numbers.Real) and not isinstance(value, bool):
+            return float(value)
+    elif field_type is int:
+        if isinstance(value, numbers.Integral) and not isinstance(value, bool):
+            return int(value)
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+    elif field_type is bool:
+        if isinstance(value, bool):
+            return value
+    elif isinstance(value, field_type):
+        return value
+    raise ValueError(f"Order field '{name}' must be {field_type.__name__}, got {value!r}")
+
+
+class OrderRecord:
+    """
+    Typed view of one pair's order data. Each strategy's record class declares its
+    own fields in FIELDS as name -> (type, default), on top of the ones every order
+    has. A record is validated once when it is built from the stored dict
+    (from_dict) and turned back into one with to_dict. Keys the schema doesn't know
+    are kept in `extra`, so nothing is lost on a round trip.
+
+    Records returned by StrategyDataHandler.read_pair_record are shared between
+    callers: treat them as read-only and write changes with a transaction.
+    """
+
+    FIELDS: Dict[str, Tuple[type, Any]] = {
+        'status': (str, None),
+        'created_at': (str, None),
+        'stake_amount': (float, None),
+        'entry_condition': (str, None),
+        'entry_condition_timeout': (str, None),
+        'entry_condition_price': (float, None),
+        'threshold_pct': (float, None),
+        'entry_price': (float, 0.0),
+        'exit_price': (float, 0.0),
+        'profit': (float, 0.0),
+        # revision of the stored record, see custom_order_form_handler.REVISION_KEY
+        '_rev': (int, 0),
+    }
+    # keys of older order files -> current field name
+    ALIASES: Dict[str, str] = {}
+
+    __slots__ = tuple(FIELDS) + ('extra',)
+
+    # FIELDS of the class and all its bases, set for every subclass
+    ALL_FIELDS: Dict[str, Tuple[type, Any]] = FIELDS
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        all_fields = {}
+        for klass in reversed(cls.__mro__):
+            all_fields.update(klass.__dict__.get('FIELDS', {}))
+        cls.ALL_FIELDS = all_fields
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'OrderRecord':
+        data = dict(data)
+        nested = data.pop('data', None)
+        if isinstance(nested, dict):
+            # legacy layout: parameters nested under 'data', status at the top level
+            data = {**nested, **data}
+        for legacy_key, key in cls.ALIASES.items():
+            if legacy_key in data:
+                value = data.pop(legacy_key)
+                data.setdefault(key, value)
+
+        record = cls.__new__(cls)
+        for name, (field_type, default) in cls.ALL_FIELDS.items():
+            if name in data:
+                setattr(record, name, coerce_field(name, field_type, data.pop(name)))
+            else:
+                setattr(record, name, default)
+        record.extra = data
+        return record
+
+    @classmethod
+    def validate_fields(cls, values: Dict[str, Any]) -> Dict[str, Any]:
+        """Coerce the known fields of a partial update, leaving other keys untouched."""
+        return {
+            key: coerce_field(key, cls.ALL_FIELDS[key][0], value) if key in cls.ALL_FIELDS else value
+            for key, value in values.items()
+        }
+
+    @classmethod
+    def parse_input(cls, name: str, text: str) -> Any:
+        """
+        A value typed at a prompt for field `name`, as the field's type; raise
+        ValueError if it isn't one. Keys the schema doesn't know are read as a number
+        if they parse as one, else kept as text.
+        """
+        text = text.strip()
+        if name not in cls.ALL_FIELDS:
+            try:
+                return float(text)
+            except ValueError:
+                return text
+        field_type = cls.ALL_FIELDS[name][0]
+        if field_type is bool:
+            if text.lower() in TRUE_INPUTS:
+                return True
+            if text.lower() in FALSE_INPUTS:
+                return False
+        elif field_type in (int, float):
+            try:
+                return coerce_field(name, field_type, float(text))
+            except ValueError:
+                pass
+        else:
+            return coerce_field(name, field_type, text)
+        raise ValueError(f"Order field '{name}' must be {field_type.__name__}, got {text!r}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {name: getattr(self, name) for name in self.ALL_FIELDS}
+        data.update(self.extra)
+        return data
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.ALL_FIELDS)
+        return f"{self.__class__.__name__}({fields})"
+
+
+class MATrailingStopLossOrder(OrderRecord):
+    FIELDS = {
+        'ma_type': (str, None),
+        'ma_period': (int, None),
+        'loose_stop_loss': (float, None),
+        # missing in older order files, which read it as falsy: static
+        'is_loose_stop_loss_trailing': (bool, False),
+        'tight_trailing_stop_loss': (float, None),
+        'take_profit': (float, None),
+        'take_profit_hit': (bool, False),
+        'highest_ma': (float, 0.0),
+    }
+    ALIASES = {
+        'loose_trailing_stop_loss': 'loose_stop_loss',
+        'profit_activating_tsl': 'take_profit',
+    }
+    __slots__ = tuple(FIELDS)
+
+
+class MAStopLossOrder(OrderRecord):
+    FIELDS = {
+        'ma_type': (str, None),
+        'ma_period': (int, None),
+        'hard_stop_loss': (float, None),
+        'tight_trailing_stop_loss': (float, None),
+        'profit_activating_tsl': (float, None),
+        'take_profit_hit': (bool, False),
+        'highest_ma': (float, 0.0),
+    }
+    ALIASES = {
+        'loose_trailing_stop_loss': 'hard_stop_loss',
+    }
+    __slots__ = tuple(FIELDS)
+
+
+class MASlopeOrder(OrderRecord):
+    FIELDS = {
+        'ma_type': (str, None),
+        'ma_period': (int, None),
+        'slope_period': (int, None),
+        'slope_threshold': (float, None),
+        'stop_loss_pct': (float, None),
+    }
+    __slots__ = tuple(FIELDS)
+
+
+class StopLossOrder(OrderRecord):
+    FIELDS = {
+        'stop_loss_pct': (float, None),
+    }
+    __slots__ = tuple(FIELDS)
+
+
+class TrailingStopLossOrder(OrderRecord):
+    FIELDS = {
+        'trailing_stop_loss_pct': (float, None),
+    }
+    __slots__ = tuple(FIELDS)
+
+
+class TPActivatingTSLwithSLOrder(OrderRecord):
+    FIELDS = {
+        'profit_activating_tsl': (float, None),
+        'take_profit_hit': (bool, False),
+        'trailing_stop_loss': (float, None),
+        'hard_stop_loss': (float, None),
+    }
+    __slots__ = tuple(FIELDS)
+
+
+class TPActivatingTSLwithInitialTSLOrder(OrderRecord):
+    FIELDS = {
+        'profit_activating_tsl': (float, None),
+        'take_profit_hit': (bool, False),
+        'tight_trailing_stop_loss': (float, None),
+        'loose_trailing_stop_loss': (float, None),
+    }
+    __slots__ = tuple(FIELDS)
@@ -0,0 +1,96 @@
+import json
+from typing import Any, Dict
+
+
+class OrderSerializer:
+    """
+    Encodes the live order file. `extension` is used for the file name so that files
+    written in incompatible formats never get mixed up.
+    """
+    name = ''
+    extension = '.json'
+
+    def dumps(self, data: Any) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, raw: bytes) -> Any:
+        raise NotImplementedError
+
+
+def to_builtin(value: Any) -> Any:
+    """Fallback for values the encoders don't know (numpy scalars and arrays)."""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+class JsonOrderSerializer(OrderSerializer):
+    """Compact JSON (no indentation or spaces), readable by every JSON serializer."""
+    name = 'json'
+
+    def dumps(self, data: Any) -> bytes:
+        return json.dumps(data, separators=(',', ':'), default=to_builtin).encode()
+
+    def loads(self, raw: bytes) -> Any:
+        return json.loads(raw)
+
+
+class PrettyJsonOrderSerializer(JsonOrderSerializer):
+    """
+    Indented JSON, for files meant to be read by humans (see export_strategy_data).
+    Not a live order file format, so it isn't in ORDER_SERIALIZERS.
+    """
+    name = 'pretty-json'
+
+    def dumps(self, data: Any) -> bytes:
+        return json.dumps(data, indent=4, default=to_builtin).encode()
+
+
+class OrjsonOrderSerializer(OrderSerializer):
+    """Compact JSON through orjson (same file format as 'json', several times faster)."""
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+        self.options = orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(self, data: Any) -> bytes:
+        return self.orjson.dumps(data, default=to_builtin, option=self.options)
+
+    def loads(self, raw: bytes) -> Any:
+        return self.orjson.loads(raw)
+
+
+class MsgpackOrderSerializer(OrderSerializer):
+    """Binary MessagePack, smallest and fastest to parse but not human readable."""
+    name = 'msgpack'
+    extension = '.msgpack'
+
+    def __init__(self):
+        import msgpack
+        self.msgpack = msgpack
+
+    def dumps(self, data: Any) -> bytes:
+        return self.msgpack.packb(data, use_bin_type=True, default=to_builtin)
+
+    def loads(self, raw: bytes) -> Any:
+        return self.msgpack.unpackb(raw, raw=False)
+
+
+# Formats of the live order file
+ORDER_SERIALIZERS: Dict[str, type] = {
+    serializer.name: serializer
+    for serializer in (JsonOrderSerializer, OrjsonOrderSerializer, MsgpackOrderSerializer)
+}
+DEFAULT_ORDER_SERIALIZER = JsonOrderSerializer.name
+
+
+def get_order_serializer(name=None) -> OrderSerializer:
+    name = name or DEFAULT_ORDER_SERIALIZER
+    if name not in ORDER_SERIALIZERS:
+        raise ValueError(f"Unsupported order file serializer: {name} (choose from {', '.join(ORDER_SERIALIZERS)})")
+    try:
+        return ORDER_SERIALIZERS[name]()
+    except ImportError as e:
+        raise ImportError(f"Order file serializer '{name}' needs an optional package: {e}") from e
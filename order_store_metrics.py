@@ -0,0 +1,204 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, ContextManager, Dict, Iterator, List, Optional
+
+
+# Upper bounds (seconds) of the lock wait / lock hold / parse time histogram buckets
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+OPERATIONS = ('read', 'save', 'update', 'add_completed')
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        # last slot counts values above the largest bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile, capped at the largest value seen."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+            'buckets': dict(zip([*self.buckets, float('inf')], self.counts)),
+        }
+
+
+class OperationMetrics:
+    def __init__(self):
+        self.count = 0
+        self.lock_wait = Histogram()
+        self.lock_hold = Histogram()
+        self.parse_time = Histogram()
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+
+class OrderStoreMetrics:
+    """
+    Counters and histograms of a StrategyDataHandler's operations (read, save, update,
+    add_completed): call count, lock wait and hold time, parse time and bytes
+    read/written. Handlers only record when their `metrics` attribute is set, see
+    StrategyDataHandler.enable_metrics.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.operations = {operation: OperationMetrics() for operation in OPERATIONS}
+        self.started_at = time.time()
+        self.reporter: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+
+    def record(self, operation: str, count: int = 1, lock_wait: Optional[float] = None,
+               lock_hold: Optional[float] = None, parse_time: Optional[float] = None,
+               bytes_read: int = 0, bytes_written: int = 0):
+        with self.lock:
+            metrics = self.operations[operation]
+            metrics.count += count
+            if lock_wait is not None:
+                metrics.lock_wait.observe(lock_wait)
+            if lock_hold is not None:
+                metrics.lock_hold.observe(lock_hold)
+            if parse_time is not None:
+                metrics.parse_time.observe(parse_time)
+            metrics.bytes_read += bytes_read
+            metrics.bytes_written += bytes_written
+
+    @contextmanager
+    def measure_lock(self, operation: str, lock: ContextManager) -> Iterator[Any]:
+        """Enter `lock` and record one `operation` with its wait and hold time."""
+        started = time.perf_counter()
+        acquired = None
+        try:
+            with lock as value:
+                acquired = time.perf_counter()
+                yield value
+        finally:
+            if acquired is None:
+                # timed out waiting for the lock
+                self.record(operation, lock_wait=time.perf_counter() - started)
+            else:
+                self.record(operation, lock_wait=acquired - started,
+                            lock_hold=time.perf_counter() - acquired)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                operation: {
+                    'count': metrics.count,
+                    'lock_wait': metrics.lock_wait.as_dict(),
+                    'lock_hold': metrics.lock_hold.as_dict(),
+                    'parse_time': metrics.parse_time.as_dict(),
+                    'bytes_read': metrics.bytes_read,
+                    'bytes_written': metrics.bytes_written,
+                }
+                for operation, metrics in self.operations.items()
+            }
+
+    def format_log_line(self) -> str:
+        parts = []
+        for operation, metrics in self.snapshot().items():
+            if not metrics['count']:
+                continue
+            part = f"{operation} n={metrics['count']}"
+            if metrics['lock_wait']['count']:
+                part += (f" wait p50={metrics['lock_wait']['p50'] * 1000:g}ms"
+                         f" p99={metrics['lock_wait']['p99'] * 1000:g}ms"
+                         f" max={metrics['lock_wait']['max'] * 1000:.1f}ms"
+                         f" hold p99={metrics['lock_hold']['p99'] * 1000:g}ms")
+            if metrics['parse_time']['count']:
+                part += (f" parses={metrics['parse_time']['count']}"
+                         f" parse p99={metrics['parse_time']['p99'] * 1000:g}ms")
+            if metrics['bytes_read']:
+                part += f" read={metrics['bytes_read'] / 1024:.1f}KB"
+            if metrics['bytes_written']:
+                part += f" written={metrics['bytes_written'] / 1024:.1f}KB"
+            parts.append(part)
+        return f"Order store {self.name}: " + ('; '.join(parts) if parts else 'idle')
+
+    def format_text(self) -> str:
+        """Prometheus text exposition format, e.g. for node_exporter's textfile collector."""
+        lines: List[str] = [
+            "# TYPE order_store_operations_total counter",
+            "# TYPE order_store_bytes_read_total counter",
+            "# TYPE order_store_bytes_written_total counter",
+            "# TYPE order_store_lock_wait_seconds histogram",
+            "# TYPE order_store_lock_hold_seconds histogram",
+            "# TYPE order_store_parse_time_seconds histogram",
+        ]
+        labels = f'strategy="{self.name}"'
+        for operation, metrics in self.snapshot().items():
+            operation_labels = f'{labels},operation="{operation}"'
+            lines.append(f"order_store_operations_total{{{operation_labels}}} {metrics['count']}")
+            lines.append(f"order_store_bytes_read_total{{{operation_labels}}} {metrics['bytes_read']}")
+            lines.append(f"order_store_bytes_written_total{{{operation_labels}}} {metrics['bytes_written']}")
+            for histogram_name in ('lock_wait', 'lock_hold', 'parse_time'):
+                histogram = metrics[histogram_name]
+                metric = f"order_store_{histogram_name}_seconds"
+                cumulative = 0
+                for bound, bucket_count in histogram['buckets'].items():
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else f"{bound:g}"
+                    lines.append(f'{metric}_bucket{{{operation_labels},le="{le}"}} {cumulative}')
+                lines.append(f"{metric}_sum{{{operation_labels}}} {histogram['sum']}")
+                lines.append(f"{metric}_count{{{operation_labels}}} {histogram['count']}")
+        return '\n'.join(lines) + '\n'
+
+    def write_metrics_file(self, file_path: str):
+        temp_file_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(temp_file_path, 'w') as file:
+            file.write(self.format_text())
+        os.replace(temp_file_path, file_path)
+
+    def start_reporting(self, interval: float, metrics_file: Optional[str] = None):
+        """Log a summary line (and rewrite `metrics_file`) every `interval` seconds."""
+        if self.reporter is not None:
+            return
+
+        def report():
+            while not self.stop_event.wait(interval):
+                logging.info(self.format_log_line())
+                if metrics_file:
+                    try:
+                        self.write_metrics_file(metrics_file)
+                    except OSError as e:
+                        logging.error(f"Could not write order store metrics to {metrics_file}: {e}")
+
+        self.stop_event.clear()
+        self.reporter = threading.Thread(target=report, name='OrderStoreMetrics', daemon=True)
+        self.reporter.start()
+
+    def stop_reporting(self):
+        self.stop_event.set()
+        if self.reporter is not None:
+            self.reporter.join()
+            self.reporter = None
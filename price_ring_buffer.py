@@ -0,0 +1,250 @@
+import mmap
+import os
+import struct
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+
+# Header: magic, capacity, sequence, count, total writes, last candle timestamp, last price, pair,
+# series (what the values are, e.g. 'HMA_5'), resets
+HEADER_FORMAT = '<8sqQqqdd32s16sq'
+HEADER_SIZE = 128
+MAGIC = b'PRICERB1'
+
+CAPACITY_OFFSET = 8
+SEQUENCE_OFFSET = 16
+COUNT_OFFSET = 24
+WRITES_OFFSET = 32
+TIMESTAMP_OFFSET = 40
+LAST_PRICE_OFFSET = 48
+PAIR_OFFSET = 56
+SERIES_OFFSET = 88
+SERIES_SIZE = 16
+RESETS_OFFSET = 104
+
+assert struct.calcsize(HEADER_FORMAT) <= HEADER_SIZE
+
+
+class PriceRingBuffer:
+    """
+    Fixed-size float64 ring buffer for one pair, memory-mapped from a file so the
+    strategy (writer) and the entry condition monitor or other processes (readers)
+    share it without serializing anything.
+
+    Every value is stored twice (at i and i + capacity), so the newest `count` values
+    are always one contiguous slice and readers get a numpy view instead of a copy.
+    Writers bump `sequence` to an odd value while writing and back to even when done;
+    readers use it to detect that a view changed underneath them (seqlock).
+    """
+
+    def __init__(self, path: str, pair: str = '', capacity: int = 100, create: bool = False):
+        self.path = path
+        if create:
+            self.file = open(path, 'a+b')
+            size = HEADER_SIZE + 2 * capacity * 8
+            if os.fstat(self.file.fileno()).st_size < size:
+                self.file.truncate(size)
+        else:
+            self.file = open(path, 'r+b')
+        self.mmap = mmap.mmap(self.file.fileno(), 0)
+
+        if self.mmap[:8] != MAGIC:
+            if not create:
+                raise ValueError(f"{path} is not an initialized price buffer")
+            struct.pack_into(HEADER_FORMAT, self.mmap, 0, MAGIC, capacity, 0, 0, 0, 0.0, 0.0,
+                             pair.encode()[:32], b'', 0)
+
+        self.capacity = struct.unpack_from('<q', self.mmap, CAPACITY_OFFSET)[0]
+        self.values = np.frombuffer(self.mmap, dtype=np.float64, count=2 * self.capacity, offset=HEADER_SIZE)
+
+    def close(self):
+        # views handed out by read() keep the mapping alive until they are dropped
+        self.values = None
+        try:
+            self.mmap.close()
+        except BufferError:
+            pass
+        self.file.close()
+
+    def read_header_field(self, fmt: str, offset: int):
+        return struct.unpack_from(fmt, self.mmap, offset)[0]
+
+    @property
+    def sequence(self) -> int:
+        return self.read_header_field('<Q', SEQUENCE_OFFSET)
+
+    @property
+    def count(self) -> int:
+        return self.read_header_field('<q', COUNT_OFFSET)
+
+    @property
+    def timestamp(self) -> float:
+        """Timestamp (epoch seconds) of the candle the newest value belongs to, 0 if empty."""
+        return self.read_header_field('<d', TIMESTAMP_OFFSET)
+
+    @property
+    def last_price(self) -> float:
+        return self.read_header_field('<d', LAST_PRICE_OFFSET)
+
+    @property
+    def pair(self) -> str:
+        return self.mmap[PAIR_OFFSET:PAIR_OFFSET + 32].rstrip(b'\0').decode()
+
+    @property
+    def resets(self) -> int:
+        return self.read_header_field('<q', RESETS_OFFSET)
+
+    def position(self) -> Tuple[int, int]:
+        """
+        (resets, total writes): which values the buffer holds, for readers that only
+        want the values added since they last looked. Take it between read() and
+        changed_since() to know it belongs to the view.
+        """
+        return self.resets, self.read_header_field('<q', WRITES_OFFSET)
+
+    @property
+    def series(self) -> str:
+        """What the values are a series of (e.g. the MA type and period), '' if not set."""
+        return self.mmap[SERIES_OFFSET:SERIES_OFFSET + SERIES_SIZE].rstrip(b'\0').decode()
+
+    def begin_write(self):
+        struct.pack_into('<Q', self.mmap, SEQUENCE_OFFSET, self.sequence + 1)
+
+    def end_write(self, timestamp: float, last_price: float):
+        struct.pack_into('<dd', self.mmap, TIMESTAMP_OFFSET, timestamp, last_price)
+        struct.pack_into('<Q', self.mmap, SEQUENCE_OFFSET, self.sequence + 1)
+
+    def write_values(self, values: np.ndarray, reset: bool):
+        values = np.asarray(values, dtype=np.float64)[-self.capacity:]
+        writes = 0 if reset else self.read_header_field('<q', WRITES_OFFSET)
+        count = 0 if reset else self.count
+
+        positions = (writes + np.arange(len(values))) % self.capacity
+        self.values[positions] = values
+        self.values[positions + self.capacity] = values
+
+        struct.pack_into('<qq', self.mmap, COUNT_OFFSET,
+                         min(count + len(values), self.capacity), writes + len(values))
+
+    def append(self, values, timestamp: float, last_price: float = 0.0):
+        """Append the values of new candles, `timestamp` being the newest candle's."""
+        self.begin_write()
+        try:
+            self.write_values(values, reset=False)
+        finally:
+            self.end_write(timestamp, last_price)
+
+    def reset(self, values, timestamp: float, last_price: float = 0.0, series: str = ''):
+        """Replace the whole content with `values` (newest last), a series of `series`."""
+        encoded = series.encode()
+        if len(encoded) > SERIES_SIZE:
+            raise ValueError(f"Price buffer series name longer than {SERIES_SIZE} bytes: {series!r}")
+        self.begin_write()
+        try:
+            self.write_values(values, reset=True)
+            self.mmap[SERIES_OFFSET:SERIES_OFFSET + SERIES_SIZE] = encoded.ljust(SERIES_SIZE, b'\0')
+            struct.pack_into('<q', self.mmap, RESETS_OFFSET, self.resets + 1)
+        finally:
+            self.end_write(timestamp, last_price)
+
+    def sync(self, timestamps: np.ndarray, values: np.ndarray, last_price: float = 0.0, series: str = '') -> bool:
+        """
+        Bring the buffer up to date with a series of candles (epoch seconds, oldest
+        first): only candles newer than the buffer's timestamp are appended, and the
+        buffer is rebuilt from the series' tail when it's empty, holds another
+        `series` (e.g. the order's MA type or period changed) or the series no longer
+        contains the buffer's last candle (restart, gap). Returns whether anything
+        was written.
+        """
+        if len(timestamps) == 0:
+            return False
+        last_timestamp = self.timestamp
+        same_series = self.series == series
+        if timestamps[-1] == last_timestamp and same_series:
+            return False
+
+        start = int(np.searchsorted(timestamps, last_timestamp, side='right'))
+        if not same_series or last_timestamp == 0 or start == 0 or timestamps[start - 1] != last_timestamp:
+            self.reset(values, timestamps[-1], last_price, series)
+        else:
+            self.append(values[start:], timestamps[-1], last_price)
+        return True
+
+    def read(self, retries: int = 100) -> Tuple[np.ndarray, int]:
+        """
+        Return a read-only view of the buffered values (oldest first, no copy) and the
+        sequence number it was taken at. Pass the number to `changed_since` after
+        using the view to know whether a writer modified it meanwhile.
+        """
+        for _ in range(retries):
+            sequence = self.sequence
+            if sequence % 2 == 0:
+                count = self.count
+                end = self.read_header_field('<q', WRITES_OFFSET) % self.capacity + self.capacity
+                view = self.values[end - count:end]
+                if self.sequence == sequence:
+                    view.flags.writeable = False
+                    return view, sequence
+            time.sleep(0)
+        raise TimeoutError(f"Price buffer {self.path} is being written continuously")
+
+    def changed_since(self, sequence: int) -> bool:
+        return self.sequence != sequence
+
+
+class PriceBufferStore:
+    """
+    One PriceRingBuffer file per pair in `directory`. Buffers are opened once and kept
+    mapped for the lifetime of the store.
+    """
+
+    def __init__(self, directory: str, capacity: int = 100):
+        self.directory = directory
+        self.capacity = capacity
+        self.buffers: Dict[str, PriceRingBuffer] = {}
+        # Called with the pair after sync wrote new candles (e.g. to wake the monitor)
+        self.on_update: Optional[Callable[[str], None]] = None
+
+    def get_buffer_path(self, pair: str) -> str:
+        return os.path.join(self.directory, pair.replace('/', '_').replace(':', '_') + '.ring')
+
+    def get_buffer(self, pair: str, create: bool = False) -> Optional[PriceRingBuffer]:
+        buffer = self.buffers.get(pair)
+        if buffer is None:
+            path = self.get_buffer_path(pair)
+            if create:
+                os.makedirs(self.directory, exist_ok=True)
+            elif not os.path.exists(path):
+                return None
+            buffer = PriceRingBuffer(path, pair=pair, capacity=self.capacity, create=create)
+            self.buffers[pair] = buffer
+        return buffer
+
+    def sync(self, pair: str, timestamps: np.ndarray, values: np.ndarray, last_price: float = 0.0,
+             series: str = ''):
+        buffer = self.get_buffer(pair, create=True)
+        if buffer.sync(timestamps, values, last_price, series) and self.on_update is not None:
+            self.on_update(pair)
+
+    def read(self, pair: str) -> Tuple[Optional[np.ndarray], int]:
+        """Zero-copy view of a pair's values and its sequence, (None, 0) if the pair has no buffer."""
+        buffer = self.get_buffer(pair)
+        if buffer is None:
+            return None, 0
+        return buffer.read()
+
+    def changed_since(self, pair: str, sequence: int) -> bool:
+        buffer = self.get_buffer(pair)
+        return buffer is not None and buffer.changed_since(sequence)
+
+    def position(self, pair: str) -> Tuple[int, int]:
+        """A pair's PriceRingBuffer.position, (0, 0) if it has no buffer."""
+        buffer = self.get_buffer(pair)
+        return (0, 0) if buffer is None else buffer.position()
+
+    def close(self):
+        for buffer in self.buffers.values():
+            buffer.close()
+        self.buffers.clear()
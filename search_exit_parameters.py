@@ -0,0 +1,354 @@
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import signal
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from exit_simulator import EXIT_REASONS, simulate_ma_trailing_exits
+from indicators import ema, hma
+
+
+# One combination of the MATrailingStopLossOrder fields typed in input_strategy_data:
+# (ma_type, ma_period, loose_stop_loss, is_loose_stop_loss_trailing, tight_trailing_stop_loss, take_profit)
+Combination = Tuple[str, int, float, bool, float, float]
+COMBINATION_FIELDS = ('ma_type', 'ma_period', 'loose_stop_loss', 'is_loose_stop_loss_trailing',
+                      'tight_trailing_stop_loss', 'take_profit')
+# exit counts per reason, e.g. 'exits_tight_trailing_stop_loss' (the reasons share names with the fields)
+REASON_COLUMNS = tuple(f'exits_{reason}' for reason in EXIT_REASONS)
+METRICS = ('trades', 'exits', 'mean_profit', 'median_profit', 'total_profit', 'win_rate', 'worst_profit',
+           'mean_candles_held')
+RANK_BY = ('mean_profit', 'median_profit', 'total_profit', 'win_rate', 'worst_profit')
+
+CONFIG_FILE = 'search.json'
+CLOSE_FILE = 'close.npy'
+ENTRIES_FILE = 'entries.npy'
+RESULTS_FILE = 'results.jsonl'
+RANKING_FILE = 'ranking.csv'
+
+# (combination, entry) trades per simulate_ma_trailing_exits call of a worker, which
+# bounds its per-trade arrays (~150 bytes each) next to the simulator's own block budget
+BATCH_TRADES = 100_000
+
+# Per worker process: the memory-mapped prices and entries (see init_worker) and the
+# moving averages of the last MA the worker evaluated
+WORKER_STATE: Dict[str, Any] = {}
+
+
+def load_close_prices(file_path: str) -> np.ndarray:
+    """Close prices of a freqtrade OHLCV file (.json candle lists, or .feather/.parquet via pandas)."""
+    if file_path.endswith('.json'):
+        with open(file_path, 'r') as file:
+            candles = json.load(file)
+        return np.array([candle[4] for candle in candles], dtype=np.float64)
+    import pandas as pd
+    dataframe = pd.read_feather(file_path) if file_path.endswith('.feather') else pd.read_parquet(file_path)
+    return dataframe['close'].to_numpy(dtype=np.float64)
+
+
+def build_grid(ma_types: Sequence[str], ma_periods: Sequence[int], loose_stop_losses: Sequence[float],
+               loose_modes: Sequence[str], tight_stop_losses: Sequence[float],
+               take_profits: Sequence[float]) -> List[Combination]:
+    """
+    Every combination of the values, checked like input_strategy_data checks them.
+    A tight stop loss of 100 deactivates the take profit (set to 100 as the order form
+    does), so its take profits collapse into one combination.
+    """
+    for loose_stop_loss in loose_stop_losses:
+        if not 0 <= loose_stop_loss < 10:
+            raise ValueError(f"Loose stop loss must be between 0 and 10%, got {loose_stop_loss}")
+    for tight_stop_loss in tight_stop_losses:
+        if not (0 <= tight_stop_loss < 10 or tight_stop_loss == 100):
+            raise ValueError(f"Tight trailing stop loss must be between 0 and 10% (or deactivated == 100%), "
+                             f"got {tight_stop_loss}")
+    for take_profit in take_profits:
+        if take_profit <= 0:
+            raise ValueError(f"Take profit must be greater than 0, got {take_profit}")
+
+    grid = []
+    seen = set()
+    for ma_type, ma_period, loose_stop_loss, loose_mode, tight_stop_loss, take_profit in itertools.product(
+            ma_types, ma_periods, loose_stop_losses, loose_modes, tight_stop_losses, take_profits):
+        if tight_stop_loss == 100:
+            take_profit = 100.0
+        combination = (ma_type.upper(), int(ma_period), float(loose_stop_loss), loose_mode == 'trailing',
+                       float(tight_stop_loss), float(take_profit))
+        if combination not in seen:
+            seen.add(combination)
+            grid.append(combination)
+    return grid
+
+
+def moving_average_rows(close: np.ndarray, ma_type: str, ma_period: int) -> np.ndarray:
+    """The strategy's MA (indicators.ema / hma, as the indicator engine computes it) of every row."""
+    function = ema if ma_type == 'EMA' else hma
+    return np.vstack([function(row, ma_period) for row in close])
+
+
+def init_worker(run_dir: str, max_candles: Optional[int]):
+    # Ctrl-C is handled by the parent, which keeps the results written so far
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    WORKER_STATE['close'] = np.load(os.path.join(run_dir, CLOSE_FILE), mmap_mode='r')
+    WORKER_STATE['entries'] = np.load(os.path.join(run_dir, ENTRIES_FILE), mmap_mode='r')
+    WORKER_STATE['max_candles'] = max_candles
+    WORKER_STATE['ma_key'] = None
+
+
+def evaluate_task(task: Tuple[str, int, List[Tuple[int, Combination]]]) -> List[Dict[str, Any]]:
+    """
+    Simulate the entries for a chunk of combinations sharing one MA, at most
+    BATCH_TRADES (combination, entry) trades per simulate_ma_trailing_exits call.
+    Trades still open at the end (or after max_candles) are valued at the last close
+    they reach.
+    """
+    ma_type, ma_period, combinations = task
+    close, entries, max_candles = WORKER_STATE['close'], WORKER_STATE['entries'], WORKER_STATE['max_candles']
+    if WORKER_STATE['ma_key'] != (ma_type, ma_period):
+        WORKER_STATE['ma'] = moving_average_rows(close, ma_type, ma_period)
+        WORKER_STATE['ma_key'] = (ma_type, ma_period)
+
+    series, entry_index = np.asarray(entries[0]), np.asarray(entries[1])
+    trades, count = len(entry_index), len(combinations)
+    values = np.array([combination[2:] for _, combination in combinations], dtype=np.float64)
+    # kept for every trade of the chunk: 13 bytes each
+    profit = np.empty(count * trades, dtype=np.float64)
+    held = np.empty(count * trades, dtype=np.int32)
+    reason_codes = np.empty(count * trades, dtype=np.int8)
+    for start in range(0, count * trades, BATCH_TRADES):
+        batch = np.arange(start, min(start + BATCH_TRADES, count * trades))
+        rows, batch_entries = batch // trades, batch % trades
+        batch_series, batch_index = series[batch_entries], entry_index[batch_entries]
+        open_rate = close[batch_series, batch_index]
+        simulation = simulate_ma_trailing_exits(
+            close, WORKER_STATE['ma'], batch_index, open_rate,
+            loose_stop_loss=values[rows, 0],
+            is_loose_stop_loss_trailing=values[rows, 1].astype(bool),
+            tight_trailing_stop_loss=values[rows, 2],
+            take_profit=values[rows, 3],
+            series=batch_series, max_candles=max_candles)
+
+        last_index = np.full(len(batch), close.shape[1] - 1, dtype=np.int64)
+        if max_candles is not None:
+            last_index = np.minimum(batch_index + max_candles - 1, last_index)
+        exited = simulation.exit_index >= 0
+        final_index = np.where(exited, simulation.exit_index, last_index)
+        profit[batch] = np.where(exited, simulation.profit,
+                                 (close[batch_series, last_index] - open_rate) / open_rate * 100)
+        held[batch] = final_index - batch_index
+        reason_codes[batch] = simulation.reason_codes
+
+    profit = profit.reshape(count, trades)
+    held = held.reshape(count, trades)
+    reason_codes = reason_codes.reshape(count, trades)
+    results = []
+    for row, (index, combination) in enumerate(combinations):
+        result = {'index': index}
+        result.update(zip(COMBINATION_FIELDS, combination))
+        reason_counts = np.bincount(reason_codes[row], minlength=len(EXIT_REASONS) + 1)
+        result.update({
+            'trades': trades,
+            'exits': int(trades - reason_counts[0]),
+            'mean_profit': float(profit[row].mean()) if trades else 0.0,
+            'median_profit': float(np.median(profit[row])) if trades else 0.0,
+            'total_profit': float(profit[row].sum()),
+            'win_rate': float((profit[row] > 0).mean()) if trades else 0.0,
+            'worst_profit': float(profit[row].min()) if trades else 0.0,
+            'mean_candles_held': float(held[row].mean()) if trades else 0.0,
+        })
+        result.update({column: int(reason_counts[code + 1]) for code, column in enumerate(REASON_COLUMNS)})
+        results.append(result)
+    return results
+
+
+def read_results(results_path: str) -> Dict[int, Dict[str, Any]]:
+    """
+    Results written so far by combination index. A last line cut off by an
+    interruption is removed from the file, so the next results start on a new line.
+    """
+    results = {}
+    if not os.path.exists(results_path):
+        return results
+    complete = 0
+    with open(results_path, 'rb') as file:
+        for line in file:
+            if not line.endswith(b'\n'):
+                break
+            complete += len(line)
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            results[result['index']] = result
+    if complete < os.path.getsize(results_path):
+        os.truncate(results_path, complete)
+    return results
+
+
+def describe_data_files(data_files: Sequence[str]) -> List[Dict[str, Any]]:
+    """Path, size and modification time of each data file, so a run isn't resumed on changed data."""
+    described = []
+    for file_path in data_files:
+        stat = os.stat(file_path)
+        described.append({'path': os.path.abspath(file_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+    return described
+
+
+def prepare_run(run_dir: str, config: Dict[str, Any], data_files: Sequence[str]):
+    """
+    Write the run's config and its memory-mapped inputs, or check that an existing run
+    was started with the same config and unchanged data files (so its results can be
+    resumed).
+    """
+    config_path = os.path.join(run_dir, CONFIG_FILE)
+    if os.path.exists(config_path):
+        with open(config_path, 'r') as file:
+            stored_config = json.load(file)
+        if stored_config != config:
+            if {**stored_config, 'data': config['data']} == config:
+                raise SystemExit(f"The data files of the search in {run_dir} changed since it started "
+                                 f"(re-downloaded or extended?), use another --run-dir")
+            raise SystemExit(f"{run_dir} holds a search with other settings, use another --run-dir")
+        return
+
+    os.makedirs(run_dir, exist_ok=True)
+    series = [load_close_prices(file_path) for file_path in data_files]
+    # one row per pair, aligned on the most recent candles
+    candles = min(len(prices) for prices in series)
+    close = np.vstack([prices[len(prices) - candles:] for prices in series])
+    entry_candles = np.arange(config['warmup'], candles, config['entry_every'], dtype=np.int64)
+    entries = np.vstack([np.repeat(np.arange(len(series)), len(entry_candles)), np.tile(entry_candles, len(series))])
+
+    # results.jsonl is only trusted next to a complete config: write it last
+    np.save(os.path.join(run_dir, CLOSE_FILE), close)
+    np.save(os.path.join(run_dir, ENTRIES_FILE), entries)
+    with open(config_path + '.tmp', 'w') as file:
+        json.dump(config, file, indent=4)
+    os.replace(config_path + '.tmp', config_path)
+
+
+def make_tasks(grid: List[Combination], selected: Sequence[int], chunk_size: int):
+    """Chunks of up to `chunk_size` combinations sharing an MA, so workers compute each MA once per chunk."""
+    by_ma: Dict[Tuple[str, int], List[Tuple[int, Combination]]] = {}
+    for index in selected:
+        by_ma.setdefault(grid[index][:2], []).append((index, grid[index]))
+    tasks = []
+    for (ma_type, ma_period), combinations in by_ma.items():
+        for start in range(0, len(combinations), chunk_size):
+            tasks.append((ma_type, ma_period, combinations[start:start + chunk_size]))
+    return tasks
+
+
+def write_ranking(run_dir: str, results: Dict[int, Dict[str, Any]], rank_by: str, top: int):
+    ranked = sorted(results.values(), key=lambda result: result[rank_by], reverse=True)
+    columns = ('rank',) + COMBINATION_FIELDS + METRICS + REASON_COLUMNS
+    with open(os.path.join(run_dir, RANKING_FILE), 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        for rank, result in enumerate(ranked, 1):
+            writer.writerow([rank] + [result[column] for column in columns[1:]])
+
+    print(f"\nTop {min(top, len(ranked))} of {len(ranked)} by {rank_by} (full table in {os.path.join(run_dir, RANKING_FILE)}):")
+    print(f"{'#':>4} {'MA':>8} {'loose':>10} {'tight':>6} {'TP':>6} {'mean %':>8} {'median %':>9} "
+          f"{'win':>5} {'worst %':>8} {'held':>8}")
+    for rank, result in enumerate(ranked[:top], 1):
+        loose = f"{result['loose_stop_loss']:g}{'T' if result['is_loose_stop_loss_trailing'] else 'S'}"
+        print(f"{rank:>4} {result['ma_type'] + str(result['ma_period']):>8} {loose:>10} "
+              f"{result['tight_trailing_stop_loss']:>6g} {result['take_profit']:>6g} {result['mean_profit']:>8.3f} "
+              f"{result['median_profit']:>9.3f} {result['win_rate']:>5.0%} {result['worst_profit']:>8.2f} "
+              f"{result['mean_candles_held']:>8.0f}")
+
+
+def run_search(args):
+    grid = build_grid(args.ma_types, args.ma_periods, args.loose_stop_losses, args.loose_modes,
+                      args.tight_stop_losses, args.take_profits)
+    selected = list(range(len(grid)))
+    if args.samples is not None and args.samples < len(grid):
+        selected = sorted(random.Random(args.seed).sample(selected, args.samples))
+
+    config = {
+        'data': describe_data_files(args.data),
+        'grid': [list(combination) for combination in grid],
+        'selected': selected,
+        'warmup': args.warmup if args.warmup is not None else 2 * max(args.ma_periods),
+        'entry_every': args.entry_every,
+        'max_candles': args.max_candles,
+    }
+    prepare_run(args.run_dir, config, args.data)
+
+    results_path = os.path.join(args.run_dir, RESULTS_FILE)
+    results = read_results(results_path)
+    remaining = [index for index in selected if index not in results]
+    entries = np.load(os.path.join(args.run_dir, ENTRIES_FILE), mmap_mode='r')
+    print(f"{len(selected)} combinations x {entries.shape[1]} entries, {len(selected) - len(remaining)} done already")
+
+    if remaining:
+        tasks = make_tasks(grid, remaining, args.chunk_size)
+        started = time.monotonic()
+        next_report = started
+        done = 0
+        workers = args.workers or os.cpu_count() or 1
+        try:
+            with multiprocessing.Pool(workers, initializer=init_worker,
+                                      initargs=(args.run_dir, args.max_candles)) as pool, \
+                    open(results_path, 'a') as results_file:
+                for task_results in pool.imap_unordered(evaluate_task, tasks):
+                    for result in task_results:
+                        results_file.write(json.dumps(result) + '\n')
+                        results[result['index']] = result
+                    results_file.flush()
+                    os.fsync(results_file.fileno())
+                    done += len(task_results)
+                    now = time.monotonic()
+                    if now >= next_report or done == len(remaining):
+                        rate = done / max(now - started, 1e-9)
+                        print(f"{done}/{len(remaining)} combinations, {rate:.1f}/s on {workers} workers, "
+                              f"ETA {(len(remaining) - done) / rate:.0f}s")
+                        next_report = now + args.report_interval
+        except KeyboardInterrupt:
+            print(f"\nInterrupted after {done} combinations; run the same command again to resume.")
+            return
+
+    write_ranking(args.run_dir, {index: results[index] for index in selected}, args.rank_by, args.top)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Search the MATrailingStopLoss exit settings (the values asked by input_strategy_data) on "
+                    "historical candles: every combination is replayed with exit_simulator over entries spread "
+                    "across the data, on a process pool, and ranked. Interrupted runs resume from --run-dir.")
+    parser.add_argument('--data', nargs='+', required=True,
+                        help='freqtrade OHLCV files (.json, .feather or .parquet), one per pair, same timeframe')
+    parser.add_argument('--run-dir', default='exit_parameter_search',
+                        help='Directory for the memory-mapped inputs, the results so far and the ranking')
+    parser.add_argument('--ma-types', nargs='+', default=['EMA', 'HMA'], choices=['EMA', 'HMA'])
+    parser.add_argument('--ma-periods', nargs='+', type=int, default=[9, 14, 21, 50])
+    parser.add_argument('--loose-stop-losses', nargs='+', type=float, default=[0.5, 1, 2, 3, 5])
+    parser.add_argument('--loose-modes', nargs='+', default=['trailing', 'static'], choices=['trailing', 'static'])
+    parser.add_argument('--tight-stop-losses', nargs='+', type=float, default=[0, 0.25, 0.5, 1, 2, 100],
+                        help='0 sells at the take profit, 100 deactivates the tight stop and the take profit')
+    parser.add_argument('--take-profits', nargs='+', type=float, default=[0.5, 1, 2, 3, 5])
+    parser.add_argument('--samples', type=int, help='Random search: evaluate this many combinations of the grid')
+    parser.add_argument('--seed', type=int, default=42, help='Seed of the --samples selection')
+    parser.add_argument('--entry-every', type=int, default=60, help='Simulate an entry every N candles of every pair')
+    parser.add_argument('--warmup', type=int, help='Candles before the first entry (default: 2x the largest MA period)')
+    parser.add_argument('--max-candles', type=int, help='Close trades still open after N candles at that close')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: one per CPU)')
+    parser.add_argument('--chunk-size', type=int, default=8,
+                        help='Combinations simulated together per task. Each worker needs about 8 bytes per candle '
+                             'of all pairs (its MA), 13 bytes per entry x chunk size (the trades\' results) and '
+                             '~200 MB for the simulation batches')
+    parser.add_argument('--rank-by', default='mean_profit', choices=RANK_BY)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--report-interval', type=float, default=5.0, help='Seconds between progress lines')
+    args = parser.parse_args()
+
+    try:
+        run_search(args)
+    except ValueError as e:
+        parser.error(str(e))
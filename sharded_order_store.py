@@ -0,0 +1,319 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+import portalocker
+
+from custom_order_form_handler import INACTIVE_ORDER_STATUSES_VALUES, OrderStatus, StrategyDataHandler, stamp_revision
+
+
+# Starts with '.' so it can't collide with a pair's file name
+MANIFEST_FILE = ".manifest.json"
+
+
+class ShardedStrategyDataHandler(StrategyDataHandler):
+    """
+    StrategyDataHandler keeping one order file per pair in
+    LIVE_TRADES_LOG_<strategy>_shards/ plus a manifest of the pairs and their
+    statuses (the status index), instead of one
+    file for all pairs. Every pair has its own write lock, so updates of different
+    pairs (custom_exit for one, populate_entry_trend or the monitor for another) never
+    wait for each other and only rewrite that pair's record. Adding or removing a pair
+    also locks the manifest briefly.
+
+    read_strategy_data assembles all pairs from the manifest on demand; each file is
+    only re-parsed when its signature changed.
+    """
+
+    def __init__(self, strategy_name: str, base_dir='.', serializer: Optional[str] = None):
+        super().__init__(strategy_name, base_dir, serializer=serializer)
+        self.shard_dir = os.path.join(self.base_dir, f"LIVE_TRADES_LOG_{self.strategy_name}_shards")
+        # lock and temporary files live in subdirectories, so they don't wake watchers of shard_dir
+        os.makedirs(os.path.join(self.shard_dir, '.locks'), exist_ok=True)
+        os.makedirs(os.path.join(self.shard_dir, '.tmp'), exist_ok=True)
+
+        # file name -> (signature, parsed content, change generation it was checked at)
+        self._files: Dict[str, Tuple[Any, Any, int]] = {}
+        # bumped by the watcher on every change in shard_dir, see subscribe()
+        self._change_generation = 0
+
+        self.convert_order_file_to_shards()
+        self.rename_legacy_shard_files()
+
+    def get_manifest_path(self) -> str:
+        return os.path.join(self.shard_dir, MANIFEST_FILE)
+
+    def get_shard_file_name(self, pair: str) -> str:
+        # percent-encoded, so different pairs (BTC/USD, BTC_USD) never share a file
+        return quote(pair, safe='') + self.serializer.extension
+
+    def get_shard_path(self, pair: str) -> str:
+        return os.path.join(self.shard_dir, self.get_shard_file_name(pair))
+
+    @contextmanager
+    def file_write_lock(self, file_name: str, operation: Optional[str] = None) -> Iterator[None]:
+        lock = portalocker.Lock(os.path.join(self.shard_dir, '.locks', file_name + '.lock'), 'a', timeout=10)
+        with self.measure_lock(operation, lock) if operation else lock:
+            yield
+
+    def get_watched_file_paths(self) -> List[str]:
+        return [self.shard_dir]
+
+    def on_order_file_changed(self, file_path: str):
+        super().on_order_file_changed(file_path)
+        self._change_generation += 1
+
+    def invalidate_cache(self):
+        with self._cache_lock:
+            self._files.clear()
+
+    def read_cached_file(self, file_name: str, loads: Callable[[bytes], Any], verify: bool = False) -> Any:
+        """
+        Parsed content of a file in shard_dir, None if it is missing or unreadable.
+        Like refresh_cache, the file is only parsed again when its signature changed,
+        and with an inotify watcher running not even stat'ed until it reports a change.
+        """
+        generation = self._change_generation
+        file_path = os.path.join(self.shard_dir, file_name)
+        with self._cache_lock:
+            cached = self._files.get(file_name)
+        if cached is not None:
+            signature, content, checked_generation = cached
+            if (not verify and checked_generation == generation
+                    and self._watcher is not None and self._watcher.is_event_driven):
+                return content
+            try:
+                current_signature = self.file_signature(os.stat(file_path))
+            except FileNotFoundError:
+                current_signature = None
+            if current_signature == signature:
+                with self._cache_lock:
+                    self._files[file_name] = (signature, content, generation)
+                return content
+
+        try:
+            with open(file_path, 'rb') as file:
+                signature = self.file_signature(os.fstat(file.fileno()))
+                raw = file.read()
+            parse_started = time.perf_counter()
+            content = loads(raw) if raw else None
+            self.record_metrics('read', count=0, bytes_read=len(raw),
+                                parse_time=time.perf_counter() - parse_started)
+        except FileNotFoundError:
+            signature, content = None, None
+        except ValueError:
+            content = None
+
+        with self._cache_lock:
+            self._files[file_name] = (signature, content, generation)
+        return content
+
+    def write_file(self, file_name: str, content: Any, dumps: Callable[[Any], bytes]) -> int:
+        """
+        Atomically replace a file in shard_dir and return the number of bytes written.
+        Must hold its file_write_lock.
+        """
+        generation = self._change_generation
+        file_path = os.path.join(self.shard_dir, file_name)
+        temp_file_path = os.path.join(self.shard_dir, '.tmp',
+                                      f"{file_name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        raw = dumps(content)
+        with open(temp_file_path, 'wb') as file:
+            file.write(raw)
+            file.flush()
+            signature = self.file_signature(os.fstat(file.fileno()))
+        os.replace(temp_file_path, file_path)
+
+        with self._cache_lock:
+            self._files[file_name] = (signature, content, generation)
+        return len(raw)
+
+    def remove_file(self, file_name: str) -> None:
+        try:
+            os.remove(os.path.join(self.shard_dir, file_name))
+        except FileNotFoundError:
+            pass
+        with self._cache_lock:
+            self._files[file_name] = (None, None, self._change_generation)
+
+    def load_pair_data(self, raw: bytes) -> Optional[Dict[str, Any]]:
+        pair_data = self.serializer.loads(raw)
+        return pair_data if isinstance(pair_data, dict) else None
+
+    @staticmethod
+    def load_manifest(raw: bytes) -> Optional[Dict[str, Dict[str, str]]]:
+        manifest = json.loads(raw)
+        if not isinstance(manifest, dict):
+            return None
+        # manifests written before the status index have no 'statuses'
+        return {'pairs': manifest.get('pairs', {}), 'statuses': manifest.get('statuses', {})}
+
+    @staticmethod
+    def dump_manifest(manifest: Dict[str, Dict[str, str]]) -> bytes:
+        return json.dumps(manifest, separators=(',', ':'), sort_keys=True).encode()
+
+    def read_full_manifest(self, verify: bool = False) -> Dict[str, Dict[str, str]]:
+        """{'pairs': {pair: shard file name}, 'statuses': {pair: status}}, must not be mutated."""
+        return self.read_cached_file(MANIFEST_FILE, self.load_manifest, verify) or {'pairs': {}, 'statuses': {}}
+
+    def read_manifest(self, verify: bool = False) -> Dict[str, str]:
+        """The strategy's pairs, {pair: shard file name}."""
+        return self.read_full_manifest(verify)['pairs']
+
+    def update_manifest(self, pair: str, status: Optional[str], remove: bool = False) -> None:
+        """Record `pair` with its `status` in the manifest, or `remove` it."""
+        with self.file_write_lock(MANIFEST_FILE):
+            manifest = self.read_full_manifest(verify=True)
+            pairs, statuses = dict(manifest['pairs']), dict(manifest['statuses'])
+            if remove:
+                if pair not in pairs:
+                    return
+                del pairs[pair]
+                statuses.pop(pair, None)
+            else:
+                if pair in pairs and statuses.get(pair) == status:
+                    return
+                pairs[pair] = self.get_shard_file_name(pair)
+                statuses[pair] = status
+            self.write_file(MANIFEST_FILE, {'pairs': pairs, 'statuses': statuses}, self.dump_manifest)
+
+    def pairs_with_status(self, *statuses: str) -> List[str]:
+        """
+        Sorted pairs whose order has one of `statuses`, from the manifest alone. Pairs
+        the manifest has no status for (older manifests) are looked up in their file.
+        """
+        manifest = self.read_full_manifest()
+        pairs = []
+        for pair in manifest['pairs']:
+            status = manifest['statuses'].get(pair)
+            if status is None:
+                pair_data = self.read_shard(pair)
+                status = pair_data.get('status') if pair_data is not None else None
+            if status in statuses:
+                pairs.append(pair)
+        return sorted(pairs)
+
+    def read_shard(self, pair: str, verify: bool = False) -> Optional[Dict[str, Any]]:
+        return self.read_cached_file(self.get_shard_file_name(pair), self.load_pair_data, verify)
+
+    def read_strategy_data(self, statuses: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        self.record_metrics('read')
+        if statuses is None:
+            pairs = sorted(self.read_manifest())
+        else:
+            statuses = list(statuses)
+            pairs = self.pairs_with_status(*statuses)
+        strategy_data = {}
+        for pair in pairs:
+            pair_data = self.read_shard(pair)
+            # the manifest is updated after the pair's file, skip statuses it lags behind on
+            if pair_data is not None and (statuses is None or pair_data.get('status') in statuses):
+                strategy_data[pair] = dict(pair_data)
+        return strategy_data
+
+    def read_pair_data(self, pair: str) -> Optional[Dict[str, Any]]:
+        self.record_metrics('read')
+        pair_data = self.read_shard(pair)
+        return dict(pair_data) if pair_data is not None else None
+
+    def get_cached_pair_data(self, pair: str) -> Optional[Dict[str, Any]]:
+        return self.read_shard(pair)
+
+    def write_pair_data(self, pair: str, original_data: Optional[Dict[str, Any]], data: Dict[str, Any]) -> int:
+        """
+        Persist `data` for `pair`, moving it to the completed trades if its status is
+        inactive. Must hold the pair's file_write_lock. Returns the shard bytes written.
+        """
+        file_name = self.get_shard_file_name(pair)
+        if data.get('status') in INACTIVE_ORDER_STATUSES_VALUES:
+            if original_data is None:
+                return 0
+            # readers of the manifest must never see a pair without its file
+            self.update_manifest(pair, None, remove=True)
+            self.remove_file(file_name)
+            exited_trade = dict(original_data)
+            exited_trade.update(data)
+            exited_trade['status'] = OrderStatus.EXITED.value
+            self.add_completed_trade(pair, exited_trade)
+            return 0
+
+        bytes_written = self.write_file(file_name, dict(data), self.serializer.dumps)
+        if original_data is None or original_data.get('status') != data.get('status'):
+            self.update_manifest(pair, data.get('status'))
+        return bytes_written
+
+    @contextmanager
+    def transaction(self, pair: str) -> Iterator[Dict[str, Any]]:
+        """
+        Same contract as StrategyDataHandler.transaction, but only `pair`'s lock is
+        taken and only its file is written.
+        """
+        with self.file_write_lock(self.get_shard_file_name(pair), 'update'):
+            original_data = self.read_shard(pair, verify=True)
+            pair_data = dict(original_data) if original_data is not None else {}
+
+            yield pair_data
+
+            if not stamp_revision(original_data, pair_data):
+                return
+            bytes_written = self.write_pair_data(pair, original_data, pair_data)
+        self.record_metrics('update', count=0, bytes_written=bytes_written)
+
+    def save_strategy_data(self, data: Dict[str, Any]) -> None:
+        for pair, pair_data in sorted(data.items(), key=lambda item: item[0]):
+            with self.transaction(pair) as stored_data:
+                stored_data.clear()
+                stored_data.update(pair_data)
+
+    def convert_order_file_to_shards(self) -> None:
+        """
+        One-time split of an existing LIVE_TRADES_LOG_<strategy> file into shards. The
+        old file is renamed to *.migrated.
+        """
+        file_path = self.get_order_file_path()
+        if not os.path.exists(file_path):
+            return
+
+        with self.order_file_write_lock():
+            # another process may have converted it while we waited for the lock
+            if not os.path.exists(file_path):
+                return
+            for pair, pair_data in sorted(super().refresh_cache(verify=True).items()):
+                if not isinstance(pair_data, dict):
+                    continue
+                with self.file_write_lock(self.get_shard_file_name(pair)):
+                    if self.read_shard(pair, verify=True) is None:
+                        self.write_pair_data(pair, None, pair_data)
+            os.replace(file_path, file_path + '.migrated')
+            super().invalidate_cache()
+
+    def rename_legacy_shard_files(self) -> None:
+        """
+        One-time rename of shards named the old way ('/' and ':' replaced by '_', which
+        let different pairs share a file) to get_shard_file_name, using the file names
+        recorded in the manifest.
+        """
+        renamed = False
+        for pair, file_name in sorted(self.read_manifest(verify=True).items()):
+            new_file_name = self.get_shard_file_name(pair)
+            if file_name == new_file_name:
+                continue
+            with self.file_write_lock(new_file_name):
+                old_path, new_path = os.path.join(self.shard_dir, file_name), self.get_shard_path(pair)
+                # another process may have renamed it already
+                if os.path.exists(old_path) and not os.path.exists(new_path):
+                    os.replace(old_path, new_path)
+            renamed = True
+        if not renamed:
+            return
+
+        with self.file_write_lock(MANIFEST_FILE):
+            manifest = self.read_full_manifest(verify=True)
+            pairs = {pair: self.get_shard_file_name(pair) for pair in manifest['pairs']}
+            self.write_file(MANIFEST_FILE, {'pairs': pairs, 'statuses': dict(manifest['statuses'])},
+                            self.dump_manifest)
+        self.invalidate_cache()
@@ -0,0 +1,246 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from custom_order_form_handler import INACTIVE_ORDER_STATUSES_VALUES, OrderStatus, StrategyDataHandler, stamp_revision
+
+
+ORDER_DATABASE_FILE = "CUSTOM_ORDERS.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS live_orders (
+    strategy TEXT NOT NULL,
+    pair TEXT NOT NULL,
+    status TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (strategy, pair)
+);
+CREATE TABLE IF NOT EXISTS completed_trades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    strategy TEXT NOT NULL,
+    pair TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS completed_trades_strategy ON completed_trades (strategy);
+CREATE INDEX IF NOT EXISTS live_orders_status ON live_orders (strategy, status);
+"""
+
+
+def replace_non_finite(value: Any) -> Any:
+    """`value` with NaN and +-inf floats (also nested) replaced by None."""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: replace_non_finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [replace_non_finite(item) for item in value]
+    return value
+
+
+def to_json(value: Any) -> str:
+    """
+    JSON text for the database. NaN and +-inf aren't valid JSON and SQLite's json
+    functions reject them, so they are stored as null (e.g. a highest_ma computed from
+    a NaN candle).
+    """
+    try:
+        return json.dumps(value, allow_nan=False)
+    except ValueError:
+        return json.dumps(replace_non_finite(value), allow_nan=False)
+
+
+class SqliteStrategyDataHandler(StrategyDataHandler):
+    """
+    StrategyDataHandler storing orders in a shared SQLite database (WAL mode) instead of
+    one JSON file per strategy. Every (strategy, pair) is one row, so an update only
+    touches that row and only rewrites the fields that changed. Readers never block
+    writers (or each other), which matters when several bots and the
+    manage_custom_orders CLI use the same base_dir.
+    """
+
+    def __init__(self, strategy_name: str, base_dir='.', serializer: Optional[str] = None):
+        # rows are always JSON (patched with json_set), the serializer only names the unused live file
+        super().__init__(strategy_name, base_dir, serializer=serializer)
+        self.database_file = ORDER_DATABASE_FILE
+        # sqlite3 connections can't be shared between threads (strategy + monitor thread)
+        self._local = threading.local()
+
+    def get_database_path(self) -> str:
+        return os.path.join(self.base_dir, self.database_file)
+
+    def get_watched_file_paths(self) -> List[str]:
+        # committed transactions land in the -wal file first
+        database_path = self.get_database_path()
+        return [database_path, database_path + '-wal']
+
+    def get_connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # isolation_level=None: transactions are started explicitly in transaction()
+            connection = sqlite3.connect(self.get_database_path(), timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def write_lock(self, operation: str = 'update') -> Iterator[sqlite3.Connection]:
+        """
+        Run the block in a write transaction (BEGIN IMMEDIATE), committing on success.
+        """
+        with self.measure_lock(operation, self.immediate_transaction()) as connection:
+            yield connection
+
+    @contextmanager
+    def immediate_transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = self.get_connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def read_strategy_data(self, statuses: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        self.record_metrics('read')
+        if statuses is None:
+            rows = self.get_connection().execute(
+                "SELECT pair, data FROM live_orders WHERE strategy = ? ORDER BY pair",
+                (self.strategy_name,))
+        else:
+            statuses = list(statuses)
+            if not statuses:
+                return {}
+            rows = self.get_connection().execute(
+                f"SELECT pair, data FROM live_orders WHERE strategy = ? AND status IN ({', '.join('?' * len(statuses))})"
+                " ORDER BY pair",
+                (self.strategy_name, *statuses))
+        return {pair: json.loads(data) for pair, data in rows}
+
+    def pairs_with_status(self, *statuses: str) -> List[str]:
+        if not statuses:
+            return []
+        rows = self.get_connection().execute(
+            f"SELECT pair FROM live_orders WHERE strategy = ? AND status IN ({', '.join('?' * len(statuses))})"
+            " ORDER BY pair",
+            (self.strategy_name, *statuses))
+        return [pair for pair, in rows]
+
+    def read_pair_data(self, pair: str) -> Optional[Dict[str, Any]]:
+        self.record_metrics('read')
+        return self.get_cached_pair_data(pair)
+
+    def get_cached_pair_data(self, pair: str) -> Optional[Dict[str, Any]]:
+        # nothing is cached in this backend, records are rebuilt on every read
+        row = self.get_connection().execute(
+            "SELECT data FROM live_orders WHERE strategy = ? AND pair = ?",
+            (self.strategy_name, pair)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def write_pair_data(self, connection: sqlite3.Connection, pair: str,
+                        original_data: Optional[Dict[str, Any]], data: Dict[str, Any]) -> None:
+        """
+        Persist `data` for `pair` inside an open write transaction. Existing rows are
+        patched with json_set/json_remove so only the changed fields are written.
+        """
+        if data.get('status') in INACTIVE_ORDER_STATUSES_VALUES:
+            connection.execute(
+                "DELETE FROM live_orders WHERE strategy = ? AND pair = ?", (self.strategy_name, pair))
+            if original_data is not None:
+                exited_trade = dict(original_data)
+                exited_trade.update(data)
+                exited_trade['status'] = OrderStatus.EXITED.value
+                self.insert_completed_trade(connection, pair, exited_trade)
+            return
+
+        if original_data is None:
+            connection.execute(
+                "INSERT INTO live_orders (strategy, pair, status, data) VALUES (?, ?, ?, ?)",
+                (self.strategy_name, pair, data.get('status'), to_json(data)))
+            return
+
+        changed = {key: value for key, value in data.items()
+                   if key not in original_data or original_data[key] != value}
+        removed = [key for key in original_data if key not in data]
+        if not changed and not removed:
+            return
+        if any('"' in key for key in (*changed, *removed)):
+            # a JSON path can't address a key containing '"': rewrite the whole row
+            connection.execute(
+                "UPDATE live_orders SET data = ?, status = ? WHERE strategy = ? AND pair = ?",
+                (to_json(data), data.get('status'), self.strategy_name, pair))
+            return
+
+        expression = "data"
+        parameters: List[Any] = []
+        if removed:
+            expression = f"json_remove({expression}{', ?' * len(removed)})"
+            parameters.extend(self.json_path(key) for key in removed)
+        if changed:
+            expression = f"json_set({expression}{', ?, json(?)' * len(changed)})"
+            for key, value in changed.items():
+                parameters.extend((self.json_path(key), to_json(value)))
+
+        connection.execute(
+            f"UPDATE live_orders SET data = {expression}, status = ? WHERE strategy = ? AND pair = ?",
+            (*parameters, data.get('status'), self.strategy_name, pair))
+
+    @staticmethod
+    def json_path(key: str) -> str:
+        # a double-quoted label keeps field names containing '.' or '[' one path segment;
+        # SQLite doesn't unescape inside it, so keys containing '"' are never patched
+        return f'$."{key}"'
+
+    @contextmanager
+    def transaction(self, pair: str) -> Iterator[Dict[str, Any]]:
+        with self.write_lock() as connection:
+            row = connection.execute(
+                "SELECT data FROM live_orders WHERE strategy = ? AND pair = ?",
+                (self.strategy_name, pair)).fetchone()
+            original_data = json.loads(row[0]) if row else None
+            pair_data = dict(original_data) if original_data is not None else {}
+
+            yield pair_data
+
+            if stamp_revision(original_data, pair_data):
+                self.write_pair_data(connection, pair, original_data, pair_data)
+
+    def save_strategy_data(self, data: Dict[str, Any]) -> None:
+        with self.write_lock('save') as connection:
+            for pair, pair_data in sorted(data.items(), key=lambda item: item[0]):
+                row = connection.execute(
+                    "SELECT data FROM live_orders WHERE strategy = ? AND pair = ?",
+                    (self.strategy_name, pair)).fetchone()
+                original_data = json.loads(row[0]) if row else None
+                pair_data = dict(pair_data)
+                if stamp_revision(original_data, pair_data):
+                    self.write_pair_data(connection, pair, original_data, pair_data)
+
+    def insert_completed_trade(self, connection: sqlite3.Connection, pair, trade_data):
+        connection.execute(
+            "INSERT INTO completed_trades (strategy, pair, data) VALUES (?, ?, ?)",
+            (self.strategy_name, pair, to_json(trade_data)))
+
+    def add_completed_trade(self, pair, trade_data):
+        with self.write_lock('add_completed') as connection:
+            self.insert_completed_trade(connection, pair, trade_data)
+
+    def read_completed_trades(self) -> List[Dict[str, Any]]:
+        rows = self.get_connection().execute(
+            "SELECT pair, data FROM completed_trades WHERE strategy = ? ORDER BY id",
+            (self.strategy_name,))
+        return [{pair: json.loads(data)} for pair, data in rows]
+
+    def save_completed_trades(self, data: List[Dict[str, Any]]) -> None:
+        with self.write_lock('save') as connection:
+            connection.execute(
+                "DELETE FROM completed_trades WHERE strategy = ?", (self.strategy_name,))
+            for completed_trade in data:
+                for pair, trade_data in completed_trade.items():
+                    self.insert_completed_trade(connection, pair, trade_data)
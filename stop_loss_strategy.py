@@ -9,6 +9,7 @@ from pandas import DataFrame
 
 from custom_order_form_handler import OrderStatus
 from file_loading_strategy import FileLoadingStrategy
+from order_records import StopLossOrder
 from freqtrade.strategy.interface import IStrategy
 from freqtrade.strategy.strategy_helper import stoploss_from_open
 from freqtrade.persistence import Trade
@@ -40,6 +41,8 @@ class StopLossStrategy(FileLoadingStrategy):
     trailing_stop = False
     
     stoploss = -1.0  # default off
+
+    order_record_class = StopLossOrder
     
     # def custom_stoploss(self, pair: str, trade: 'Trade', current_time: datetime, current_rate: float, current_profit: float, after_fill: bool, **kwargs) -> Optional[float]:
 
@@ -76,7 +79,10 @@ class StopLossStrategy(FileLoadingStrategy):
         :return float: New stoploss value, relative to the current_rate
         """
         
-        stop_loss_pct = self.get_file_arg(pair, 'stop_loss_pct')
+        order = self.get_order_record(pair)
+        if order is None or order.stop_loss_pct is None:
+            return None
+        stop_loss_pct = order.stop_loss_pct
 
         
         # Calculate stoploss relative to open price (no trailing)
@@ -91,14 +97,18 @@ class StopLossStrategy(FileLoadingStrategy):
         order_data =  {"stop_loss_pct": stop_loss_pct,
                    "stake_amount": stake_amount}
         
+        order_data = self.validate_order_data(order_data)
+
         print("\nPlease review your order details:")
         print(json.dumps(order_data, indent=4))
         confirmation = input(
             "Type 'Y' to confirm and submit your order, anything else to cancel: ").upper()
 
         if confirmation == 'Y':
-            self.order_handler.update_strategy_data(
-                pair, order_data, OrderStatus.PENDING)
+            with self.order_handler.transaction(pair) as data:
+                data.clear()
+                data.update(order_data)
+                data['status'] = OrderStatus.PENDING.value
             print("\nSubmitted order!")
             print(json.dumps(order_data, indent=4))
         else:
@@ -106,13 +116,9 @@ class StopLossStrategy(FileLoadingStrategy):
 
         time.sleep(3)
 
-
-        self.order_handler.update_strategy_data(
-            pair,order_data, OrderStatus.PENDING)
-
     def set_entry_signal(self, pair: str, dataframe: DataFrame, data: Dict[str, Any]):
         try:
-            stop_loss_pct = self.get_file_arg(pair, 'stop_loss_pct')
+            stop_loss_pct = self.order_record_class.from_dict(data).stop_loss_pct
             dataframe.loc[dataframe.index[-1], ['enter_long',
                                                 'enter_tag']] = (1, f"SL_user_enter_{stop_loss_pct}")
 
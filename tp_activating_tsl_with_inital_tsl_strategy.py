@@ -14,6 +14,7 @@ from pandas import DataFrame
 from typing import Dict
 from custom_order_form_handler import OrderStatus
 from file_loading_strategy import FileLoadingStrategy
+from order_records import TPActivatingTSLwithInitialTSLOrder
 from freqtrade.persistence import Trade
 
 class TPActivatingTSLwithInitialTSLStrategy(FileLoadingStrategy):
@@ -25,6 +26,8 @@ class TPActivatingTSLwithInitialTSLStrategy(FileLoadingStrategy):
     # use default variable, no callback needed (self.custom_stoploss)
     use_custom_stoploss = True
     stoploss = -1.0 #default off
+
+    order_record_class = TPActivatingTSLwithInitialTSLOrder
     
  
 
@@ -32,12 +35,14 @@ class TPActivatingTSLwithInitialTSLStrategy(FileLoadingStrategy):
     def custom_stoploss(self, pair: str, trade: Trade, current_time: datetime, current_rate: float, current_profit: float, after_fill: bool, **kwargs) -> Optional[float]:
         try:
 
-            tight_trailing_stop_loss = self.get_dfile_arg(
-                pair, 'tight_trailing_stop_loss')
-            loose_trailing_stop_loss = self.get_dfile_arg(
-                pair, 'loose_trailing_stop_loss')
-            profit_activating_tsl = self.get_dfile_arg(pair, 'profit_activating_tsl')
-            take_profit_hit = self.get_dfile_arg(pair, 'take_profit_hit')
+            # typed record, parsed once per change of the order data
+            order = self.get_order_record(pair)
+            if order is None:
+                return None
+            tight_trailing_stop_loss = order.tight_trailing_stop_loss
+            loose_trailing_stop_loss = order.loose_trailing_stop_loss
+            profit_activating_tsl = order.profit_activating_tsl
+            take_profit_hit = order.take_profit_hit
              # Calculating the percentage difference between the current rate and the open trade rate
             # print(f"""
             #       ************
@@ -75,11 +80,12 @@ class TPActivatingTSLwithInitialTSLStrategy(FileLoadingStrategy):
                 return -loose_trailing_stop_loss / 100 # convert to ratio
         
             else: # HIT! turn on TSL
-                self.set_dfile_arg(pair, 'take_profit_hit', True)
+                if not take_profit_hit:
+                    self.set_dfile_arg(pair, 'take_profit_hit', True)
                 return -tight_trailing_stop_loss / 100  # convert to ratio
             
         except ValueError as e:
-            print(f"Error: get_dfile_arg in custom_stoploss: {e}")
+            print(f"Error: get_order_record in custom_stoploss: {e}")
             return None
 
         
@@ -106,12 +112,17 @@ class TPActivatingTSLwithInitialTSLStrategy(FileLoadingStrategy):
             "stake_amount": stake_amount
         }
 
+        order_data = self.validate_order_data(order_data)
+
         print("\nPlease review your order details:")
         print(json.dumps(order_data, indent=4))
         confirmation = input("Type 'Y' to confirm and submit your order, anything else to cancel: ").upper()
 
         if confirmation == 'Y':
-            self.order_handler.update_strategy_data(pair, order_data, OrderStatus.PENDING)
+            with self.order_handler.transaction(pair) as data:
+                data.clear()
+                data.update(order_data)
+                data['status'] = OrderStatus.PENDING.value
             print("\nSubmitted order!")
             print(json.dumps(order_data, indent=4))
         else:
@@ -122,12 +133,10 @@ class TPActivatingTSLwithInitialTSLStrategy(FileLoadingStrategy):
     def set_entry_signal(self, pair: str, dataframe: DataFrame, data: Dict[str, Any]):
         
         try:
-            loose_trailing_stop_loss = self.get_dfile_arg(
-                pair, 'loose_trailing_stop_loss')
-            tight_trailing_stop_loss = self.get_dfile_arg(
-                pair, 'tight_trailing_stop_loss')
-            profit_activating_tsl = self.get_dfile_arg(
-                pair, 'profit_activating_tsl')
+            order = self.order_record_class.from_dict(data)
+            loose_trailing_stop_loss = order.loose_trailing_stop_loss
+            tight_trailing_stop_loss = order.tight_trailing_stop_loss
+            profit_activating_tsl = order.profit_activating_tsl
             dataframe.loc[dataframe.index[-1], ['enter_long',
                                                 'enter_tag']] = (1, f"TP&TSL&SL_user_enter_(TP={profit_activating_tsl}, Loose_TSL={loose_trailing_stop_loss}, Tight_TSL={tight_trailing_stop_loss})")
 
@@ -14,6 +14,7 @@ from pandas import DataFrame
 from typing import Dict
 from custom_order_form_handler import OrderStatus
 from file_loading_strategy import FileLoadingStrategy
+from order_records import TPActivatingTSLwithSLOrder
 from freqtrade.persistence import Trade
 
 class TPActivatingTSLwithSLStrategy(FileLoadingStrategy):
@@ -21,6 +22,8 @@ class TPActivatingTSLwithSLStrategy(FileLoadingStrategy):
     # use default variable, no callback needed (self.custom_stoploss)
     use_custom_stoploss = True
     stoploss = -1.0 #default off
+
+    order_record_class = TPActivatingTSLwithSLOrder
     
     
     # DOESN'T WORK FOR PAIR-SPECIFIC STOP-LOSS  
@@ -64,10 +67,14 @@ class TPActivatingTSLwithSLStrategy(FileLoadingStrategy):
     def custom_stoploss(self, pair: str, trade: Trade, current_time: datetime, current_rate: float, current_profit: float, after_fill: bool, **kwargs) -> Optional[float]:
         try:
 
-            trailing_stop_loss = self.get_file_arg(pair, 'trailing_stop_loss')
-            hard_stop_loss = self.get_file_arg(pair, 'hard_stop_loss')
-            profit_activating_tsl = self.get_file_arg(pair, 'profit_activating_tsl')
-            take_profit_hit = self.get_dfile_arg(pair, 'take_profit_hit')
+            # typed record, parsed once per change of the order data
+            order = self.get_order_record(pair)
+            if order is None:
+                return None
+            trailing_stop_loss = order.trailing_stop_loss
+            hard_stop_loss = order.hard_stop_loss
+            profit_activating_tsl = order.profit_activating_tsl
+            take_profit_hit = order.take_profit_hit
             
              # Calculating the percentage difference between the current rate and the open trade rate
             percentage_difference = ((current_rate - trade.open_rate) / trade.open_rate) * 100
@@ -96,11 +103,12 @@ class TPActivatingTSLwithSLStrategy(FileLoadingStrategy):
                 return -stoploss_from_open(-hard_stop_loss/ 100 , current_profit, is_short=trade.is_short, leverage=trade.leverage)
         
             else: # HIT! turn on TSL
-                self.set_file_arg(pair, 'take_profit_hit', True)
+                if not take_profit_hit:
+                    self.set_dfile_arg(pair, 'take_profit_hit', True)
                 return -trailing_stop_loss / 100  # convert to ratio
             
         except ValueError as e:
-            print(f"Error: get_file_arg in custom_stoploss: {e}")
+            print(f"Error: get_order_record in custom_stoploss: {e}")
             return None
 
         
@@ -129,14 +137,18 @@ class TPActivatingTSLwithSLStrategy(FileLoadingStrategy):
             "stake_amount": stake_amount,
         }
 
+        order_data = self.validate_order_data(order_data)
+
         print("\nPlease review your order details:")
         print(json.dumps(order_data, indent=4))
         confirmation = input(
             "Type 'Y' to confirm and submit your order, anything else to cancel: ").upper()
 
         if confirmation == 'Y':
-            self.order_handler.update_strategy_data(
-                pair, order_data, OrderStatus.PENDING)
+            with self.order_handler.transaction(pair) as data:
+                data.clear()
+                data.update(order_data)
+                data['status'] = OrderStatus.PENDING.value
             print("\nSubmitted order!")
             print(json.dumps(order_data, indent=4))
         else:
@@ -144,16 +156,13 @@ class TPActivatingTSLwithSLStrategy(FileLoadingStrategy):
 
         time.sleep(3)
 
-
-        self.order_handler.update_strategy_data(pair, order_data, OrderStatus.PENDING)
-
     def set_entry_signal(self, pair: str, dataframe: DataFrame, data: Dict[str, Any]):
         
         try:
-            hard_stop_loss = self.get_file_arg(pair, 'hard_stop_loss')
-            trailing_stop_loss = self.get_file_arg(pair, 'trailing_stop_loss')
-            profit_activating_tsl = self.get_file_arg(
-                pair, 'profit_activating_tsl')
+            order = self.order_record_class.from_dict(data)
+            hard_stop_loss = order.hard_stop_loss
+            trailing_stop_loss = order.trailing_stop_loss
+            profit_activating_tsl = order.profit_activating_tsl
             dataframe.loc[dataframe.index[-1], ['enter_long',
                                                 'enter_tag']] = (1, f"TP&TSL&SL_user_enter_(TP={profit_activating_tsl}, TSL={trailing_stop_loss}, SL={hard_stop_loss})")
 
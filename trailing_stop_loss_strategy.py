@@ -16,6 +16,7 @@ from pandas import DataFrame
 from typing import Dict
 from custom_order_form_handler import OrderStatus
 from file_loading_strategy import FileLoadingStrategy
+from order_records import TrailingStopLossOrder
 from freqtrade.strategy.interface import IStrategy
 from freqtrade.strategy.strategy_helper import stoploss_from_open
 from freqtrade.persistence import Trade
@@ -27,6 +28,8 @@ class TrailingStopLossStrategy(FileLoadingStrategy):
 
     stoploss = -1.0  # default off
 
+    order_record_class = TrailingStopLossOrder
+
     # not pair-specific
     # trailing_stop = True
     # def custom_stoploss(self, pair: str, trade: 'Trade', current_time: datetime, current_rate: float, current_profit: float, after_fill: bool, **kwargs) -> Optional[float]:
@@ -48,12 +51,15 @@ class TrailingStopLossStrategy(FileLoadingStrategy):
         """
         # Retrieve pair specific trailing stop loss percentage, use default if not found
         try:
-            trailing_stop_loss_pct = self.get_file_arg(pair, 'trailing_stop_loss_pct')
+            order = self.get_order_record(pair)
+            if order is None or order.trailing_stop_loss_pct is None:
+                return None
+            trailing_stop_loss_pct = order.trailing_stop_loss_pct
 
             print(f"trailing_stop_loss_pct: {trailing_stop_loss_pct}")
             return -trailing_stop_loss_pct / 100  # convert to ratio
         except ValueError as e:
-            print(f"Error: get_file_arg in custom_stoploss: {e}")
+            print(f"Error: get_order_record in custom_stoploss: {e}")
             return None
 
     def input_strategy_data(self, pair: str):
@@ -65,29 +71,30 @@ class TrailingStopLossStrategy(FileLoadingStrategy):
         order_data = {"trailing_stop_loss_pct": trailing_stop_loss_pct,
                       "stake_amount": stake_amount}
 
+        order_data = self.validate_order_data(order_data)
+
         print("\nPlease review your order details:")
         print(json.dumps(order_data, indent=4))
         confirmation = input(
             "Type 'Y' to confirm and submit your order, anything else to cancel: ").upper()
 
         if confirmation == 'Y':
-            self.order_handler.update_strategy_data(
-                pair, order_data, OrderStatus.PENDING)
+            with self.order_handler.transaction(pair) as data:
+                data.clear()
+                data.update(order_data)
+                data['status'] = OrderStatus.PENDING.value
             print("\nSubmitted order!")
             print(json.dumps(order_data, indent=4))
         else:
             print("\nCancelled placing order!")
 
         time.sleep(3)
-
-        self.order_handler.update_strategy_data(
-            pair, order_data, OrderStatus.PENDING)
         
         
 
     def set_entry_signal(self, pair: str, dataframe: DataFrame, data: Dict[str, Any]):
         try:
-            trailing_stop_loss_pct = self.get_file_arg(pair, "trailing_stop_loss_pct")
+            trailing_stop_loss_pct = self.order_record_class.from_dict(data).trailing_stop_loss_pct
             dataframe.loc[dataframe.index[-1], ['enter_long', 'enter_tag']] = (1, f"TSL_user_enter_(tsl={trailing_stop_loss_pct}")
         except Exception as e:
             print(f"Error: set_entry_signal: {e}")